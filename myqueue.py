@@ -3,34 +3,86 @@ by Jordan Ogilvy
 """
 #The queue ADT has the following methods, which each have a description of what they do in the Queue class:
 #enqueue(item)
+#enqueue_many(items)
 #dequeue()
-#peek()
+#dequeue_many(n)
+#peek(n=0)
 #size()
 #is_empty()
+#is_full()
+#copy()
+
+from array import array
 
 class MyQueue:
-	def __init__(self):
-		self.__queue = [] #implement the queue with a python list which will hold the queued items
-		self.__front = 0 #index of the item at the front of the queue 
-		self.__back = 0 #index the NEXT queued item will go into 
+	# the queue is a ring buffer: a fixed number of slots, with the front and back wrapping around to the start of them.
+	# slots are reused as items are dequeued and enqueued, so nothing is allocated per item.
+	# maxlen: the most items the queue can hold. None for no limit, in which case the slots double when they run out.
+	# overflow: what enqueueing onto a full queue does. "overwrite" drops the front item to make room, "reject" refuses the new item.
+	# typecode: an array module typecode (e.g. "d" or "i") to store numeric items in a typed array instead of a python list.
+	__slots__ = ("__queue", "__front", "__back", "__length", "__capacity", "__maxlen", "__overflow", "__typecode")
+
+	def __init__(self, maxlen=None, overflow="overwrite", typecode=None):
+		if maxlen is not None and maxlen < 1:
+			raise ValueError("maxlen must be at least 1")
+		if overflow not in ("overwrite", "reject"):
+			raise ValueError("overflow must be 'overwrite' or 'reject'")
+		self.__maxlen = maxlen
+		self.__overflow = overflow
+		self.__typecode = typecode
+		self.__capacity = maxlen if maxlen is not None else 8 #number of slots in the ring buffer
+		self.__queue = self.__new_slots(self.__capacity) #the slots which hold the queued items
+		self.__front = 0 #index of the item at the front of the queue
+		self.__back = 0 #index the NEXT queued item will go into
 		self.__length = 0 #number of items in the queue
-		
+
+	def __new_slots(self, capacity):
+		if self.__typecode is None:
+			return [None]*capacity
+		return array(self.__typecode, [0])*capacity
+
+	def __grow(self):
+		#double the number of slots, copying the queued items to the start of the new slots in order
+		new_queue = self.__new_slots(self.__capacity*2)
+		new_queue[:self.__length] = self.__items()
+		self.__queue = new_queue
+		self.__front = 0
+		self.__back = self.__length
+		self.__capacity = self.__capacity*2
+
+	def __items(self):
+		#the queued items in order from front to back, as a list or array
+		end = self.__front + self.__length
+		if end <= self.__capacity:
+			return self.__queue[self.__front:end]
+		return self.__queue[self.__front:] + self.__queue[:end - self.__capacity]
+
 	def enqueue(self, item):
 		#add the passed item to the back of the queue. Update the location of the back of the queue.
-		#there is a special case for when the queue is empty.		
-		if self.is_empty():
-			self.__back = 0   #move the front and back positions to the front of the python list
-			self.__front = 0
-			self.__queue = [] #recreate the python list, removing all the None elements, to save memory
-			
-		try:
-			self.__queue[self.__back] = item	
-		except IndexError:
-			self.__queue.append(item) #add the item to the queue
-		
-		self.__back = self.__back + 1
+		#returns True if the item was queued, False if the queue is full and rejects new items
+		if self.__length == self.__capacity:
+			if self.__maxlen is None:
+				self.__grow()
+			elif self.__overflow == "overwrite":
+				self.dequeue() #make room by dropping the front item
+			else:
+				print("Queue is full: cannot enqueue")
+				return False
+
+		self.__queue[self.__back] = item
+		self.__back = (self.__back + 1) % self.__capacity
 		self.__length = self.__length + 1
-	
+		return True
+
+	def enqueue_many(self, items):
+		#add each of the passed items to the back of the queue, in order. Returns the number of items queued
+		queued = 0
+		for item in items:
+			if not self.enqueue(item):
+				break
+			queued = queued + 1
+		return queued
+
 	def dequeue(self):
 		#Remove and return the item at the front of the queue.
 		#If the queue is already empty, return None and a error message without terminating
@@ -39,54 +91,81 @@ class MyQueue:
 			return
 		else:
 			front_item = self.__queue[self.__front]
-			self.__queue[self.__front] = None
-			self.__front = self.__front + 1
+			if self.__typecode is None:
+				self.__queue[self.__front] = None #let go of the item so it can be garbage collected
+			self.__front = (self.__front + 1) % self.__capacity
 			self.__length = self.__length - 1
 			return front_item
-	
-	def peek(self):
-		#return the item at the front of the queue, without removing/dequeuing it.
-		if self.is_empty():
+
+	def dequeue_many(self, n):
+		#remove and return up to n items from the front of the queue, in a list (or an array for typed queues)
+		n = min(n, self.__length)
+		end = self.__front + n
+		if end <= self.__capacity:
+			front_items = self.__queue[self.__front:end]
+		else:
+			front_items = self.__queue[self.__front:] + self.__queue[:end - self.__capacity]
+		if self.__typecode is None:
+			for i in range(n):
+				self.__queue[(self.__front + i) % self.__capacity] = None
+		self.__front = end % self.__capacity
+		self.__length = self.__length - n
+		return front_items
+
+	def peek(self, n=0):
+		#return the item n places behind the front of the queue, without removing/dequeuing it. 0 is the front item.
+		#returns None if there is no such item
+		if n < 0 or n >= self.__length:
 			return
 		else:
-			return self.__queue[self.__front]
-	
-	def size(self):	
+			return self.__queue[(self.__front + n) % self.__capacity]
+
+	def size(self):
 		#return the size of the queue
 		return self.__length
-		
+
 	def is_empty(self):
 		#returns True if the queue is empty (has no items queued), returns False if not
 		return self.__length == 0
-		
+
+	def is_full(self):
+		#returns True if the queue has maxlen items in it. A queue with no maxlen is never full
+		return self.__maxlen is not None and self.__length == self.__maxlen
+
+	def copy(self):
+		#return a new queue with the same settings and the same items in the same order
+		queue_copy = MyQueue(self.__maxlen, self.__overflow, self.__typecode)
+		queue_copy.enqueue_many(self.__items())
+		return queue_copy
+
 	def __repr__(self):
-	
-		#show the queue as a slice of the list, with the front item on the left/front, and the back item at the end.
+		#show the queue as a list, with the front item on the left/front, and the back item at the end.
 		#e.g. "[front_item, ..., ..., ..., back_item]"
-		return str(self.__queue[self.__front:self.__back])
-	
+		return str(list(self.__items()))
+
 	def __len__(self):
 		return self.size()
-		
+
+	def __iter__(self):
+		#iterate over the items from front to back, without dequeuing them
+		return iter(self.__items())
+
 	def __contains__(self, other):
 		#return True if the passed item, other, is in the queue
-		return other in self.__queue[self.__front:self.__back]
+		return other in self.__items()
 
-		queue_copy = Queue()
-		for item in self.__queue[self.__front:self.__back]:
-			queue_copy.enqueue(item)
-			
-		return queue_copy
-		
-		
-if __name__ == "__main__":	
-	myq = Queue()
+
+if __name__ == "__main__":
+	myq = MyQueue()
 	myq.enqueue(1)
 	myq.enqueue(2)
 	myq.enqueue(3)
 	print(myq)
-	myq2 = myq
+	myq2 = myq.copy()
 	print(myq2)
 	myq2.dequeue()
 	print(myq)
-	print(myq2)
\ No newline at end of file
+	print(myq2)
+	ring = MyQueue(maxlen=3, typecode="i")
+	ring.enqueue_many(range(5))
+	print(ring, ring.peek(1))
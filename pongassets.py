@@ -0,0 +1,103 @@
+"""Jordan Ogilvy, 'pypong' asset manager. Finds and loads each font once, and remembers where the system fonts are
+in a file between runs, because searching the system font list can take a long time on a machine with lots of fonts.
+Fonts can be loaded on a background thread while pygame starts up and the window opens."""
+
+import json
+import os
+import threading
+import time
+import pygame
+
+class AssetManager:
+	# cache_path: a JSON file to remember the file each font name was found at, or None to search every run
+	def __init__(self, cache_path=None):
+		self.__cache_path = cache_path
+		self.__fonts = {}		#(name, size) -> pygame.font.Font
+		self.__paths = {}		#font name -> the file it was found at, or None for pygame's own font if it wasnt found
+		self.__saved = {}		#the paths as they are in the cache file, so it is only written when they change
+		self.__timings = []		#(what was loaded, seconds it took) for the startup report
+		self.__lock = threading.Lock()		#one font load at a time, so a font the background thread is loading isnt loaded twice
+		self.__thread = None
+		self.__preloading = set()	#(name, size) of the fonts the background thread hasnt loaded yet
+		if cache_path is not None:
+			self.__read_cache()
+
+	def __read_cache(self):
+		try:
+			with open(self.__cache_path) as cache:
+				paths = json.load(cache)
+		except (OSError, ValueError):
+			return		#no cache yet, or a broken one, so the fonts are searched for again
+		self.__saved = paths
+		# forget any font that has been moved or uninstalled since
+		self.__paths = {name: path for name, path in paths.items() if path is None or os.path.exists(path)}
+
+	def __write_cache(self):
+		# only if a font was found that wasnt in the file, or one in the file has gone
+		if self.__cache_path is None or self.__paths == self.__saved:
+			return
+		try:
+			with open(self.__cache_path, "w") as cache:
+				json.dump(self.__paths, cache)
+		except OSError:
+			return		#the game still works without the cache, it just starts slower next time
+		self.__saved = dict(self.__paths)
+
+	def __find_font(self, name):
+		# the file for the font name, from the cache if it is there, otherwise from the system font list
+		if name in self.__paths:
+			return self.__paths[name]
+		start = time.perf_counter()
+		path = pygame.font.match_font(name)
+		self.__timings.append(("find " + name, time.perf_counter() - start))
+		self.__paths[name] = path
+		return path
+
+	def __load_font(self, name, size):
+		with self.__lock:
+			font = self.__fonts.get((name, size))
+			if font is None:
+				path = self.__find_font(name)
+				start = time.perf_counter()
+				font = pygame.font.Font(path, size)
+				self.__timings.append(("load %s %d" % (name, size), time.perf_counter() - start))
+				self.__fonts[(name, size)] = font
+			self.__preloading.discard((name, size))
+			return font
+
+	def get_font(self, name, size, wait=True):
+		# the same font as pygame.font.SysFont(name, size), loaded the first time it is asked for. A font a background
+		# preload hasnt got to yet is waited for, or with wait False, None is returned straight away so the caller can
+		# carry on without it and ask again next frame
+		font = self.__fonts.get((name, size))
+		if font is not None:
+			return font
+		thread = self.__thread
+		if not wait and (name, size) in self.__preloading and thread is not None and thread.is_alive():
+			return None
+		font = self.__load_font(name, size)
+		with self.__lock:
+			self.__write_cache()
+		return font
+
+	def preload(self, fonts, background=False):
+		# load every (name, size) in fonts. With background set they load on another thread and this returns straight away
+		fonts = list(fonts)
+		if not background:
+			for name, size in fonts:
+				self.__load_font(name, size)
+			with self.__lock:
+				self.__write_cache()		#once, after all of them
+			return
+		self.__preloading.update(fonts)
+		self.__thread = threading.Thread(target=self.preload, args=(fonts,), daemon=True)
+		self.__thread.start()
+
+	def wait(self):
+		# wait for a background preload to finish
+		if self.__thread is not None:
+			self.__thread.join()
+			self.__thread = None
+
+	def get_timings(self):
+		return list(self.__timings)
@@ -0,0 +1,282 @@
+"""Jordan Ogilvy, 'pypong' batch engine. Steps thousands of pypong matches at once with numpy.
+Every match follows the same rules as pongsim.World, but the state of all the matches is kept in arrays
+(one element per match) so each tick is a handful of numpy operations instead of a python loop per object."""
+
+import math
+import numpy as np
+import pongsim
+
+class BatchWorld:
+	def __init__(self, n, width=pongsim.FIELD_SIZE[0], height=pongsim.FIELD_SIZE[1], difficulty=1, seed=None, predictive=False):
+		# n matches on a width x height playfield. difficulty is 0-2 for every match, or a sequence with one per match.
+		# With predictive set, every ai predicts where the ball is going like pongsim.PredictiveBrain
+		self.__n = n
+		self.__width = width
+		self.__height = height
+		self.__rng = np.random.default_rng(seed)
+		self.__ball_size = 16
+		self.__max_bounce_angle = math.pi/5
+		self.__paddle_width = 15
+		self.__paddle_height = 80
+		self.__paddle_speed = 5
+		self.__opponent_x = 15
+		self.__player_x = width-35
+		self.__restart_wait_ticks = 2*pongsim.TICK_RATE
+		self.__score_limit = 7
+		self.__history_length = max(pongsim.AI_REACTION_TIMES)+1	#ticks of ball positions the ai needs to remember
+
+		# the settings of each match, taken from the difficulty presets
+		difficulty = np.broadcast_to(np.asarray(difficulty, dtype=np.int64), (n,))
+		presets = pongsim.DIFFICULTY_PRESETS
+		self.__ball_speed = np.array([preset["ball_speed"] for preset in presets], dtype=np.float64)[difficulty]
+		self.__max_serve_angle = np.array([preset["max_serve_angle"] for preset in presets])[difficulty]
+		ai_difficulty = np.array([preset["ai_difficulty"] for preset in presets])[difficulty]
+		self.__reaction_time = np.array(pongsim.AI_REACTION_TIMES)[ai_difficulty]
+		self.__ai_hard = ai_difficulty == 2
+		self.__predictive = predictive
+		if predictive:
+			self.__reaction_time = np.array([preset["reaction_time"] for preset in pongsim.PREDICTIVE_AI_PRESETS])[ai_difficulty]
+			self.__error = np.array([preset["error"] for preset in pongsim.PREDICTIVE_AI_PRESETS], dtype=np.float64)[ai_difficulty]
+
+		# the state of each match
+		self.__ball_x = np.zeros(n)
+		self.__ball_y = np.zeros(n)
+		self.__velocity = np.zeros(n)
+		self.__direction = np.zeros(n)
+		self.__player_y = np.zeros(n)
+		self.__opponent_y = np.zeros(n)
+		self.__last_move = np.zeros(n)		#-1 if the player paddle last moved up, 1 if down, 0 if it didnt move
+		self.__player_score = np.zeros(n, dtype=np.int64)
+		self.__opponent_score = np.zeros(n, dtype=np.int64)
+		self.__serve_countdown = np.zeros(n, dtype=np.int64)
+		self.__ticks = np.zeros(n, dtype=np.int64)	#ticks since each match started
+		self.__winner = np.zeros(n, dtype=np.int64)	#0 while playing, 1 if the player won, -1 if the opponent won
+		self.__history = np.zeros((self.__history_length, n))	#ball y positions the ai has seen, indexed by tick % history_length
+		# the state of each predictive ai
+		self.__seen_direction = np.zeros(n)		#direction and velocity of the ball when the ai last noticed a change
+		self.__seen_velocity = np.zeros(n)
+		self.__pending = np.zeros(n, dtype=bool)	#True while the ai is waiting to notice a change
+		self.__countdown = np.zeros(n, dtype=np.int64)	#ticks until the ai notices
+		self.__target = np.zeros(n)		#the y the centre of the ai paddle is heading for
+		self.reset()
+
+	def reset(self, mask=None):
+		# start the matches selected by the boolean array mask again from the beginning. All of them if mask is None
+		if mask is None:
+			mask = np.ones(self.__n, dtype=bool)
+		for array in (self.__ball_x, self.__ball_y, self.__velocity, self.__direction, self.__last_move):
+			array[mask] = 0
+		self.__player_y[mask] = 200
+		self.__opponent_y[mask] = 200
+		for array in (self.__player_score, self.__opponent_score, self.__serve_countdown, self.__ticks, self.__winner):
+			array[mask] = 0
+		self.__seen_direction[mask] = np.nan	#so the first tick always counts as a change
+		self.__pending[mask] = False
+		self.__countdown[mask] = 0
+		self.__target[mask] = self.__height/2
+
+	def __len__(self):
+		return self.__n
+
+	def get_size(self):
+		return (self.__width, self.__height)
+
+	def get_ball_positions(self):
+		# (n, 2) array of the top left corner of each ball
+		return np.stack((self.__ball_x, self.__ball_y), axis=1)
+
+	def get_paddle_positions(self):
+		# (n, 2) array of the y of the top of (player paddle, opponent paddle) in each match
+		return np.stack((self.__player_y, self.__opponent_y), axis=1)
+
+	def get_ball_velocities(self):
+		# (n, 2) array of how far each ball moves in x and y each tick, with y down the screen like the positions
+		return np.stack((self.__velocity*np.cos(self.__direction), -self.__velocity*np.sin(self.__direction)), axis=1)
+
+	def get_serve_countdowns(self):
+		# ticks until each ball is served, 0 while it is in play
+		return self.__serve_countdown.copy()
+
+	def get_scores(self):
+		# (n, 2) array of (player_score, opponent_score) for each match
+		return np.stack((self.__player_score, self.__opponent_score), axis=1)
+
+	def get_ticks(self):
+		return self.__ticks.copy()
+
+	def get_winners(self):
+		# 1 where the player won, -1 where the opponent won, 0 where the match is still going
+		return self.__winner.copy()
+
+	def is_over(self):
+		return self.__winner != 0
+
+	def __bounce_y(self, y, vspeed, ticks):
+		# the y each ball at y will be checked against the paddles at, ticks steps from now, bouncing off the walls like
+		# pongsim.BallBody: a ball turns round a tick before it would go through a wall, so it goes back and forth over the
+		# same points, one step apart, and the walls can be unfolded over those points instead of over the whole playfield
+		step = np.abs(vspeed)
+		moving = np.where(vspeed > 0, -1, 1)	#1 if the ball is going down the screen
+		with np.errstate(divide="ignore", invalid="ignore"):
+			top = y % step	#the y of the point nearest the top
+			start = np.floor(y/step)	#how many points below it the ball is now
+			points = np.maximum(np.floor((self.__height - self.__ball_size - top)/step), 1)	#points below it
+		def fold(i):
+			# which point the ball is on after it has moved i points, with the walls unfolded
+			i = i % (2*points)
+			return np.where(i > points, 2*points - i, i)
+		last = fold(start + moving*(ticks-1))		#the point before the one the paddle is checked at
+		# the way it was going there. The bounce comes after the paddle check, so the check can be a point past a wall
+		before = fold(start + moving*(ticks-2))
+		going = np.where(ticks >= 2, np.sign(last - before), moving)
+		return np.where(step > 0, top + (last + going)*step, y)
+
+	def __step_predictive_ai(self, active):
+		# the same as pongsim.PredictiveBrain: only predict again a reaction time after the ball changes direction or speed
+		changed = active & ((self.__direction != self.__seen_direction) | (self.__velocity != self.__seen_velocity))
+		self.__seen_direction = np.where(changed, self.__direction, self.__seen_direction)
+		self.__seen_velocity = np.where(changed, self.__velocity, self.__seen_velocity)
+		noticed = changed & ~self.__pending
+		self.__countdown[noticed] = self.__reaction_time[noticed]
+		self.__pending |= noticed
+		waiting = self.__pending & (self.__countdown > 0)
+		think = self.__pending & ~waiting
+		self.__countdown -= waiting
+		self.__pending &= ~think
+
+		# where each ball will be on the tick it hits the ai paddle, and how many ticks away that is. Only worked out, and
+		# only given a random mistake, for the matches predicting this tick, which is a few of them
+		think = np.flatnonzero(think)
+		noise = self.__rng.normal(0, 1, len(think))
+		hspeed = self.__velocity[think]*np.cos(self.__direction[think])
+		vspeed = self.__velocity[think]*np.sin(self.__direction[think])
+		plane_x = self.__opponent_x + self.__paddle_width
+		incoming = hspeed < 0
+		with np.errstate(divide="ignore", invalid="ignore"):
+			ticks = np.where(incoming, np.maximum(np.ceil((plane_x - self.__ball_x[think])/hspeed), 1), 1)
+		distance = np.abs(ticks*hspeed)
+		mistake = noise*self.__error[think]*distance/self.__width
+		y = self.__bounce_y(self.__ball_y[think], vspeed, ticks)
+		self.__target[think] = np.where(incoming, y + self.__ball_size/2 + mistake, self.__height/2)
+
+		centre = self.__opponent_y + self.__paddle_height//2
+		down = active & (centre < self.__target-self.__paddle_speed) & (self.__opponent_y+self.__paddle_height < self.__height)
+		up = active & ~down & (centre > self.__target+self.__paddle_speed) & (self.__opponent_y > 0)
+		self.__opponent_y += self.__paddle_speed*(down.astype(np.int64) - up)
+
+	def __step_ai(self, active):
+		# the ai moves towards where the ball was reaction_time ticks ago, the same as pongsim.OpponentBrain
+		in_play = (self.__ball_x > 0) & (self.__ball_x < self.__width)
+		self.__history[self.__ticks % self.__history_length, np.arange(self.__n)] = self.__ball_y
+		seen_tick = (self.__ticks - self.__reaction_time) % self.__history_length
+		target = self.__history[seen_tick, np.arange(self.__n)]
+		thinking = active & in_play & (self.__ticks >= self.__reaction_time)
+		# hard ai moves back to the middle when the ball is moving away from it, and doesnt check the edges doing so
+		to_middle = self.__ai_hard & (np.cos(self.__direction) > 0)
+		target = np.where(to_middle, self.__height//2, target)
+		centre = self.__opponent_y + self.__paddle_height//2
+		can_down = to_middle | (self.__opponent_y+self.__paddle_height < self.__height)
+		can_up = to_middle | (self.__opponent_y > 0)
+		down = thinking & (centre < target-self.__paddle_speed) & can_down
+		up = thinking & ~down & (centre > target+self.__paddle_speed) & can_up
+		self.__opponent_y += self.__paddle_speed*(down.astype(np.int64) - up)
+
+	def __step_rules(self, active):
+		# scoring and serving, the same as pongsim.MatchRules
+		counting = active & (self.__serve_countdown > 0)
+		self.__serve_countdown -= counting
+		need_restart = counting & (self.__serve_countdown == 0)
+
+		out = active & ~((self.__ball_x > 0) & (self.__ball_x < self.__width))
+		player_point = out & (self.__ball_x < 0)
+		opponent_point = out & (self.__ball_x > self.__width//2*2)
+		self.__player_score += player_point
+		self.__opponent_score += opponent_point
+		self.__serve_countdown[out] = self.__restart_wait_ticks
+		self.__velocity[out] = 0
+		self.__ball_x[out] = self.__width//2 - self.__ball_size//2
+		self.__ball_y[out] = self.__height//2 - self.__ball_size//2
+		self.__winner[out & (self.__player_score == self.__score_limit)] = 1
+		self.__winner[out & (self.__opponent_score == self.__score_limit)] = -1
+
+		# random numbers are only drawn for the balls being served this tick
+		serving = np.flatnonzero(need_restart)
+		base_direction = np.where(self.__rng.random(len(serving)) < 0.5, 0, math.pi)
+		offset = self.__rng.uniform(0, 2*self.__max_serve_angle[serving])
+		self.__direction[serving] = base_direction + self.__max_serve_angle[serving] - offset
+		self.__velocity[serving] = self.__ball_speed[serving]
+		return player_point, opponent_point, need_restart
+
+	def __step_player(self, active, up, down):
+		# the player paddle moves like pongsim.PlayerControl. When both keys are held it keeps moving the way it last moved
+		move = np.where(up & down, self.__last_move, np.where(up, -1, np.where(down, 1, 0)))
+		self.__last_move = np.where(active, move, self.__last_move)
+		self.__player_y += np.where(active, move*self.__paddle_speed, 0)
+
+	def __step_ball(self, active):
+		# move every ball one tick, bouncing off the walls and paddles, the same as pongsim.BallBody
+		hspeed = self.__velocity*np.cos(self.__direction)
+		vspeed = self.__velocity*np.sin(self.__direction)
+		next_x = self.__ball_x + hspeed
+		next_y = self.__ball_y - vspeed
+
+		wall = active & ((next_y < 0) | (next_y > self.__height-self.__ball_size))
+		vspeed = np.where(wall, -vspeed, vspeed)
+		with np.errstate(divide="ignore", invalid="ignore"):
+			bounce_direction = np.arctan(vspeed/hspeed) + np.where(hspeed < 0, math.pi, 0)
+		bounce_direction = np.where(hspeed == 0, 0, bounce_direction)
+		self.__direction = np.where(wall, bounce_direction, self.__direction)
+
+		hit_any = np.zeros(self.__n, dtype=bool)
+		size = self.__ball_size
+		for paddle_x, paddle_y in ((self.__opponent_x, self.__opponent_y), (self.__player_x, self.__player_y)):
+			#AABB collision check of each ball against the paddle, at the balls next position
+			hit = active & ~((paddle_x > next_x+size) | (paddle_x+self.__paddle_width < next_x) |
+				(next_y+size < paddle_y) | (next_y > paddle_y+self.__paddle_height))
+			# and only the balls that hit it get a random bounce
+			hits = np.flatnonzero(hit)
+			base_direction = np.where(hspeed[hits] < 0, 0, math.pi)
+			offset = self.__rng.uniform(0, 2*self.__max_bounce_angle, len(hits))
+			self.__direction[hits] = base_direction + self.__max_bounce_angle - offset
+			hspeed[hits] = self.__velocity[hits]*np.cos(self.__direction[hits])
+			vspeed[hits] = self.__velocity[hits]*np.sin(self.__direction[hits])
+			hit_any |= hit
+
+		self.__ball_x += np.where(active, hspeed, 0)
+		self.__ball_y -= np.where(active, vspeed, 0)
+		return hit_any
+
+	def step(self, up=None, down=None):
+		# advance every match that isnt over by one tick. up and down are boolean arrays of the player keys, one per match.
+		# Returns a dict of boolean arrays saying which matches had a point scored, a serve, a paddle hit, or just finished
+		if up is None:
+			up = np.zeros(self.__n, dtype=bool)
+		if down is None:
+			down = np.zeros(self.__n, dtype=bool)
+		active = self.__winner == 0
+		if self.__predictive:
+			self.__step_predictive_ai(active)
+		else:
+			self.__step_ai(active)
+		player_point, opponent_point, serve = self.__step_rules(active)
+		self.__step_player(active, up, down)
+		hit = self.__step_ball(active)
+		self.__ticks += active
+		return {
+			pongsim.PADDLE_HIT: hit,
+			pongsim.SERVE: serve,
+			pongsim.POINT_SCORED: player_point | opponent_point,
+			pongsim.MATCH_OVER: active & (self.__winner != 0),
+		}
+
+	def run(self, ticks, auto_reset=False):
+		# step every match ticks times with no player input. With auto_reset, finished matches start again straight away.
+		# Returns the number of match ticks simulated
+		stepped = 0
+		for _ in range(ticks):
+			active = self.__winner == 0
+			stepped += int(np.count_nonzero(active))
+			done = self.step()[pongsim.MATCH_OVER]
+			if auto_reset and done.any():
+				self.reset(done)
+		return stepped
@@ -0,0 +1,276 @@
+"""Jordan Ogilvy, 'pypong' benchmarks. Times every update() and draw() of the pypong objects, and whole frames,
+through scripted scenarios with no real window (SDL's dummy video driver), and saves the numbers as JSON
+so two versions of the game can be compared.
+
+e.g. python pongbench.py -o before.json
+	 python pongbench.py -o after.json --compare before.json
+	 python pongbench.py --frame-hash --frames 3000		to check a change hasnt changed what is drawn
+"""
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")	#must be set before pygame starts up
+
+import argparse
+import hashlib
+import json
+import platform
+import random
+import time
+import pygame
+import pypong
+import pongrender
+import pongentities
+import pongevents
+import pongsim
+
+class Bench:
+	# a game with no game loop. Frames are run one at a time, timing each object as it goes
+	# frame_hash: hash the whole window after every frame, so two versions of the game can be checked to draw the same
+	# frames. The hashing isnt in the timings
+	def __init__(self, dirty_rendering=True, frame_hash=False):
+		self.__screen = pygame.display.set_mode((640, 480))
+		self.__hash = hashlib.sha1() if frame_hash else None
+		self.__renderer = pongrender.DirtyRenderer(self.__screen, (255, 20, 147), dirty_rendering)
+		self.__controller = pypong.GameController(self.__renderer)
+		self.__bus = pongevents.EventBus()
+		self.__objects = pongentities.EntityRegistry([self.__controller], self.__bus)
+		self.__samples = {}		#name -> list of times in seconds
+
+	def get_objects(self):
+		return self.__objects
+
+	def get_controller(self):
+		return self.__controller
+
+	def get_samples(self):
+		return self.__samples
+
+	def get_frame_hash(self):
+		# the hex digest of every frame drawn so far, or None without frame_hash
+		if self.__hash is None:
+			return None
+		return self.__hash.hexdigest()
+
+	def __record(self, name, seconds):
+		self.__samples.setdefault(name, []).append(seconds)
+
+	def frame(self, events=(), signals=()):
+		# one tick and one draw of every object, the same as one frame of MyGame.game_loop at normal speed.
+		# signals are (signal, value) pairs to emit on the bus along with the events, as if the game had sent them
+		clock = time.perf_counter
+		frame_start = clock()
+		start = clock()
+		self.__bus.publish_all(list(events) + pygame.event.get())
+		for signal, value in signals:
+			self.__bus.emit(signal, value)
+		self.__record("dispatch", clock() - start)
+		for object in self.__objects:
+			start = clock()
+			object.update(self.__objects)
+			self.__record(type(object).__name__ + ".update", clock() - start)
+		start = clock()
+		self.__renderer.begin_frame()
+		self.__record("begin_frame", clock() - start)
+		for object in self.__objects:
+			start = clock()
+			object.draw(1.0)
+			self.__record(type(object).__name__ + ".draw", clock() - start)
+		start = clock()
+		self.__renderer.end_frame()
+		self.__record("end_frame", clock() - start)
+		self.__record("frame", clock() - frame_start)
+		if self.__hash is not None:
+			self.__hash.update(pygame.image.tobytes(self.__screen, "RGB"))
+
+def add_hash(hashes, bench):
+	if hashes is not None:
+		hashes.append(bench.get_frame_hash())
+
+def key(k):
+	return pygame.event.Event(pygame.KEYDOWN, key=k)
+
+def match_over(winner):
+	return (pongsim.MATCH_OVER, winner)
+
+class BallFollower:
+	# presses and releases the arrow keys so the player paddle follows the ball, which keeps rallies going.
+	# in multiball it follows whichever ball will get to the player paddle first
+	def __init__(self):
+		self.__held = None
+
+	def events(self, objects):
+		ball = objects.first(pypong.Ball)
+		multiball = objects.first(pypong.MultiballMatch)
+		player = objects.first(pypong.Player)
+		if player is None:
+			return []
+		if ball is None and multiball is not None:
+			ball = multiball.get_threat(player.get_rect()[0])
+		if ball is None:
+			return []
+		paddle_y, paddle_h = player.get_rect()[1], player.get_rect()[3]
+		ball_y = ball.get_position()[1] + ball.get_size()/2
+		want = None
+		if ball_y < paddle_y + paddle_h/2 - player.get_speed():
+			want = pygame.K_UP
+		elif ball_y > paddle_y + paddle_h/2 + player.get_speed():
+			want = pygame.K_DOWN
+		events = []
+		if want != self.__held:
+			if self.__held is not None:
+				events.append(pygame.event.Event(pygame.KEYUP, key=self.__held))
+			if want is not None:
+				events.append(key(want))
+			self.__held = want
+		return events
+
+# each scenario runs frames frames and returns the samples. With hashes a list, the frame hash of each Bench it used is
+# added to it
+
+def scenario_menu_idle(frames, dirty, hashes=None):
+	# the start screen, the difficulty screen and the endgame screen, sitting there with nothing pressed
+	bench = Bench(dirty, hashes is not None)
+	for i in range(frames):
+		bench.frame()
+	samples = {"start." + name: times for name, times in bench.get_samples().items()}
+	add_hash(hashes, bench)
+	bench = Bench(dirty, hashes is not None)
+	bench.frame([key(pygame.K_p)])
+	bench.get_samples().clear()
+	for i in range(frames):
+		bench.frame()
+	samples.update({"difficulty." + name: times for name, times in bench.get_samples().items()})
+	add_hash(hashes, bench)
+	bench = Bench(dirty, hashes is not None)
+	bench.frame([key(pygame.K_p)])
+	bench.frame([key(pygame.K_n)])
+	bench.frame(signals=[match_over(pongsim.PLAYER)])
+	bench.get_samples().clear()
+	for i in range(frames):
+		bench.frame()
+	samples.update({"endgame." + name: times for name, times in bench.get_samples().items()})
+	add_hash(hashes, bench)
+	return samples
+
+def scenario_rally(frames, dirty, difficulty_key, hashes=None):
+	# a match where the player paddle follows the ball, so rallies are long and every object is busy
+	bench = Bench(dirty, hashes is not None)
+	bench.frame([key(pygame.K_p)])
+	bench.frame([key(difficulty_key)])
+	bench.get_samples().clear()
+	follower = BallFollower()
+	for i in range(frames):
+		if len(bench.get_objects()) == 1:	#the match finished, play again
+			bench.frame([key(pygame.K_p)])
+		else:
+			bench.frame(follower.events(bench.get_objects()))
+	add_hash(hashes, bench)
+	return bench.get_samples()
+
+def scenario_rapid_rematch(frames, dirty, hashes=None):
+	# start a match, play a few frames, end it, and play again straight away, over and over
+	bench = Bench(dirty, hashes is not None)
+	bench.frame([key(pygame.K_p)])
+	bench.frame([key(pygame.K_h)])
+	for i in range(frames):
+		if i % 10 == 0:
+			bench.frame(signals=[match_over(pongsim.OPPONENT)])
+		elif i % 10 == 1:
+			bench.frame([key(pygame.K_p)])
+		else:
+			bench.frame()
+	add_hash(hashes, bench)
+	return bench.get_samples()
+
+SCENARIOS = {
+	"menu_idle": scenario_menu_idle,
+	"rally_easy": lambda frames, dirty, hashes=None: scenario_rally(frames, dirty, pygame.K_e, hashes),
+	"rally_normal": lambda frames, dirty, hashes=None: scenario_rally(frames, dirty, pygame.K_n, hashes),
+	"rally_hard": lambda frames, dirty, hashes=None: scenario_rally(frames, dirty, pygame.K_h, hashes),
+	"rally_expert": lambda frames, dirty, hashes=None: scenario_rally(frames, dirty, pygame.K_x, hashes),
+	"rapid_rematch": scenario_rapid_rematch,
+}
+if pypong.pongmulti is not None:
+	SCENARIOS["rally_multiball"] = lambda frames, dirty, hashes=None: scenario_rally(frames, dirty, pygame.K_m, hashes)
+
+def summarise(times):
+	# statistics of a list of times, in microseconds
+	times = sorted(times)
+	n = len(times)
+	return {
+		"count": n,
+		"mean_us": 1e6*sum(times)/n,
+		"p50_us": 1e6*times[n//2],
+		"p99_us": 1e6*times[min(n-1, int(n*0.99))],
+		"min_us": 1e6*times[0],
+		"max_us": 1e6*times[-1],
+	}
+
+def run(names, frames, dirty, seed):
+	results = {}
+	for name in names:
+		random.seed(seed)		#the game controller seeds each match from the random module, so every run plays the same matches
+		samples = SCENARIOS[name](frames, dirty)
+		results[name] = {component: summarise(times) for component, times in sorted(samples.items())}
+	return results
+
+def frame_hashes(names, frames, dirty, seed):
+	# name -> one hex digest of every frame each scenario drew, the same for two versions of the game that draw the same
+	hashes = {}
+	for name in names:
+		random.seed(seed)
+		bench_hashes = []
+		SCENARIOS[name](frames, dirty, bench_hashes)
+		hashes[name] = hashlib.sha1("".join(bench_hashes).encode()).hexdigest()
+	return hashes
+
+def compare(results, baseline):
+	# print the change in mean time of everything that is in both results and baseline
+	for name, components in results.items():
+		for component, stats in components.items():
+			old = baseline.get("scenarios", {}).get(name, {}).get(component)
+			if old and old["mean_us"]:
+				change = 100*(stats["mean_us"] - old["mean_us"])/old["mean_us"]
+				print("%-16s %-28s %10.2fus -> %10.2fus %+7.1f%%" % (name, component, old["mean_us"], stats["mean_us"], change))
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Time the pypong update and draw paths with no real window.")
+	parser.add_argument("--frames", type=int, default=2000, help="frames to run in each scenario")
+	parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated scenarios to run: " + ", ".join(SCENARIOS))
+	parser.add_argument("--full-redraw", action="store_true", help="fill and update the whole window every frame")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("-o", "--output", help="file to save the results to as JSON")
+	parser.add_argument("--compare", help="JSON results from an earlier run to compare against")
+	parser.add_argument("--frame-hash", action="store_true", help="print a hash of every frame drawn in each scenario instead of timing them")
+	args = parser.parse_args(argv)
+
+	pygame.init()
+	if args.frame_hash:
+		for name, digest in frame_hashes(args.scenarios.split(","), args.frames, not args.full_redraw, args.seed).items():
+			print("%-16s %s" % (name, digest))
+		pygame.quit()
+		return
+	results = run(args.scenarios.split(","), args.frames, not args.full_redraw, args.seed)
+	report = {
+		"python": platform.python_version(),
+		"pygame": pygame.version.ver,
+		"platform": platform.platform(),
+		"video_driver": os.environ["SDL_VIDEODRIVER"],
+		"frames": args.frames,
+		"dirty_rendering": not args.full_redraw,
+		"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"scenarios": results,
+	}
+	for name, components in results.items():
+		for component, stats in components.items():
+			print("%-16s %-28s mean %9.2fus  p50 %9.2fus  p99 %9.2fus" % (name, component, stats["mean_us"], stats["p50_us"], stats["p99_us"]))
+	if args.output:
+		with open(args.output, "w") as out:
+			json.dump(report, out, indent=1)
+	if args.compare:
+		with open(args.compare) as baseline:
+			compare(results, json.load(baseline))
+	pygame.quit()
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,87 @@
+"""Jordan Ogilvy, 'pypong' entity registry. Holds the game objects, and keeps them indexed by type and tag
+so objects can find each other without checking every object in the game. Objects are also connected to the
+event bus while they are in the registry."""
+
+class EntityRegistry:
+	# the objects in the game, in the order they get updated. Iterating over the registry goes through them in that order,
+	# and sees objects added part way through, the same as iterating over a list would.
+	# Every object is also indexed under its class and all of that class's bases, so of_type(Paddle) finds players
+	# and opponents, and under any tags it was added with.
+	# bus: a pongevents.EventBus. Objects with a connect(objects) method get it called with the registry when they are added,
+	# to subscribe to the events they want on get_bus(), and all their handlers are unsubscribed when they are removed.
+	# Objects with a disconnect(objects) method get that called when they are removed, to tidy up anything else they set up
+	def __init__(self, entities=(), bus=None):
+		self.__bus = bus
+		self.__entities = []	#every object, in update order
+		self.__by_type = {}		#class -> list of objects that are instances of it
+		self.__by_tag = {}		#tag -> list of objects added with that tag
+		self.__tags = {}		#id(object) -> the tags it was added with
+		for entity in entities:
+			self.add(entity)
+
+	def get_bus(self):
+		return self.__bus
+
+	def add(self, entity, *tags):
+		self.__entities.append(entity)
+		for cls in type(entity).__mro__[:-1]:	#every class except object
+			self.__by_type.setdefault(cls, []).append(entity)
+		for tag in tags:
+			self.__by_tag.setdefault(tag, []).append(entity)
+		self.__tags[id(entity)] = tags
+		connect = getattr(entity, "connect", None)
+		if self.__bus is not None and connect is not None:
+			connect(self)
+
+	def extend(self, entities):
+		for entity in entities:
+			self.add(entity)
+
+	def remove(self, entity):
+		self.__disconnect(entity)
+		self.__entities.remove(entity)
+		for cls in type(entity).__mro__[:-1]:
+			self.__by_type[cls].remove(entity)
+		for tag in self.__tags.pop(id(entity)):
+			self.__by_tag[tag].remove(entity)
+
+	def __disconnect(self, entity):
+		if self.__bus is None:
+			return
+		self.__bus.unsubscribe_all(entity)
+		disconnect = getattr(entity, "disconnect", None)
+		if disconnect is not None:
+			disconnect(self)
+
+	def clear(self):
+		# the lists are emptied rather than replaced, so a loop part way through the objects stops
+		for entity in self.__entities:
+			self.__disconnect(entity)
+		self.__entities.clear()
+		self.__by_type.clear()
+		self.__by_tag.clear()
+		self.__tags.clear()
+
+	def of_type(self, cls):
+		# all the objects that are instances of cls, in update order. Dont change the returned list
+		return self.__by_type.get(cls, ())
+
+	def first(self, cls):
+		# the first object that is an instance of cls, or None if there isnt one
+		entities = self.__by_type.get(cls)
+		if entities:
+			return entities[0]
+		return None
+
+	def tagged(self, tag):
+		# all the objects added with tag, in update order. Dont change the returned list
+		return self.__by_tag.get(tag, ())
+
+	def __iter__(self):
+		return iter(self.__entities)
+
+	def __len__(self):
+		return len(self.__entities)
+
+	def __contains__(self, entity):
+		return id(entity) in self.__tags
@@ -0,0 +1,245 @@
+"""Jordan Ogilvy, 'pypong' training environments. Lets a learned controller play the player paddle against the usual ai,
+with the reset/step interface of OpenAI Gym: reset gives the first observation, and step takes an action and gives back
+(observation, reward, done, info).
+
+PongEnv is one match at a time on a pongsim.World. VecPongEnv steps lots of matches per call on a pongbatch.BatchWorld,
+with the observations, rewards and dones for all of them in numpy arrays, and finished matches started again by itself.
+Both can draw a match with the same objects pypong draws with, which needs pygame. Nothing else does.
+
+Actions: 0 to stay still, 1 to move up, 2 to move down.
+Observations: OBSERVATION_FIELDS as float32, roughly between -1 and 1, from the player's point of view.
+Rewards: 1 when the player wins a point, -1 when the opponent does.
+
+e.g. python pongenv.py --envs 1,256,4096,16384 --steps 2000		steps per second of each
+"""
+
+import argparse
+import time
+import numpy as np
+import pongsim
+import pongbatch
+
+ACTIONS = ((False, False), (True, False), (False, True))		# action -> (up, down) keys
+OBSERVATION_FIELDS = ("ball_x", "ball_y", "ball_dx", "ball_dy", "player_y", "opponent_y", "serve_countdown")
+OBSERVATION_SIZE = len(OBSERVATION_FIELDS)
+MAX_BALL_SPEED = max(preset["ball_speed"] for preset in pongsim.DIFFICULTY_PRESETS)
+SERVE_WAIT = 2*pongsim.TICK_RATE		# ticks between a point and the next serve, see pongsim.MatchRules
+
+class PongView:
+	# a window with pypong's own paddle, ball and score objects in it, moved to wherever the match being drawn has them.
+	# render_mode is "human" to show the window, or "rgb_array" for draw to return the picture as an (height, width, 3) array
+	def __init__(self, width, height, render_mode="human"):
+		# pygame is only needed here, so environments that are never drawn dont need it
+		import pygame
+		import pongrender
+		import pypong
+		self.__pygame = pygame
+		self.__render_mode = render_mode
+		pygame.init()
+		self.__screen = pygame.display.set_mode((width, height))
+		pygame.display.set_caption("pypong training")
+		self.__renderer = pongrender.DirtyRenderer(self.__screen, (0, 0, 0))
+		self.__player = pypong.Paddle(self.__renderer)
+		self.__opponent = pypong.Paddle(self.__renderer)
+		self.__ball = pypong.Ball(self.__renderer)
+		self.__match = pypong.MatchController(self.__renderer)
+		self.__renderer.add_static(pypong.draw_centre_line)
+		self.__player_x = width-35
+		self.__opponent_x = 15
+
+	def draw(self, player_y, opponent_y, ball_position, scores):
+		self.__player.set_position(self.__player_x, player_y)
+		self.__opponent.set_position(self.__opponent_x, opponent_y)
+		self.__ball.set_position(*ball_position)
+		rules = self.__match.get_rules()
+		rules.set_state(list(scores) + rules.get_state()[2:])
+		self.__pygame.event.pump()		#keeps the window responding
+		self.__renderer.begin_frame()
+		for thing in (self.__match, self.__opponent, self.__player, self.__ball):
+			thing.draw(1.0)
+		self.__renderer.end_frame()
+		if self.__render_mode == "rgb_array":
+			return self.__pygame.surfarray.array3d(self.__screen).transpose(1, 0, 2)
+		return None
+
+	def close(self):
+		self.__pygame.display.quit()
+
+class PongEnv:
+	# one match at a time against the ai. difficulty and predictive pick the ai like pongsim.World.
+	# max_ticks: ticks before a match is cut short (info["truncated"] is set), or None to always play to the end
+	def __init__(self, difficulty=1, predictive=False, max_ticks=None, render_mode=None):
+		self.__difficulty = difficulty
+		self.__predictive = predictive
+		self.__max_ticks = max_ticks
+		self.__render_mode = render_mode
+		self.__world = None
+		self.__observation = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+		self.__view = None
+
+	def get_world(self):
+		return self.__world
+
+	def reset(self, seed=None):
+		# start a new match. Returns the first observation
+		self.__world = pongsim.World(difficulty=self.__difficulty, seed=seed, predictive=self.__predictive)
+		return self.__observe()
+
+	def __observe(self):
+		world = self.__world
+		width, height = world.get_size()
+		ball = world.get_ball()
+		ball_x, ball_y = ball.get_position()
+		velocity, direction = ball.get_velocity(), ball.get_direction()
+		half_ball = ball.get_size()/2
+		half_paddle = world.get_player().get_rect()[3]/2
+		observation = self.__observation
+		observation[0] = (ball_x + half_ball)/width
+		observation[1] = (ball_y + half_ball)/height
+		observation[2] = velocity*np.cos(direction)/MAX_BALL_SPEED
+		observation[3] = -velocity*np.sin(direction)/MAX_BALL_SPEED
+		observation[4] = (world.get_player().get_position()[1] + half_paddle)/height
+		observation[5] = (world.get_opponent().get_position()[1] + half_paddle)/height
+		observation[6] = world.get_rules().get_state()[2]/SERVE_WAIT
+		return observation.copy()
+
+	def step(self, action):
+		# one tick with the player paddle doing action. Returns (observation, reward, done, info)
+		world = self.__world
+		reward = 0.0
+		for event, value in world.step(ACTIONS[action]):
+			if event == pongsim.POINT_SCORED:
+				reward += 1.0 if value == pongsim.PLAYER else -1.0
+		truncated = self.__max_ticks is not None and world.get_tick() >= self.__max_ticks and not world.is_over()
+		done = world.is_over() or truncated
+		info = {"tick": world.get_tick(), "scores": world.get_rules().get_scores(), "truncated": truncated}
+		if self.__render_mode == "human":
+			self.render()
+		return (self.__observe(), reward, done, info)
+
+	def render(self):
+		world = self.__world
+		if self.__view is None:
+			self.__view = PongView(*world.get_size(), render_mode=self.__render_mode or "human")
+		return self.__view.draw(world.get_player().get_position()[1], world.get_opponent().get_position()[1],
+			world.get_ball().get_position(), world.get_rules().get_scores())
+
+	def close(self):
+		if self.__view is not None:
+			self.__view.close()
+			self.__view = None
+
+class VecPongEnv:
+	# n matches against the ai, all stepped together by one step call. A match that finishes is started again straight
+	# away, and the observation returned for it is the first of the new match, with the last one of the old match in
+	# info["terminal_observation"]. The arrays returned are reused by the next step, so copy any that need keeping.
+	# difficulty is 0-2 for every match, or a sequence with one per match
+	def __init__(self, n, difficulty=1, predictive=False, max_ticks=None, seed=None):
+		self.__n = n
+		self.__difficulty = difficulty
+		self.__predictive = predictive
+		self.__max_ticks = max_ticks
+		self.__batch = pongbatch.BatchWorld(n, difficulty=difficulty, seed=seed, predictive=predictive)
+		width, height = self.__batch.get_size()
+		# added to the positions and then divided into everything, to give the centres of the ball and paddles as fractions
+		self.__scale = np.array([width, height, MAX_BALL_SPEED, MAX_BALL_SPEED, height, height, SERVE_WAIT], dtype=np.float32)
+		half_ball = pongsim.BallBody(width, height).get_size()/2
+		half_paddle = pongsim.PaddleBody().get_rect()[3]/2
+		self.__offset = np.array([half_ball, half_ball, 0, 0, half_paddle, half_paddle, 0], dtype=np.float32)
+		# made once, and filled in every step
+		self.__observations = np.zeros((n, OBSERVATION_SIZE), dtype=np.float32)
+		self.__terminal = np.zeros((n, OBSERVATION_SIZE), dtype=np.float32)
+		self.__rewards = np.zeros(n, dtype=np.float32)
+		self.__scores = np.zeros((n, 2), dtype=np.int64)
+		self.__view = None
+
+	def __len__(self):
+		return self.__n
+
+	def get_batch(self):
+		return self.__batch
+
+	def reset(self, seed=None):
+		# start every match again. Returns the (n, OBSERVATION_SIZE) observations
+		if seed is not None:
+			self.__batch = pongbatch.BatchWorld(self.__n, difficulty=self.__difficulty, seed=seed, predictive=self.__predictive)
+		else:
+			self.__batch.reset()
+		self.__scores[:] = 0
+		return self.__observe(self.__observations)
+
+	def __observe(self, out):
+		batch = self.__batch
+		out[:, 0:2] = batch.get_ball_positions()
+		out[:, 2:4] = batch.get_ball_velocities()
+		out[:, 4:6] = batch.get_paddle_positions()
+		out[:, 6] = batch.get_serve_countdowns()
+		out += self.__offset
+		out /= self.__scale
+		return out
+
+	def step(self, actions):
+		# one tick of every match. actions is an array of n actions. Returns (observations, rewards, dones, info), where
+		# dones is True for the matches that just finished and have started again
+		actions = np.asarray(actions)
+		batch = self.__batch
+		batch.step(actions == 1, actions == 2)
+		scores = batch.get_scores()
+		np.subtract(scores[:, 0] - self.__scores[:, 0], scores[:, 1] - self.__scores[:, 1], out=self.__rewards, casting="unsafe")
+		self.__scores = scores
+		over = batch.is_over()
+		truncated = np.zeros(self.__n, dtype=bool)
+		if self.__max_ticks is not None:
+			truncated = ~over & (batch.get_ticks() >= self.__max_ticks)
+		dones = over | truncated
+		self.__observe(self.__observations)
+		if dones.any():
+			self.__terminal[dones] = self.__observations[dones]
+			batch.reset(dones)
+			self.__scores[dones] = 0
+			self.__observe(self.__observations)
+		return (self.__observations, self.__rewards, dones, {"truncated": truncated, "terminal_observation": self.__terminal})
+
+	def render(self, index=0, render_mode="human"):
+		# draw match index
+		if self.__view is None:
+			self.__view = PongView(*self.__batch.get_size(), render_mode=render_mode)
+		player_y, opponent_y = self.__batch.get_paddle_positions()[index]
+		return self.__view.draw(player_y, opponent_y, tuple(self.__batch.get_ball_positions()[index]), self.__batch.get_scores()[index])
+
+	def close(self):
+		if self.__view is not None:
+			self.__view.close()
+			self.__view = None
+
+def benchmark(n, steps, seed=0):
+	# steps per second of random actions through PongEnv if n is 1, or VecPongEnv with n matches otherwise
+	rng = np.random.default_rng(seed)
+	if n == 1:
+		env = PongEnv()
+		env.reset(seed)
+		actions = rng.integers(0, len(ACTIONS), steps).tolist()
+		start = time.perf_counter()
+		for action in actions:
+			observation, reward, done, info = env.step(action)
+			if done:
+				env.reset()
+	else:
+		env = VecPongEnv(n, seed=seed)
+		env.reset()
+		actions = rng.integers(0, len(ACTIONS), (steps, n))
+		start = time.perf_counter()
+		for tick_actions in actions:
+			env.step(tick_actions)
+	return n*steps/(time.perf_counter() - start)
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Time the pypong training environments, in environment steps per second on one core.")
+	parser.add_argument("--envs", default="1,64,1024,16384", help="comma separated numbers of environments. 1 times PongEnv, more times VecPongEnv")
+	parser.add_argument("--steps", type=int, default=2000, help="steps of each to time")
+	args = parser.parse_args(argv)
+	for n in [int(n) for n in args.envs.split(",")]:
+		print("%6d envs  %12.0f steps/s" % (n, benchmark(n, args.steps)))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,71 @@
+"""Jordan Ogilvy, 'pypong' event bus. Objects subscribe to the kinds of event they care about, and each event goes
+straight to its subscribers through a lookup table, instead of every object looking through every event.
+
+Two sorts of thing go through the bus:
+	pygame events, sent with publish(event). Subscribe to an event type, or to a key with KEYDOWN/KEYUP and key=...
+	signals from the game itself, sent with emit(signal, value). The signals are the pongsim event types
+	(PADDLE_HIT, POINT_SCORED, SERVE, MATCH_OVER), and are handled straight away, not posted to pygame's event queue
+"""
+
+class EventBus:
+	def __init__(self):
+		self.__handlers = {}	#(event type or signal, key or None) -> list of handlers, in the order they subscribed
+
+	def subscribe(self, event_type, handler, key=None):
+		# call handler(event) for every pygame event of event_type, or only the ones for key if it is given.
+		# for a signal, handler(value) is called every time it is emitted
+		self.__handlers.setdefault((event_type, key), []).append(handler)
+
+	def unsubscribe(self, event_type, handler, key=None):
+		handlers = self.__handlers.get((event_type, key))
+		if handlers and handler in handlers:
+			handlers.remove(handler)
+			if not handlers:
+				del self.__handlers[(event_type, key)]
+
+	def unsubscribe_all(self, owner):
+		# remove every handler that is a method of owner. Used when an object leaves the game
+		for slot in list(self.__handlers):
+			handlers = [handler for handler in self.__handlers[slot] if getattr(handler, "__self__", None) is not owner]
+			if handlers:
+				self.__handlers[slot] = handlers
+			else:
+				del self.__handlers[slot]
+
+	def publish(self, event):
+		# send a pygame event to its subscribers. Returns the number of handlers it went to
+		handled = 0
+		handlers = self.__handlers.get((event.type, None))
+		if handlers:
+			# copied, because a handler can subscribe or unsubscribe things, even itself. The copy is what gets counted too,
+			# as the list can be emptied and replaced by the time the handlers are done
+			handlers = tuple(handlers)
+			for handler in handlers:
+				handler(event)
+			handled += len(handlers)
+		key = getattr(event, "key", None)
+		if key is not None:
+			handlers = self.__handlers.get((event.type, key))
+			if handlers:
+				handlers = tuple(handlers)
+				for handler in handlers:
+					handler(event)
+				handled += len(handlers)
+		return handled
+
+	def publish_all(self, events):
+		for event in events:
+			self.publish(event)
+
+	def emit(self, signal, value=None):
+		# send a signal from the game to its subscribers straight away. Returns the number of handlers it went to
+		handlers = self.__handlers.get((signal, None))
+		if not handlers:
+			return 0
+		handlers = tuple(handlers)
+		for handler in handlers:
+			handler(value)
+		return len(handlers)
+
+	def get_subscriber_count(self):
+		return sum(len(handlers) for handlers in self.__handlers.values())
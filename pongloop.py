@@ -0,0 +1,275 @@
+"""Jordan Ogilvy, 'pypong' game loop timing. Runs the simulation at a fixed tick rate, separate from how often
+frames get drawn, so the game plays at the same speed however fast the machine draws, and can play faster than real time.
+FramePacer decides when each frame starts and goes on the screen, and measures how even the frames are and how old the
+input is by the time it is on the screen.
+
+e.g. python pongloop.py --work 4		compare the pacing strategies with 4ms of pretend work a frame
+"""
+
+import argparse
+import math
+import random
+import time
+import pongsim
+from myqueue import MyQueue
+
+class FixedStepLoop:
+	# tells the game loop how many ticks to run each frame. Real time is saved up between frames, and a tick runs for
+	# every whole tick time saved up. Whatever is left over is how far the frame is between the last tick and the next,
+	# for drawing things part way between the two.
+	# time_scale: how many times faster than real time the simulation runs. 100 runs 100 ticks of game time per tick of real time.
+	# max_frame_time: the most real time in seconds one frame can add, so one long hitch doesnt cause a flood of ticks
+	# uncapped_ticks: if set, every frame runs exactly this many ticks however much time passed, as fast as the machine allows
+	def __init__(self, tick_rate=pongsim.TICK_RATE, time_scale=1.0, max_frame_time=0.25, uncapped_ticks=None):
+		self.__tick_time = 1/tick_rate		#seconds of game time per tick
+		self.__time_scale = time_scale
+		self.__max_frame_time = max_frame_time
+		self.__uncapped_ticks = uncapped_ticks
+		self.__accumulator = 0.0	#game time saved up that hasnt been ticked yet, in seconds
+		self.__ticks = 0			#ticks run so far
+
+	def set_time_scale(self, new_scale):
+		self.__time_scale = new_scale
+
+	def get_time_scale(self):
+		return self.__time_scale
+
+	def set_uncapped_ticks(self, ticks):
+		# None to go back to running in time with the clock
+		self.__uncapped_ticks = ticks
+		self.__accumulator = 0.0
+
+	def get_tick_time(self):
+		return self.__tick_time
+
+	def get_tick_count(self):
+		return self.__ticks
+
+	def advance(self, frame_time):
+		# called once a frame with the real time in seconds since the last frame. Returns the number of ticks to run
+		if self.__uncapped_ticks is not None:
+			ticks = self.__uncapped_ticks
+		else:
+			self.__accumulator += min(frame_time, self.__max_frame_time)*self.__time_scale
+			ticks = int(self.__accumulator // self.__tick_time)
+			self.__accumulator -= ticks*self.__tick_time
+		self.__ticks += ticks
+		return ticks
+
+	def get_alpha(self):
+		# how far between the last tick and the next this frame is, from 0 to 1
+		if self.__uncapped_ticks is not None:
+			return 1.0
+		return self.__accumulator/self.__tick_time
+
+def run_headless(world, ticks, controller=None):
+	# step a pongsim.World for up to ticks ticks with nothing drawn and no waiting, or until the match is over.
+	# controller(world) returns the (up, down) inputs for each tick, or the player paddle sits still if it is None.
+	# Returns (ticks run, how many times faster than real time they ran)
+	start = time.perf_counter()
+	ran = 0
+	while ran < ticks and not world.is_over():
+		if controller is None:
+			world.step()
+		else:
+			world.step(controller(world))
+		ran += 1
+	elapsed = time.perf_counter() - start
+	if elapsed == 0:
+		return (ran, float("inf"))
+	return (ran, ran/pongsim.TICK_RATE/elapsed)
+
+PACING_STRATEGIES = ("sleep", "hybrid", "vsync")
+
+def percentile(values, percent):
+	# the value percent of values are at or under, 0 if there arent any
+	values = sorted(values)
+	if not values:
+		return 0.0
+	return values[min(len(values)-1, int(len(values)*percent/100))]
+
+class FramePacer:
+	# decides when each frame starts and when it goes on the screen. Each frame calls wait_for_input before reading
+	# the input, wait_for_present once it is drawn, and presented once it is on the screen.
+	# strategy:
+	#	"sleep": time.sleep until it is time. Costs nothing, but the OS can wake the game a millisecond or more late
+	#	"hybrid": sleep until spin seconds before it is time, then watch the clock until it is. On time, for a little cpu
+	#	"vsync": the display waits for the screen to refresh when the frame is presented, so only the input is waited for.
+	#		If the frames go on the screen a lot faster than frame_rate the display isnt waiting, so it changes to "hybrid"
+	# late_input: do the waiting before the input is read rather than before the frame is presented, so the frame starts
+	#	as late as it can and still be on the screen in time, and the input is as fresh as it can be. Without it all
+	#	the waiting is at the start of the frame, the way pygame.time.Clock.tick does it
+	# safety: seconds more than the recent frames took to allow for this one, when starting late
+	# history: how many frames the measurements are kept for
+	def __init__(self, strategy="hybrid", frame_rate=60, late_input=True, spin=0.002, safety=0.002, history=600):
+		if strategy not in PACING_STRATEGIES:
+			raise ValueError("strategy must be one of " + ", ".join(PACING_STRATEGIES))
+		self.__strategy = strategy
+		self.__frame_time = 1/frame_rate	#seconds between frames. With vsync, measured from the refreshes once there are some
+		self.__nominal_frame_time = self.__frame_time
+		self.__late_input = late_input
+		self.__spin = spin
+		self.__safety = safety
+		self.__next_present = None		#time.perf_counter() the next frame is due on the screen
+		self.__last_sample = None		#when the input was last read
+		self.__sampled = 0.0			#when the input for this frame was read
+		self.__last_present = None
+		self.__work = MyQueue(history, typecode="d")		#seconds from reading the input to being ready to present
+		self.__intervals = MyQueue(history, typecode="d")	#seconds between frames going on the screen
+		self.__latencies = MyQueue(history, typecode="d")	#seconds from reading the input to the frame being on the screen
+		self.__gaps = MyQueue(history, typecode="d")		#seconds between reading the input
+		self.__predicted_work = 0.0		#seconds a frame is expected to take, worked out again every so often
+		self.__frames = 0
+		self.__missed = 0				#frames that were on the screen later than they were due
+
+	def get_strategy(self):
+		return self.__strategy
+
+	def __wait_until(self, deadline):
+		if self.__strategy == "sleep":
+			remaining = deadline - time.perf_counter()
+			if remaining > 0:
+				time.sleep(remaining)
+			return
+		remaining = deadline - time.perf_counter() - self.__spin
+		if remaining > 0:
+			time.sleep(remaining)
+		while time.perf_counter() < deadline:
+			pass
+
+	def wait_for_input(self):
+		# wait until it is time to read the input for the next frame. Returns the seconds since the input was last read,
+		# for FixedStepLoop.advance
+		now = time.perf_counter()
+		if self.__next_present is None:
+			self.__next_present = now + self.__frame_time
+		if self.__late_input:
+			if len(self.__work) < 30:
+				self.__predicted_work = self.__frame_time		#not enough frames yet to know, so start straight away
+			elif self.__frames % 30 == 0:
+				self.__predicted_work = percentile(self.__work, 95)
+			self.__wait_until(self.__next_present - min(self.__predicted_work + self.__safety, self.__frame_time))
+		elif self.__last_sample is not None:
+			self.__wait_until(self.__last_sample + self.__frame_time)
+		self.__sampled = time.perf_counter()
+		since_last = 0.0
+		if self.__last_sample is not None:
+			since_last = self.__sampled - self.__last_sample
+			self.__gaps.enqueue(since_last)
+		self.__last_sample = self.__sampled
+		return since_last
+
+	def wait_for_present(self):
+		# the frame is drawn. Wait until it is due on the screen, unless vsync will
+		self.__work.enqueue(time.perf_counter() - self.__sampled)
+		if self.__late_input and self.__strategy != "vsync":
+			self.__wait_until(self.__next_present)
+
+	def presented(self):
+		# the frame is on the screen
+		now = time.perf_counter()
+		self.__frames += 1
+		self.__latencies.enqueue(now - self.__sampled)
+		if self.__last_present is not None:
+			interval = now - self.__last_present
+			self.__intervals.enqueue(interval)
+			if self.__strategy == "vsync":
+				if interval < 1.5*self.__frame_time:
+					# the refreshes set the pace, so follow them, ignoring the frames that missed one
+					self.__frame_time += (interval - self.__frame_time)/16
+				else:
+					self.__missed += 1
+				if self.__frame_time < self.__nominal_frame_time/2:
+					# nothing is waiting for the refreshes, so pace the frames here instead
+					self.__strategy = "hybrid"
+					self.__frame_time = self.__nominal_frame_time
+		self.__last_present = now
+		if self.__strategy == "vsync":
+			self.__next_present = now + self.__frame_time
+			return
+		if self.__late_input and now > self.__next_present + 0.001:
+			self.__missed += 1
+		self.__next_present += self.__frame_time
+		if self.__next_present < now:
+			self.__next_present = now + self.__frame_time		#fell behind, so carry on from now instead of rushing to catch up
+
+	def get_fps(self):
+		if not self.__intervals:
+			return 0.0
+		return len(self.__intervals)/sum(self.__intervals)
+
+	def get_report(self):
+		# how the recent frames went, in milliseconds. jitter is the standard deviation of the time between frames.
+		# input_latency is how long a key press waits to be on the screen, on average: from reading the input to presenting,
+		# plus half the time between reads, because on average a key goes down half way between them
+		intervals = list(self.__intervals)
+		latencies = list(self.__latencies)
+		gaps = list(self.__gaps)
+		mean_interval = sum(intervals)/len(intervals) if intervals else 0.0
+		mean_latency = sum(latencies)/len(latencies) if latencies else 0.0
+		mean_gap = sum(gaps)/len(gaps) if gaps else 0.0
+		jitter = math.sqrt(sum((interval - mean_interval)**2 for interval in intervals)/len(intervals)) if intervals else 0.0
+		return {
+			"strategy": self.__strategy,
+			"late_input": self.__late_input,
+			"fps": self.get_fps(),
+			"interval_p50": 1000*percentile(intervals, 50),
+			"interval_p99": 1000*percentile(intervals, 99),
+			"jitter": 1000*jitter,
+			"present_latency": 1000*mean_latency,
+			"present_latency_p99": 1000*percentile(latencies, 99),
+			"input_latency": 1000*(mean_latency + mean_gap/2),
+			"missed": self.__missed,
+		}
+
+	def describe(self):
+		# get_report as one line
+		report = self.get_report()
+		return ("%(strategy)s%(late)s: %(fps).1f fps, frame p50 %(interval_p50).2fms p99 %(interval_p99).2fms, jitter %(jitter).2fms, "
+			"input to screen %(input_latency).2fms (read to present %(present_latency).2fms, p99 %(present_latency_p99).2fms), "
+			"%(missed)d missed") % dict(report, late=", late input" if report["late_input"] else "")
+
+def pretend_frame(work, rng):
+	# keep the cpu busy for about work seconds, give or take half, like drawing a frame would
+	end = time.perf_counter() + work*rng.uniform(0.5, 1.5)
+	while time.perf_counter() < end:
+		pass
+
+def pretend_vsync(start, refresh_time):
+	# wait for the next refresh of a pretend screen that refreshes every refresh_time seconds from start, like presenting
+	# a frame with vsync on does
+	now = time.perf_counter()
+	refresh = start + math.ceil((now - start)/refresh_time)*refresh_time
+	remaining = refresh - now - 0.002
+	if remaining > 0:
+		time.sleep(remaining)
+	while time.perf_counter() < refresh:
+		pass
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Compare the frame pacing strategies with pretend frames, and no window. "
+		"vsync is a pretend screen that refreshes at the frame rate.")
+	parser.add_argument("--seconds", type=float, default=3, help="seconds to run each strategy for")
+	parser.add_argument("--work", type=float, default=4, help="milliseconds of work in a frame, give or take half")
+	parser.add_argument("--frame-rate", type=int, default=60)
+	args = parser.parse_args(argv)
+
+	rng = random.Random(0)
+	# the measurements only cover the last three quarters of each run, leaving out the first frames, before the pacer
+	# knows how long a frame takes
+	history = int(0.75*args.seconds*args.frame_rate)
+	pacers = [FramePacer(strategy, args.frame_rate, late_input, history=history) for strategy in PACING_STRATEGIES
+		for late_input in (False, True)]
+	for pacer in pacers:
+		start = time.perf_counter()
+		while time.perf_counter() < start + args.seconds:
+			pacer.wait_for_input()
+			pretend_frame(args.work/1000, rng)
+			pacer.wait_for_present()
+			if pacer.get_strategy() == "vsync":
+				pretend_vsync(start, 1/args.frame_rate)
+			pacer.presented()
+		print(pacer.describe())
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,287 @@
+"""Jordan Ogilvy, 'pypong' multiball. Keeps hundreds or thousands of balls in numpy arrays and moves them all at once,
+bouncing them off the walls, the paddles and, optionally, each other.
+
+Checking every ball against every other ball is n squared, so the balls are put in a grid of ball sized cells first
+(the broad phase). Two balls can only touch if they are in the same or neighbouring cells, and a paddle can only touch
+the balls in the columns of cells it covers, so only those get the exact check (the narrow phase). With the balls only
+bouncing off the two paddles, checking every ball against both is already linear and quicker than sorting them into
+the grid, so the grid is only made when the balls bounce off each other.
+
+e.g. python pongmulti.py --balls 100,1000,10000 --collisions
+"""
+
+import argparse
+import math
+import time
+import numpy as np
+import pongsim
+
+# the cells next to a cell that the pairs are found in: (columns across, rows down). Together with the cell itself these
+# cover all 8 neighbours, with each pair of cells only checked once
+NEIGHBOURS = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+class BallSwarm:
+	# count balls on a width x height playfield. Each ball waits in the middle, is served like the ball in pongsim.MatchRules,
+	# and goes back to the middle to be served again when it gets past a paddle.
+	# ball_collisions: bounce the balls off each other as well as the walls and paddles
+	# broad_phase: find what might be touching with the grid. False checks everything against everything, for comparing
+	def __init__(self, count, width=pongsim.FIELD_SIZE[0], height=pongsim.FIELD_SIZE[1], ball_speed=12, max_serve_angle=math.pi/18,
+			ball_collisions=False, broad_phase=True, seed=None):
+		self.__n = count
+		self.__width = width
+		self.__height = height
+		self.__ball_speed = ball_speed
+		self.__max_serve_angle = max_serve_angle
+		self.__ball_collisions = ball_collisions
+		self.__broad_phase = broad_phase
+		self.__rng = np.random.default_rng(seed)
+		self.__size = 16		#every ball is a 16 pixel square, the same as pongsim.BallBody
+		self.__max_bounce_angle = math.pi/5
+		self.__restart_wait_ticks = 2*pongsim.TICK_RATE
+		# grid cells are the size of a ball, with a row and column of cells all round for balls that are off the playfield
+		self.__cell = self.__size
+		self.__rows = int(math.ceil(height/self.__cell)) + 2
+		self.__columns = int(math.ceil(width/self.__cell)) + 2
+		self.__pair_checks = 0		#narrow phase checks in the last step, to see how much work the broad phase saved
+		# the top left corner and velocity in pixels per tick of each ball, and ticks until each waiting ball is served
+		self.__x = np.zeros(count)
+		self.__y = np.zeros(count)
+		self.__vx = np.zeros(count)
+		self.__vy = np.zeros(count)
+		self.__countdown = np.zeros(count, dtype=np.int64)
+		self.reset()
+
+	def reset(self, seed=None):
+		# every ball back to the middle, spread up the centre line. They are served over a couple of seconds instead of all at once.
+		# With seed set the random numbers start again from it, so the same seed serves the same balls
+		if seed is not None:
+			self.__rng = np.random.default_rng(seed)
+		self.__x[:] = self.__width//2 - self.__size//2
+		self.__y[:] = self.__rng.uniform(0, self.__height - self.__size, self.__n)
+		self.__vx[:] = 0
+		self.__vy[:] = 0
+		self.__countdown[:] = self.__restart_wait_ticks + self.__rng.integers(0, self.__restart_wait_ticks, self.__n)
+
+	def set_ball_speed(self, new_speed):
+		self.__ball_speed = new_speed
+
+	def set_max_serve_angle(self, new_angle):
+		self.__max_serve_angle = new_angle
+
+	def set_ball_collisions(self, ball_collisions):
+		self.__ball_collisions = ball_collisions
+
+	def __len__(self):
+		return self.__n
+
+	def get_size(self):
+		return self.__size
+
+	def get_positions(self):
+		# the x and y arrays of the top left corners. Dont change them
+		return (self.__x, self.__y)
+
+	def get_pair_checks(self):
+		return self.__pair_checks
+
+	def get_threat(self, paddle_x):
+		# the index of the ball that will get to paddle_x soonest, or None if no ball is heading that way
+		moving = self.__vx < 0 if paddle_x < self.__width/2 else self.__vx > 0
+		in_play = moving & (self.__x > 0) & (self.__x < self.__width)
+		if not in_play.any():
+			return None
+		with np.errstate(divide="ignore", invalid="ignore"):
+			arrival = np.where(in_play, (paddle_x - self.__x)/self.__vx, np.inf)
+		return int(np.argmin(arrival))
+
+	def get_ball_state(self, i):
+		# [x, y, velocity, direction] of ball i, the way pongsim.BallBody.get_state has it
+		vx, vy = float(self.__vx[i]), float(self.__vy[i])
+		return [float(self.__x[i]), float(self.__y[i]), math.hypot(vx, vy), math.atan2(-vy, vx)]
+
+	def __aim(self, which, base_direction, max_angle, speed):
+		# point the balls selected by which in base_direction, give or take a random angle up to max_angle
+		direction = base_direction + max_angle - self.__rng.uniform(0, 2*max_angle, len(base_direction))
+		self.__vx[which] = speed*np.cos(direction)
+		self.__vy[which] = -speed*np.sin(direction)		#the screen has 0 at the top, so up is negative y
+
+	def __grid(self, next_x, next_y):
+		# the cell each ball is in, as one number, in column order so each column of cells is one run of the sorted numbers.
+		# Returns (the balls in cell order, their sorted cell numbers)
+		column = np.clip((next_x // self.__cell).astype(np.int64) + 1, 0, self.__columns - 1)
+		row = np.clip((next_y // self.__cell).astype(np.int64) + 1, 0, self.__rows - 1)
+		cells = column*self.__rows + row
+		order = np.argsort(cells, kind="stable")
+		return order, cells[order]
+
+	def __paddle_candidates(self, rect, order, cells):
+		# the balls in the columns of cells that a ball touching the paddle rect could be in
+		x, y, w, h = rect
+		first = int((x - self.__size) // self.__cell) + 1
+		last = int((x + w) // self.__cell) + 1
+		start, end = np.searchsorted(cells, (first*self.__rows, (last+1)*self.__rows))
+		return order[start:end]
+
+	def __paddle_contacts(self, paddles, next_x, next_y, order, cells):
+		hits = 0
+		size = self.__size
+		for rect in paddles:
+			if order is None:
+				candidates = np.arange(self.__n)
+			else:
+				candidates = self.__paddle_candidates(rect, order, cells)
+			self.__pair_checks += len(candidates)
+			x, y, w, h = rect
+			nx, ny = next_x[candidates], next_y[candidates]
+			#AABB collision check at the balls next positions, the same as pongsim.BallBody
+			touching = ~((x > nx+size) | (x+w < nx) | (ny+size < y) | (ny > y+h))
+			hit = candidates[touching]
+			if len(hit):
+				# bounce back the other way in a random cone, keeping the speed each ball had
+				speed = np.hypot(self.__vx[hit], self.__vy[hit])
+				self.__aim(hit, np.where(self.__vx[hit] < 0, 0, math.pi), self.__max_bounce_angle, speed)
+				hits += len(hit)
+		return hits
+
+	def __candidate_pairs(self, cells):
+		# every pair of balls in the same or neighbouring cells, as two arrays of positions in the sorted order
+		n = len(cells)
+		index = np.arange(n)
+		firsts = []
+		seconds = []
+		# the same cell: each ball with the balls after it in the cell
+		self.__expand(index, index + 1, np.searchsorted(cells, cells, side="right"), firsts, seconds)
+		for across, down in NEIGHBOURS:
+			neighbour = cells + across*self.__rows + down
+			start = np.searchsorted(cells, neighbour, side="left")
+			end = np.searchsorted(cells, neighbour, side="right")
+			self.__expand(index, start, end, firsts, seconds)
+		if not firsts:
+			return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+		return np.concatenate(firsts), np.concatenate(seconds)
+
+	def __expand(self, index, start, end, firsts, seconds):
+		# pair each index[i] with every position from start[i] up to end[i], without a python loop
+		counts = np.maximum(end - start, 0)
+		total = int(counts.sum())
+		if total == 0:
+			return
+		firsts.append(np.repeat(index, counts))
+		run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+		seconds.append(np.repeat(start, counts) + np.arange(total) - run_starts)
+
+	def __touching_pairs(self, next_x, next_y, order, cells):
+		# (first, second, dx, dy) of every pair of balls that overlap at next_x, next_y, found from the grid, or by
+		# checking everything against everything if order is None
+		if order is None:
+			first, second = np.triu_indices(self.__n, 1)
+		else:
+			first, second = self.__candidate_pairs(cells)
+			first, second = order[first], order[second]
+		self.__pair_checks += len(first)
+		dx = next_x[second] - next_x[first]
+		dy = next_y[second] - next_y[first]
+		touching = (np.abs(dx) < self.__size) & (np.abs(dy) < self.__size)
+		return first[touching], second[touching], dx[touching], dy[touching]
+
+	def get_touching_pairs(self):
+		# a set of (i, j) with i < j for every pair of balls that overlap where they are now, found the way step finds them
+		self.__pair_checks = 0
+		order = cells = None
+		if self.__broad_phase:
+			order, cells = self.__grid(self.__x, self.__y)
+		first, second, dx, dy = self.__touching_pairs(self.__x, self.__y, order, cells)
+		return set(zip(np.minimum(first, second).tolist(), np.maximum(first, second).tolist()))
+
+	def __ball_contacts(self, next_x, next_y, order, cells):
+		first, second, dx, dy = self.__touching_pairs(next_x, next_y, order, cells)
+		distance = np.hypot(dx, dy)
+		# only balls heading towards each other bounce, so touching balls dont stick together
+		apart = distance > 0
+		normal_x = np.where(apart, dx/np.where(apart, distance, 1), 0)
+		normal_y = np.where(apart, dy/np.where(apart, distance, 1), 0)
+		closing = (self.__vx[second] - self.__vx[first])*normal_x + (self.__vy[second] - self.__vy[first])*normal_y
+		closing = np.minimum(closing, 0)
+		# equal mass balls swap the parts of their velocities along the line between them
+		np.add.at(self.__vx, first, closing*normal_x)
+		np.add.at(self.__vy, first, closing*normal_y)
+		np.add.at(self.__vx, second, -closing*normal_x)
+		np.add.at(self.__vy, second, -closing*normal_y)
+
+	def step(self, paddles):
+		# move every ball one tick. paddles is a list of (x, y, width, height) rects.
+		# Returns (paddle hits, points for the player, points for the opponent) in this tick
+		self.__pair_checks = 0
+		waiting = self.__countdown > 0
+		self.__countdown -= waiting
+		serve = np.flatnonzero(waiting & (self.__countdown == 0))
+		if len(serve):
+			base_direction = np.where(self.__rng.random(len(serve)) < 0.5, 0, math.pi)
+			self.__aim(serve, base_direction, self.__max_serve_angle, self.__ball_speed)
+
+		next_x = self.__x + self.__vx
+		next_y = self.__y + self.__vy
+		wall = (next_y < 0) | (next_y > self.__height - self.__size)
+		self.__vy[wall] = -self.__vy[wall]
+
+		order = cells = None
+		if self.__broad_phase and self.__ball_collisions:
+			order, cells = self.__grid(next_x, next_y)
+		hits = self.__paddle_contacts(paddles, next_x, next_y, order, cells)
+		if self.__ball_collisions:
+			# waiting balls sit still in the middle, so leave them out
+			moving = ~(self.__countdown > 0)
+			if self.__broad_phase:
+				keep = moving[order]
+				self.__ball_contacts(np.where(moving, next_x, 0), next_y, order[keep], cells[keep])
+			else:
+				self.__ball_contacts(np.where(moving, next_x, -1e9), next_y, None, None)
+
+		self.__x += self.__vx
+		self.__y += self.__vy
+
+		# balls past a paddle score a point and go back to the middle to wait for their next serve
+		player_point = self.__x < 0
+		opponent_point = self.__x > self.__width
+		out = player_point | opponent_point
+		if out.any():
+			self.__x[out] = self.__width//2 - self.__size//2
+			self.__y[out] = self.__rng.uniform(0, self.__height - self.__size, int(np.count_nonzero(out)))
+			self.__vx[out] = 0
+			self.__vy[out] = 0
+			self.__countdown[out] = self.__restart_wait_ticks
+		return (hits, int(np.count_nonzero(player_point)), int(np.count_nonzero(opponent_point)))
+
+def run(count, ticks, ball_collisions, broad_phase, seed=0):
+	# step a swarm of count balls for ticks ticks against two paddles that follow the middle of the field.
+	# Returns (seconds taken, paddle hits, average narrow phase checks per tick)
+	swarm = BallSwarm(count, ball_collisions=ball_collisions, broad_phase=broad_phase, seed=seed)
+	width, height = pongsim.FIELD_SIZE
+	paddles = [(15, height//2 - 40, 15, 80), (width - 35, height//2 - 40, 15, 80)]
+	hits = 0
+	checks = 0
+	start = time.perf_counter()
+	for tick in range(ticks):
+		hits += swarm.step(paddles)[0]
+		checks += swarm.get_pair_checks()
+	return (time.perf_counter() - start, hits, checks/ticks)
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Time the multiball physics with different numbers of balls.")
+	parser.add_argument("--balls", default="100,1000,5000", help="comma separated ball counts to try")
+	parser.add_argument("--ticks", type=int, default=600, help="ticks to run each count for")
+	parser.add_argument("--collisions", action="store_true", help="bounce the balls off each other too")
+	parser.add_argument("--naive-limit", type=int, default=3000, help="biggest count to also run without the broad phase")
+	args = parser.parse_args(argv)
+
+	for count in [int(balls) for balls in args.balls.split(",")]:
+		for broad_phase in (True, False):
+			if not broad_phase and count > args.naive_limit:
+				continue
+			seconds, hits, checks = run(count, args.ticks, args.collisions, broad_phase)
+			print("%6d balls %-11s %8.1f ticks/s %12.0f ball ticks/s %10.0f checks/tick %7d hits  (%.0f%% of a 60fps frame)" % (
+				count, "grid" if broad_phase else "everything", args.ticks/seconds, count*args.ticks/seconds, checks, hits,
+				100*seconds/args.ticks*pongsim.TICK_RATE))
+
+if __name__ == "__main__":
+	main()
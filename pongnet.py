@@ -0,0 +1,760 @@
+"""Jordan Ogilvy, 'pypong' network play. Two people play each other over the network, with a server running the match.
+The server is in charge: it runs the only real pongsim.World, and the clients just send it the keys they are pressing
+each tick. Every tick it sends each client the state of the match as a delta, only the fields that changed since the last
+state that client said it got, so a tick where only the ball moved costs a few bytes. Clients dont wait to hear back
+from the server before their own paddle moves. Each one runs its own World ahead of the server, playing the inputs the
+server hasnt used yet on top of every state it sends (prediction and reconciliation).
+
+Everything goes over UDP with asyncio. Any datagram can be lost, so the last few inputs go in every input message, and
+deltas are only ever made from a state the client has said it has.
+
+e.g. python pongnet.py loopback --seconds 20 --lag 40		a server and two bots on localhost, printing bandwidth and latency
+	 python pongnet.py serve --port 5757
+	 python pypong.py --connect 127.0.0.1:5757
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import struct
+import threading
+import time
+from collections import deque
+import pongsim
+from pongreplay import pack_inputs, unpack_inputs
+
+DEFAULT_PORT = 5757
+
+# message types, the first byte of every datagram. The rest of each message is described by the struct next to it
+JOIN = 1		# client -> server, nothing else. Sent until the server answers with WELCOME or FULL
+WELCOME = 2		# server -> client: the side the client plays (an index into SIDES) and the difficulty
+FULL = 3		# server -> client, nothing else. Two people are already playing
+INPUT = 4		# client -> server: number of the newest input, tick of the newest state received, how many inputs follow,
+				# then that many bytes from pack_inputs, oldest first
+STATE = 5		# server -> client: tick, tick of the state it is a delta from (NO_BASELINE for a full state), number of the
+				# newest input of that client used, a bit for each field in FIELDS that was sent, then the fields that were
+PING = 6		# client -> server: the time it was sent. The server sends it straight back as a PONG
+PONG = 7
+LEAVE = 8		# client -> server, nothing else
+
+WELCOME_MESSAGE = struct.Struct("<BBB")
+INPUT_HEADER = struct.Struct("<BIIB")
+STATE_HEADER = struct.Struct("<BIIIH")
+PING_MESSAGE = struct.Struct("<Bd")
+NO_BASELINE = 0xFFFFFFFF
+
+SIDES = (pongsim.PLAYER, pongsim.OPPONENT)		# the first player to join plays the right hand paddle
+
+# everything about a match the clients are sent, with the struct code it is sent as. Floats go as 32 bits, which is
+# plenty for positions on a 640x480 playfield
+FIELDS = (
+	("player_y", "i"), ("opponent_y", "i"),		# the paddles only move up and down, so their x is never sent
+	("player_move", "b"), ("opponent_move", "b"),	# which way each paddle is moving (PlayerControl.get_state)
+	("ball_x", "f"), ("ball_y", "f"), ("ball_velocity", "f"), ("ball_direction", "f"),
+	("player_score", "B"), ("opponent_score", "B"), ("serve_countdown", "H"),
+	("winner", "B"),		# 0 until the match is over, then 1 + the index in SIDES of the winner
+)
+FIELD_STRUCTS = tuple(struct.Struct("<" + code) for name, code in FIELDS)
+
+HISTORY = pongsim.TICK_RATE		# ticks of states the server keeps to make deltas from. Older baselines get a full state
+INPUT_REDUNDANCY = 8			# inputs in every INPUT message, so one that is lost is sent again in the next few
+MAX_QUEUED_INPUTS = 6			# inputs the server holds for a client before it drops the oldest, so a fast client cant build up lag
+PING_INTERVAL = 0.25			# seconds between pings, for the round trip time
+TIMEOUT = 5.0					# seconds without hearing anything before the other end is taken to be gone
+UDP_OVERHEAD = 28				# bytes of IPv4 and UDP header on every datagram, counted in the on the wire figures
+
+def take_snapshot(world):
+	# the FIELDS of world as a tuple, rounded the way they are sent, so the server compares the same values the client gets
+	state = world.get_state()
+	winner = 0 if state["winner"] is None else 1 + SIDES.index(state["winner"])
+	values = (state["player"][1], state["opponent"][1], state["player_control"], state["brain"]) + \
+		tuple(state["ball"]) + tuple(state["rules"][:3]) + (winner,)
+	return tuple(field.unpack(field.pack(value))[0] for field, value in zip(FIELD_STRUCTS, values))
+
+def snapshot_hash(world):
+	# a short hex digest of the FIELDS of world, which is all a client gets, so a client World that has caught up with the
+	# server has the same one as the server's World. pongsim.state_hash covers things clients are never sent
+	values = take_snapshot(world)
+	return hashlib.blake2b(b"".join(field.pack(value) for field, value in zip(FIELD_STRUCTS, values)), digest_size=8).hexdigest()
+
+def apply_snapshot(world, values):
+	# put the FIELDS in values into world. Its tick, random number generator and anything else not sent stay as they are
+	state = world.get_state()
+	player_y, opponent_y, player_move, opponent_move, ball_x, ball_y, velocity, direction, \
+		player_score, opponent_score, serve_countdown, winner = values
+	state["player"] = [state["player"][0], player_y]
+	state["opponent"] = [state["opponent"][0], opponent_y]
+	state["player_control"] = player_move
+	state["brain"] = opponent_move
+	state["ball"] = [ball_x, ball_y, velocity, direction]
+	state["rules"] = [player_score, opponent_score, serve_countdown] + state["rules"][3:]
+	state["winner"] = None if winner == 0 else SIDES[winner-1]
+	world.set_state(state)
+
+def encode_state(tick, values, input_number, baseline_tick=NO_BASELINE, baseline=None):
+	# a STATE message with the fields in values that are different from baseline, or all of them with no baseline
+	changed = 0
+	parts = []
+	for i, field in enumerate(FIELD_STRUCTS):
+		if baseline is None or values[i] != baseline[i]:
+			changed |= 1 << i
+			parts.append(field.pack(values[i]))
+	if baseline is None:
+		baseline_tick = NO_BASELINE
+	return STATE_HEADER.pack(STATE, tick, baseline_tick, input_number, changed) + b"".join(parts)
+
+def decode_state(data, baselines):
+	# (tick, values, input number) from a STATE message. baselines is tick -> values of the states already received.
+	# Returns None if the message is a delta from a state that isnt in baselines
+	kind, tick, baseline_tick, input_number, changed = STATE_HEADER.unpack_from(data)
+	baseline = None
+	if baseline_tick != NO_BASELINE:
+		baseline = baselines.get(baseline_tick)
+		if baseline is None:
+			return None
+	values = []
+	offset = STATE_HEADER.size
+	for i, field in enumerate(FIELD_STRUCTS):
+		if changed & (1 << i):
+			values.append(field.unpack_from(data, offset)[0])
+			offset += field.size
+		else:
+			values.append(baseline[i])
+	return (tick, tuple(values), input_number)
+
+class InputBrain:
+	# moves a paddle from (up, down) inputs set before each step, the way PlayerControl moves the player paddle.
+	# Given to World.set_opponent_brain so a person can play the left hand paddle
+	def __init__(self, paddle):
+		self.__control = pongsim.PlayerControl(paddle)
+		self.__inputs = (False, False)
+
+	def set_inputs(self, up, down):
+		self.__inputs = (up, down)
+
+	def step(self, ball):
+		self.__control.step(*self.__inputs)
+
+	def get_state(self):
+		return self.__control.get_state()
+
+	def set_state(self, state):
+		self.__control.set_state(state)
+
+def new_world(difficulty, seed=None):
+	# a World for a networked match, with both paddles moved by inputs
+	world = pongsim.World(difficulty=difficulty, seed=seed)
+	world.set_opponent_brain(InputBrain(world.get_opponent()))
+	return world
+
+class Link:
+	# sends datagrams for one end of the connection, and counts the bytes going each way.
+	# lag (seconds each way) and loss (0 to 1) make a worse connection than localhost, to see prediction and the deltas cope
+	def __init__(self, lag=0.0, loss=0.0, seed=None):
+		self.__transport = None
+		self.__lag = lag
+		self.__loss = loss
+		self.__rng = random.Random(seed)
+		self.__sent = [0, 0]		#packets, bytes
+		self.__received = [0, 0]
+		self.__sample = (time.perf_counter(), 0, 0, 0, 0)		#time and the counts at the last sample_rates call
+
+	def set_transport(self, transport):
+		self.__transport = transport
+
+	def send(self, data, address=None):
+		# counted as sent even when loss drops it, like a real network would
+		self.__sent[0] += 1
+		self.__sent[1] += len(data)
+		if self.__loss and self.__rng.random() < self.__loss:
+			return
+		if self.__lag:
+			asyncio.get_running_loop().call_later(self.__lag, self.__send_now, data, address)
+		else:
+			self.__send_now(data, address)
+
+	def __send_now(self, data, address):
+		if self.__transport is not None and not self.__transport.is_closing():
+			self.__transport.sendto(data, address)
+
+	def count_received(self, data):
+		self.__received[0] += 1
+		self.__received[1] += len(data)
+
+	def get_totals(self):
+		return {"packets_sent": self.__sent[0], "bytes_sent": self.__sent[1],
+			"packets_received": self.__received[0], "bytes_received": self.__received[1]}
+
+	def sample_rates(self):
+		# bytes a second sent and received since the last call, with and without the UDP and IP headers
+		now = time.perf_counter()
+		last_time, last_packets_sent, last_sent, last_packets_received, last_received = self.__sample
+		self.__sample = (now, self.__sent[0], self.__sent[1], self.__received[0], self.__received[1])
+		elapsed = max(now - last_time, 1e-9)
+		sent = self.__sent[1] - last_sent
+		received = self.__received[1] - last_received
+		return {
+			"sent": sent/elapsed,
+			"received": received/elapsed,
+			"sent_wire": (sent + UDP_OVERHEAD*(self.__sent[0] - last_packets_sent))/elapsed,
+			"received_wire": (received + UDP_OVERHEAD*(self.__received[0] - last_packets_received))/elapsed,
+		}
+
+class RemotePlayer:
+	# the server's view of one client: the inputs it has sent that havent been used yet, and the newest state it has
+	def __init__(self, side):
+		self.side = side
+		self.inputs = deque()		#(input number, (up, down)) waiting to be used, oldest first
+		self.newest_input = 0		#number of the newest input received
+		self.used_input = 0			#number of the newest input used, sent back so the client knows which to play again
+		self.held = (False, False)	#the last inputs used, used again on ticks with nothing new
+		self.acked_tick = None		#tick of the newest state the client has
+		self.last_heard = time.perf_counter()
+
+	def receive_inputs(self, data):
+		kind, newest, acked_tick, count = INPUT_HEADER.unpack_from(data)
+		if acked_tick != NO_BASELINE and (self.acked_tick is None or acked_tick > self.acked_tick):
+			self.acked_tick = acked_tick
+		first = newest - count + 1
+		for i, byte in enumerate(data[INPUT_HEADER.size:INPUT_HEADER.size+count]):
+			if first + i > self.newest_input:
+				self.inputs.append((first + i, unpack_inputs(byte)))
+				self.newest_input = first + i
+		while len(self.inputs) > MAX_QUEUED_INPUTS:
+			self.inputs.popleft()
+
+	def next_inputs(self):
+		# the inputs for this tick: the next one waiting, or the last one again if the next hasnt arrived
+		if self.inputs:
+			self.used_input, self.held = self.inputs.popleft()
+		return self.held
+
+class MatchServer(asyncio.DatagramProtocol):
+	# runs one match at a time between the first two clients to join. When it finishes, or somebody leaves, the server
+	# forgets them and waits for two more
+	def __init__(self, difficulty=1, link=None, seed=None, verbose=False):
+		self.__difficulty = difficulty
+		self.__link = link if link is not None else Link()
+		self.__rng = random.Random(seed)		#seeds for the matches
+		self.__verbose = verbose
+		self.__clients = {}			#address -> RemotePlayer
+		self.__world = None
+		self.__history = {}			#tick -> snapshot of the last HISTORY ticks, to make deltas from
+		self.__finished_ticks = 0	#ticks the final state has been sent for since the match finished
+		self.__matches = 0
+		self.__new_match()
+
+	def get_link(self):
+		return self.__link
+
+	def get_match_count(self):
+		# matches finished so far
+		return self.__matches
+
+	def get_world(self):
+		# the match being played, or the one waiting for two players to join
+		return self.__world
+
+	def __log(self, message):
+		if self.__verbose:
+			print(message)
+
+	def __new_match(self):
+		self.__clients = {}
+		self.__world = new_world(self.__difficulty, self.__rng.getrandbits(64))
+		self.__history = {}
+		self.__finished_ticks = 0
+
+	def connection_made(self, transport):
+		self.__link.set_transport(transport)
+
+	def datagram_received(self, data, address):
+		self.__link.count_received(data)
+		if not data:
+			return
+		kind = data[0]
+		client = self.__clients.get(address)
+		if client is not None:
+			client.last_heard = time.perf_counter()
+		if kind == JOIN:
+			self.__join(address)
+		elif kind == PING:
+			self.__link.send(bytes((PONG,)) + data[1:], address)
+		elif client is None:
+			return		#anything else from someone who isnt playing is ignored
+		elif kind == INPUT:
+			client.receive_inputs(data)
+		elif kind == LEAVE:
+			self.__log("%s:%d left" % address)
+			self.__new_match()
+
+	def __join(self, address):
+		client = self.__clients.get(address)
+		if client is None:
+			if len(self.__clients) == len(SIDES):
+				self.__link.send(bytes((FULL,)), address)
+				return
+			taken = [other.side for other in self.__clients.values()]
+			client = RemotePlayer([side for side in SIDES if side not in taken][0])
+			self.__clients[address] = client
+			self.__log("%s:%d joined as %s" % (address + (client.side,)))
+		# sent again for every JOIN, in case the last WELCOME was lost
+		self.__link.send(WELCOME_MESSAGE.pack(WELCOME, SIDES.index(client.side), self.__difficulty), address)
+
+	async def run(self):
+		# step the match at pongsim.TICK_RATE for as long as the server is up
+		loop = asyncio.get_running_loop()
+		next_tick = loop.time()
+		while True:
+			self.tick()
+			next_tick += 1/pongsim.TICK_RATE
+			delay = next_tick - loop.time()
+			if delay < 0:
+				next_tick = loop.time()		#fell behind, so carry on from now instead of rushing to catch up
+			await asyncio.sleep(max(0, delay))
+
+	def tick(self):
+		now = time.perf_counter()
+		for address, client in list(self.__clients.items()):
+			if now - client.last_heard > TIMEOUT:
+				self.__log("%s:%d timed out" % address)
+				if len(self.__clients) == len(SIDES):
+					self.__new_match()
+					return
+				del self.__clients[address]
+		if len(self.__clients) < len(SIDES):
+			return		#still waiting for somebody to play against
+		world = self.__world
+		if world.is_over():
+			# keep sending the final state for a second, in case the first few are lost, then start again
+			self.__finished_ticks += 1
+			if self.__finished_ticks > pongsim.TICK_RATE:
+				self.__matches += 1
+				self.__log("match over, %s won %s" % (world.get_winner(), world.get_rules().get_scores()))
+				self.__new_match()
+				return
+		else:
+			player_inputs = (False, False)
+			for client in self.__clients.values():
+				if client.side == pongsim.PLAYER:
+					player_inputs = client.next_inputs()
+				else:
+					world.get_brain().set_inputs(*client.next_inputs())
+			world.step(player_inputs)
+		tick = world.get_tick()
+		values = take_snapshot(world)
+		self.__history[tick] = values
+		self.__history.pop(tick - HISTORY, None)
+		for address, client in self.__clients.items():
+			baseline = self.__history.get(client.acked_tick)
+			self.__link.send(encode_state(tick, values, client.used_input, client.acked_tick, baseline), address)
+
+class NetClient(asyncio.DatagramProtocol):
+	# one player's end of a networked match. Joins a MatchServer, sends it inputs, and keeps the newest state it sent back.
+	# Use connect() to make one
+	def __init__(self, link=None):
+		self.__link = link if link is not None else Link()
+		self.__transport = None
+		self.__side = None
+		self.__difficulty = None
+		self.__joined = None		#an asyncio.Future, done when the server answers the JOIN
+		self.__states = {}			#tick -> values of the states received, to decode the deltas from
+		self.__oldest = None		#the oldest tick that can still be in states
+		self.__latest = None		#(tick, values, input number) of the newest state received
+		self.__inputs = deque(maxlen=INPUT_REDUNDANCY)		#the last few inputs sent, packed
+		self.__rtt = None			#smoothed round trip time in seconds
+		self.__last_heard = time.perf_counter()		#when anything last came from the server, or a state once the match has started
+		self.__pinger = None
+
+	def connection_made(self, transport):
+		self.__transport = transport
+		self.__link.set_transport(transport)
+
+	def datagram_received(self, data, address):
+		self.__link.count_received(data)
+		if not data:
+			return
+		kind = data[0]
+		if kind == STATE or self.__latest is None:
+			# the server answers pings even after it has given up on the match, so only states count once it has started
+			self.__last_heard = time.perf_counter()
+		if kind == STATE:
+			state = self.__decode(data)
+			if state is not None and (self.__latest is None or state[0] > self.__latest[0]):
+				self.__latest = state
+		elif kind == PONG:
+			sample = time.perf_counter() - PING_MESSAGE.unpack(data)[1]
+			# smoothed the way TCP smooths its round trip time, so one slow ping doesnt throw it
+			self.__rtt = sample if self.__rtt is None else self.__rtt + (sample - self.__rtt)/8
+		elif kind == WELCOME and self.__joined is not None and not self.__joined.done():
+			kind, side, self.__difficulty = WELCOME_MESSAGE.unpack(data)
+			self.__side = SIDES[side]
+			self.__joined.set_result(self.__side)
+		elif kind == FULL and self.__joined is not None and not self.__joined.done():
+			self.__joined.set_exception(ConnectionRefusedError("the server already has two players"))
+
+	def __decode(self, data):
+		state = decode_state(data, self.__states)
+		if state is None:
+			return None
+		tick = state[0]
+		if self.__oldest is None:
+			self.__oldest = tick
+		if tick >= self.__oldest:
+			self.__states[tick] = state[1]
+		# kept for longer than the server keeps them, so any baseline the server picks is still here. Everything older
+		# goes, including the ticks that were lost on the way and never got stored
+		while self.__oldest < tick - 2*HISTORY:
+			self.__states.pop(self.__oldest, None)
+			self.__oldest += 1
+		return state
+
+	def error_received(self, error):
+		pass		#nothing listening at the other end yet. join tries again, and a lost game times out
+
+	async def join(self, timeout=TIMEOUT):
+		# ask to join until the server answers. Returns the side this client plays
+		loop = asyncio.get_running_loop()
+		self.__joined = loop.create_future()
+		deadline = loop.time() + timeout
+		while not self.__joined.done():
+			if loop.time() > deadline:
+				raise asyncio.TimeoutError("no answer from the server")
+			self.__link.send(bytes((JOIN,)))
+			try:
+				await asyncio.wait_for(asyncio.shield(self.__joined), 0.5)
+			except asyncio.TimeoutError:
+				pass
+		self.__last_heard = time.perf_counter()
+		self.__pinger = loop.create_task(self.__ping())
+		return self.__joined.result()
+
+	async def __ping(self):
+		while True:
+			self.__link.send(PING_MESSAGE.pack(PING, time.perf_counter()))
+			await asyncio.sleep(PING_INTERVAL)
+
+	def send_inputs(self, number, up, down):
+		# send the inputs numbered number, with the few before it again in case they were lost
+		self.__inputs.append(pack_inputs(up, down))
+		acked_tick = NO_BASELINE if self.__latest is None else self.__latest[0]
+		self.__link.send(INPUT_HEADER.pack(INPUT, number, acked_tick, len(self.__inputs)) + bytes(self.__inputs))
+
+	def get_side(self):
+		return self.__side
+
+	def get_difficulty(self):
+		return self.__difficulty
+
+	def get_latest(self):
+		# (tick, values, number of the newest input the server had used) of the newest state, or None before the match starts
+		return self.__latest
+
+	def get_state_count(self):
+		# states kept to decode the deltas from
+		return len(self.__states)
+
+	def get_rtt(self):
+		return self.__rtt
+
+	def get_link(self):
+		return self.__link
+
+	def is_timed_out(self):
+		return time.perf_counter() - self.__last_heard > TIMEOUT
+
+	def close(self):
+		if self.__pinger is not None:
+			self.__pinger.cancel()
+		if self.__transport is not None and not self.__transport.is_closing():
+			self.__transport.sendto(bytes((LEAVE,)))
+			self.__transport.close()
+
+async def connect(host, port, link=None):
+	# a NetClient that has joined the server at host and port
+	loop = asyncio.get_running_loop()
+	transport, client = await loop.create_datagram_endpoint(lambda: NetClient(link), remote_addr=(host, port))
+	try:
+		await client.join()
+	except Exception:
+		transport.close()
+		raise
+	return client
+
+class ThreadedClient:
+	# a NetClient on its own asyncio event loop on a background thread, for a game loop that isnt asyncio, like pypong's.
+	# The getters read whatever the network thread last stored, and send_inputs hands the inputs over to it
+	def __init__(self, host, port, link=None):
+		self.__loop = asyncio.new_event_loop()
+		self.__client = None
+		self.__error = None
+		self.__ready = threading.Event()		#set once the client has joined, or failed to
+		self.__closed = False
+		self.__thread = threading.Thread(target=self.__run, args=(host, port, link), daemon=True)
+		self.__thread.start()
+
+	def __run(self, host, port, link):
+		asyncio.set_event_loop(self.__loop)
+		try:
+			self.__client = self.__loop.run_until_complete(connect(host, port, link))
+		except (OSError, asyncio.TimeoutError) as error:
+			self.__error = error
+		self.__ready.set()
+		if self.__client is not None:
+			if self.__closed:
+				self.__loop.run_until_complete(self.__close())		#closed while it was still joining
+			else:
+				self.__loop.run_forever()
+		self.__loop.close()
+
+	async def __close(self):
+		self.__client.close()
+		await asyncio.sleep(0)		#let the ping task finish being cancelled
+		self.__loop.stop()
+
+	def is_ready(self):
+		return self.__ready.is_set()
+
+	def wait(self, timeout=None):
+		self.__ready.wait(timeout)
+
+	def get_error(self):
+		# why the client couldnt join, or None
+		return self.__error
+
+	def send_inputs(self, number, up, down):
+		self.__loop.call_soon_threadsafe(self.__client.send_inputs, number, up, down)
+
+	def get_side(self):
+		return self.__client.get_side()
+
+	def get_difficulty(self):
+		return self.__client.get_difficulty()
+
+	def get_latest(self):
+		return self.__client.get_latest()
+
+	def get_rtt(self):
+		return self.__client.get_rtt()
+
+	def is_timed_out(self):
+		return self.__client.is_timed_out()
+
+	def close(self):
+		self.__closed = True
+		if self.__client is not None and self.__loop.is_running():
+			asyncio.run_coroutine_threadsafe(self.__close(), self.__loop)
+
+class PredictedMatch:
+	# a client's own copy of the match, run ahead of the server. Each tick the local inputs are sent to the server and
+	# played straight away. When a new state arrives it is put into the World, and the inputs the server hasnt used yet
+	# are played again on top of it. The other paddle is guessed to keep moving the way it was last seen moving.
+	# client is a NetClient or ThreadedClient that has joined
+	def __init__(self, client):
+		self.__client = client
+		self.__side = client.get_side()
+		self.__world = new_world(client.get_difficulty())
+		self.__pending = deque()		#(input number, (up, down)) sent but not yet used by the server, oldest first
+		self.__number = 0				#number of the last input sent
+		self.__applied = None			#the state from the server the World was last put right from
+		self.__other_inputs = (False, False)
+		self.__corrections = 0			#times a state from the server moved something more than a pixel from where it was predicted
+		self.__largest_correction = 0.0
+
+	def get_world(self):
+		return self.__world
+
+	def get_side(self):
+		return self.__side
+
+	def is_started(self):
+		return self.__applied is not None
+
+	def is_over(self):
+		# True once the server says somebody has won. The World can get there first by predicting the last point,
+		# but only the server decides
+		return self.__applied is not None and self.__applied[1][11] != 0
+
+	def get_pending_count(self):
+		# how many ticks ahead of the last state from the server the World is
+		return len(self.__pending)
+
+	def get_corrections(self):
+		# (times a state from the server put the prediction right, the furthest in pixels anything had to move)
+		return (self.__corrections, self.__largest_correction)
+
+	def __step(self, inputs):
+		if self.__side == pongsim.PLAYER:
+			self.__world.get_brain().set_inputs(*self.__other_inputs)
+			return self.__world.step(inputs)
+		self.__world.get_brain().set_inputs(*inputs)
+		return self.__world.step(self.__other_inputs)
+
+	def __positions(self):
+		# where everything that gets corrected is, for measuring the corrections
+		world = self.__world
+		return world.get_player().get_position() + world.get_opponent().get_position() + world.get_ball().get_position()
+
+	def update(self):
+		# put the World right from the newest state the server has sent, if it hasnt been already, playing the inputs the
+		# server hasnt used yet on top of it. Returns the points and the end of the match the server says happened since
+		# the last state. tick does this first
+		latest = self.__client.get_latest()
+		events = []
+		if latest is not None and latest is not self.__applied:
+			self.__reconcile(latest, events)
+		return events
+
+	def tick(self, up, down):
+		# one tick with the local keys. Returns the (event, value) tuples from pongsim that happened, with the points
+		# and the end of the match coming from the server
+		if self.__client.get_latest() is None:
+			return []		#the server hasnt started the match yet
+		events = self.update()
+		self.__number += 1
+		self.__client.send_inputs(self.__number, up, down)
+		self.__pending.append((self.__number, (up, down)))
+		# only the ball hitting a paddle comes from the prediction. The server says who scored
+		events.extend(event for event in self.__step((up, down)) if event[0] == pongsim.PADDLE_HIT)
+		return events
+
+	def __reconcile(self, latest, events):
+		tick, values, used_input = latest
+		while self.__pending and self.__pending[0][0] <= used_input:
+			self.__pending.popleft()
+		before = self.__positions()
+		last = self.__applied[1] if self.__applied is not None else take_snapshot(self.__world)
+		self.__applied = latest
+		apply_snapshot(self.__world, values)
+		other_move = values[3] if self.__side == pongsim.PLAYER else values[2]
+		self.__other_inputs = (other_move == -1, other_move == 1)
+		for number, inputs in self.__pending:
+			self.__step(inputs)
+		if self.__number:
+			error = max(abs(a - b) for a, b in zip(before, self.__positions()))
+			if error > 1:
+				self.__corrections += 1
+				self.__largest_correction = max(self.__largest_correction, error)
+		# points and the winner, from the change since the last state
+		for i, side in ((8, pongsim.PLAYER), (9, pongsim.OPPONENT)):
+			for point in range(values[i] - last[i]):
+				events.append((pongsim.POINT_SCORED, side))
+		if values[11] and not last[11]:
+			events.append((pongsim.MATCH_OVER, SIDES[values[11]-1]))
+
+def follow_ball(world, side):
+	# (up, down) inputs that move side's paddle towards the ball, for the bots
+	paddle = world.get_player() if side == pongsim.PLAYER else world.get_opponent()
+	paddle_y, paddle_h = paddle.get_rect()[1], paddle.get_rect()[3]
+	ball_y = world.get_ball().get_position()[1] + world.get_ball().get_size()/2
+	return (ball_y < paddle_y + paddle_h/2 - paddle.get_speed(), ball_y > paddle_y + paddle_h/2 + paddle.get_speed())
+
+def describe(client, match):
+	# one line about how the connection is doing, for the once a second reports
+	rates = client.get_link().sample_rates()
+	rtt = client.get_rtt()
+	corrections, largest = match.get_corrections()
+	return "%-8s down %6.0f B/s (%6.0f on the wire)  up %6.0f B/s (%6.0f)  rtt %s  %2d ticks ahead  %d corrections, largest %.1fpx" % (
+		match.get_side(), rates["received"], rates["received_wire"], rates["sent"], rates["sent_wire"],
+		"%5.1fms" % (1000*rtt) if rtt is not None else "    -", match.get_pending_count(), corrections, largest)
+
+async def report(pairs, interval=1.0):
+	# print describe() for every (client, match) in pairs every interval seconds, until cancelled
+	while True:
+		await asyncio.sleep(interval)
+		for client, match in pairs:
+			print(describe(client, match))
+
+async def loopback(seconds, difficulty=1, lag=0.0, loss=0.0):
+	# a server and two bots playing each other over localhost, with a report every second
+	loop = asyncio.get_running_loop()
+	server = MatchServer(difficulty, Link(lag, loss, seed=0))
+	transport, protocol = await loop.create_datagram_endpoint(lambda: server, local_addr=("127.0.0.1", 0))
+	port = transport.get_extra_info("sockname")[1]
+	server_task = loop.create_task(server.run())
+	clients = []
+	for seed in (1, 2):
+		clients.append(await connect("127.0.0.1", port, Link(lag, loss, seed=seed)))
+	print("server on 127.0.0.1:%d, %d each way lag, %d%% loss" % (port, 1000*lag, 100*loss))
+	start = time.perf_counter()
+	matches = [PredictedMatch(client) for client in clients]
+	reporter = loop.create_task(report(list(zip(clients, matches))))
+	next_tick = loop.time()
+	while time.perf_counter() - start < seconds and not all(match.is_over() for match in matches):
+		for match in matches:
+			match.tick(*follow_ball(match.get_world(), match.get_side()))
+		next_tick += 1/pongsim.TICK_RATE
+		await asyncio.sleep(max(0, next_tick - loop.time()))
+	elapsed = time.perf_counter() - start
+	reporter.cancel()
+	for client, match in zip(clients, matches):
+		totals = client.get_link().get_totals()
+		down = (totals["bytes_received"] + UDP_OVERHEAD*totals["packets_received"])/elapsed
+		up = (totals["bytes_sent"] + UDP_OVERHEAD*totals["packets_sent"])/elapsed
+		print("%-8s average %.0f B/s down, %.0f B/s up on the wire, %d bytes a state, %s" % (match.get_side(), down, up,
+			totals["bytes_received"]//max(1, totals["packets_received"]), match.get_world().get_rules().get_scores()))
+		client.close()
+	server_task.cancel()
+	transport.close()
+
+def parse_address(text, default_port=DEFAULT_PORT):
+	# "host:port" or "host" -> (host, port)
+	host, sep, port = text.rpartition(":")
+	if not sep:
+		return (text, default_port)
+	return (host, int(port))
+
+async def serve(host, port, difficulty):
+	loop = asyncio.get_running_loop()
+	server = MatchServer(difficulty, verbose=True)
+	transport, protocol = await loop.create_datagram_endpoint(lambda: server, local_addr=(host, port))
+	print("serving pypong on %s:%d" % (host, port))
+	try:
+		await server.run()
+	finally:
+		transport.close()
+
+async def bot(host, port):
+	client = await connect(host, port)
+	print("joined as %s, waiting for the other player" % client.get_side())
+	loop = asyncio.get_running_loop()
+	match = PredictedMatch(client)
+	reporter = loop.create_task(report([(client, match)]))
+	next_tick = loop.time()
+	while not match.is_over() and not client.is_timed_out():
+		match.tick(*follow_ball(match.get_world(), match.get_side()))
+		next_tick += 1/pongsim.TICK_RATE
+		await asyncio.sleep(max(0, next_tick - loop.time()))
+	reporter.cancel()
+	print("winner %s, %s" % (match.get_world().get_winner(), match.get_world().get_rules().get_scores()))
+	client.close()
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Network play for pypong: a match server, a bot to play on it, or both on localhost.")
+	commands = parser.add_subparsers(dest="command", required=True)
+	loopback_parser = commands.add_parser("loopback", help="run a server and two bots on localhost, reporting bandwidth and latency")
+	loopback_parser.add_argument("--seconds", type=float, default=10)
+	loopback_parser.add_argument("--lag", type=float, default=0, help="milliseconds of extra delay each way")
+	loopback_parser.add_argument("--loss", type=float, default=0, help="fraction of datagrams to drop, 0 to 1")
+	loopback_parser.add_argument("--difficulty", type=int, default=1, choices=(0, 1, 2))
+	serve_parser = commands.add_parser("serve", help="run a match server")
+	serve_parser.add_argument("--host", default="127.0.0.1")
+	serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+	serve_parser.add_argument("--difficulty", type=int, default=1, choices=(0, 1, 2))
+	bot_parser = commands.add_parser("bot", help="join a server and play one match with a bot that follows the ball")
+	bot_parser.add_argument("address", nargs="?", default="127.0.0.1:%d" % DEFAULT_PORT, help="host:port of the server")
+	args = parser.parse_args(argv)
+
+	try:
+		if args.command == "loopback":
+			asyncio.run(loopback(args.seconds, args.difficulty, args.lag/1000, args.loss))
+		elif args.command == "serve":
+			asyncio.run(serve(args.host, args.port, args.difficulty))
+		else:
+			asyncio.run(bot(*parse_address(args.address)))
+	except KeyboardInterrupt:
+		pass
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,131 @@
+"""Jordan Ogilvy, 'pypong' frame profiler. Times each part of a frame and each object's update and draw, keeps a rolling
+history of frame times, draws an overlay of how the frames are doing, and saves a trace of the last few hundred frames
+that can be opened in chrome://tracing or https://ui.perfetto.dev"""
+
+import json
+import time
+from collections import deque
+import pygame
+from myqueue import MyQueue
+
+FONT = ("Arial", 14)		#the (name, size) of the overlay font
+
+class FrameProfiler:
+	# assets: the pongassets.AssetManager the overlay font comes from
+	# history: how many frame times to keep for the percentiles and histogram
+	# trace_frames: how many frames of timings to keep for dump_trace
+	# refresh: seconds between updates of the overlay text, so the overlay doesnt cost a font render every frame
+	def __init__(self, assets, history=600, trace_frames=300, refresh=0.5):
+		self.__assets = assets
+		self.__frame_times = MyQueue(history, typecode="d")	#seconds each of the last history frames took
+		self.__trace = deque(maxlen=trace_frames)	#a list of (name, start, duration) for each of the last trace_frames frames
+		self.__spans = None			#(name, start, duration) of everything timed so far this frame
+		self.__frame_start = 0
+		self.__totals = {}			#name -> seconds spent in it since the overlay was last refreshed
+		self.__refresh = refresh
+		self.__last_refresh = 0
+		self.__font = None			#made the first time the overlay is drawn, so profiling works with no display
+		self.__label = None			#the rendered overlay text
+		self.__histogram = None		#the drawn histogram of frame times
+		self.__colour = (255, 255, 0)
+		self.__origin = time.perf_counter()		#trace timestamps are counted from here
+
+	def begin_frame(self):
+		self.__spans = []
+		self.__frame_start = time.perf_counter()
+
+	def record(self, name, start, end):
+		# record that name ran from start to end, both from time.perf_counter()
+		duration = end - start
+		self.__spans.append((name, start, duration))
+		self.__totals[name] = self.__totals.get(name, 0) + duration
+
+	def end_frame(self):
+		duration = time.perf_counter() - self.__frame_start
+		self.__frame_times.enqueue(duration)
+		self.__spans.append(("frame", self.__frame_start, duration))
+		self.__trace.append(self.__spans)
+
+	def get_percentile(self, percent):
+		# the frame time in seconds that percent of the recent frames came in under
+		times = sorted(self.__frame_times)
+		if not times:
+			return 0.0
+		return times[min(len(times)-1, int(len(times)*percent/100))]
+
+	def get_histogram(self, bucket=0.001, buckets=34):
+		# counts of the recent frame times in buckets of bucket seconds. The last bucket counts everything longer
+		counts = [0]*buckets
+		for frame_time in self.__frame_times:
+			counts[min(buckets-1, int(frame_time/bucket))] += 1
+		return counts
+
+	def get_worst_offender(self):
+		# the name of the part of the frame that took the most time since the overlay was last refreshed
+		if not self.__totals:
+			return None
+		return max(self.__totals, key=self.__totals.get)
+
+	def draw(self, display, fps):
+		# draw the overlay in the top left corner: fps, frame time percentiles, the worst offender, and a histogram
+		now = time.perf_counter()
+		if self.__label is None or now - self.__last_refresh > self.__refresh:
+			if self.__font is None:
+				self.__font = self.__assets.get_font(*FONT)
+			text = "FPS %.1f  p50 %.2fms  p99 %.2fms  worst %s" % (fps, 1000*self.get_percentile(50),
+				1000*self.get_percentile(99), self.get_worst_offender())
+			self.__label = self.__font.render(text, 1, self.__colour)
+			self.__histogram = self.__draw_histogram(self.get_histogram())
+			self.__totals = {}
+			self.__last_refresh = now
+		display.blit(self.__label, (4, 4))
+		display.blit(self.__histogram, (4, 8 + self.__label.get_height()))
+
+	def __draw_histogram(self, counts):
+		# one bar per bucket of frame time, the height showing how many frames took that long
+		surface = pygame.Surface((4*len(counts), 24), pygame.SRCALPHA)
+		tallest = max(counts) or 1
+		for i, count in enumerate(counts):
+			height = 24*count//tallest
+			surface.fill(self.__colour, (4*i, 24 - height, 3, height))
+		return surface
+
+	def dump_trace(self, path):
+		# save the timings of the last trace_frames frames in the Chrome trace event format. Returns the number of events saved
+		events = []
+		for spans in self.__trace:
+			for name, start, duration in spans:
+				events.append({"name": name, "ph": "X", "pid": 0, "tid": 0,
+					"ts": 1e6*(start - self.__origin), "dur": 1e6*duration})
+		with open(path, "w") as out:
+			json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, out)
+		return len(events)
+
+class StartupTimer:
+	# times each step of starting the game, from start (a time.perf_counter() taken as early as possible) to the first frame
+	# being on the screen, to keep an eye on how long the game takes before it can be played
+	def __init__(self, start):
+		self.__start = start
+		self.__marks = []		#(step name, time.perf_counter() when it finished)
+
+	def mark(self, name):
+		self.__marks.append((name, time.perf_counter()))
+
+	def get_total(self):
+		# seconds from start to the last mark
+		if not self.__marks:
+			return 0.0
+		return self.__marks[-1][1] - self.__start
+
+	def report(self, extra=()):
+		# the time each step took and the total, as lines of text. extra is more (name, seconds) to list under the steps,
+		# like the asset manager's timings
+		lines = []
+		last = self.__start
+		for name, when in self.__marks:
+			lines.append("%-20s %8.1fms" % (name, 1000*(when - last)))
+			last = when
+		for name, seconds in extra:
+			lines.append("  %-18s %8.1fms" % (name, 1000*seconds))
+		lines.append("%-20s %8.1fms" % ("total", 1000*self.get_total()))
+		return lines
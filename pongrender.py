@@ -0,0 +1,256 @@
+"""Jordan Ogilvy, 'pypong' rendering helpers. Drawing support for the pygame side of pypong."""
+
+from collections import OrderedDict
+import pygame
+import pongsim
+
+MAX_DIRTY_RECTS = 256	#with more rects than this in a frame, the whole playfield is put back and pushed instead
+
+class Viewport:
+	# the one place that knows how big things are. The game is played on a playfield of a fixed logical size, and the
+	# viewport fits that into the window, whatever size the window is, keeping its shape. The sizes are only worked out
+	# when the window changes size, so nothing needs to ask pygame.display.Info() every frame.
+	def __init__(self, logical_size=pongsim.FIELD_SIZE, window_size=None):
+		self.__logical_size = tuple(logical_size)
+		self.__window_size = tuple(window_size or logical_size)
+		self.__fit()
+
+	def __fit(self):
+		# work out the scale and the area of the window the playfield is drawn in, centred with bars round the edges
+		logical_w, logical_h = self.__logical_size
+		window_w, window_h = self.__window_size
+		self.__scale = min(window_w/logical_w, window_h/logical_h)
+		w, h = round(logical_w*self.__scale), round(logical_h*self.__scale)
+		self.__area = pygame.Rect((window_w-w)//2, (window_h-h)//2, w, h)
+
+	def handle_event(self, event):
+		# keep up with the window size. Returns True if the window changed size
+		if event.type == pygame.VIDEORESIZE:
+			return self.set_window_size(event.size)
+		return False
+
+	def set_window_size(self, new_size):
+		new_size = tuple(new_size)
+		if new_size == self.__window_size:
+			return False
+		self.__window_size = new_size
+		self.__fit()
+		return True
+
+	def get_logical_size(self):
+		return self.__logical_size
+
+	def get_window_size(self):
+		return self.__window_size
+
+	def get_scale(self):
+		return self.__scale
+
+	def get_area(self):
+		# the rect of the window the playfield is drawn in
+		return self.__area
+
+	def is_scaled(self):
+		# True if the playfield doesnt fit the window pixel for pixel
+		return self.__area.size != self.__logical_size
+
+	def to_window(self, pos):
+		# convert a logical (x, y) position to a position in the window
+		return (self.__area.x + pos[0]*self.__scale, self.__area.y + pos[1]*self.__scale)
+
+	def to_logical(self, pos):
+		# convert a position in the window, like the mouse, to a logical (x, y) position
+		return ((pos[0] - self.__area.x)/self.__scale, (pos[1] - self.__area.y)/self.__scale)
+
+class DirtyRenderer:
+	# stands in for the display surface. Game objects blit to it like they would to the display, and it remembers
+	# the rect of every blit. Each frame it only puts the background back under what was drawn last frame, and only
+	# pushes the old and new rects to the screen, instead of filling and flipping the whole window.
+	# With dirty set to False it fills and updates the whole window every frame, the way the game always has.
+	# Objects draw in the logical coordinates of the viewport. If the window isnt the logical size, they draw to an
+	# offscreen canvas which is scaled into the window, and the whole window is pushed each frame.
+	# Things that dont move, like the centre line, are drawn once onto a background layer by the static painters, and the
+	# background layer is what gets put back under the moving things, so each frame is one background copy plus one blit
+	# for each moving object.
+	def __init__(self, screen, back_colour, dirty=True, viewport=None):
+		self.__viewport = viewport		#sizes of the playfield and window
+		if viewport is None:
+			self.__viewport = Viewport(screen.get_size())
+		self.__screen = screen		#the display surface everything really gets drawn to
+		self.__canvas = screen		#the surface objects draw on. The screen itself unless the playfield is scaled
+		self.__back_colour = back_colour	#RGB colour tuple
+		self.__bar_colour = (0, 0, 0)	#colour of the bars round a scaled playfield that doesnt fill the window
+		self.__dirty = dirty
+		self.__rects = []			#rects drawn to so far this frame
+		self.__last_rects = []		#rects drawn to last frame, which need the background put back over them
+		self.__full_redraw = True	#the first frame always draws the whole window
+		self.__static_painters = []	#functions that draw the parts of the picture that dont move onto a surface
+		# the back colour with the static painters drawn on, for each set of painters that has been used, so going between
+		# the menus and a match doesnt draw the background again. They are only drawn again when the colour or screen changes
+		self.__backgrounds = {}		#tuple of painters -> background surface
+		self.__background = None	#the background for the painters there are now, None until the next frame picks it
+		self.resize(screen)
+
+	def __getattr__(self, name):
+		# anything else goes straight to the surface being drawn on
+		return getattr(self.__canvas, name)
+
+	def get_size(self):
+		return self.__viewport.get_logical_size()
+
+	def get_width(self):
+		return self.__viewport.get_logical_size()[0]
+
+	def get_height(self):
+		return self.__viewport.get_logical_size()[1]
+
+	def get_screen(self):
+		return self.__screen
+
+	def get_viewport(self):
+		return self.__viewport
+
+	def resize(self, screen=None):
+		# called after the window changes size, with the new display surface
+		if screen is not None:
+			self.__screen = screen
+		if self.__viewport.is_scaled():
+			self.__canvas = pygame.Surface(self.__viewport.get_logical_size())
+		else:
+			self.__canvas = self.__screen.subsurface(self.__viewport.get_area())
+		self.__rects = []
+		self.__last_rects = []
+		self.__backgrounds.clear()	#the screen format might have changed
+		self.__background = None
+		self.request_full_redraw()
+
+	def set_back_colour(self, new_colour):
+		if new_colour != self.__back_colour:
+			self.__back_colour = new_colour
+			self.__backgrounds.clear()
+			self.__background = None
+			self.request_full_redraw()
+
+	def get_back_colour(self):
+		return self.__back_colour
+
+	def request_full_redraw(self):
+		# called when the whole window changes, like moving between the start, difficulty, game and endgame screens
+		self.__full_redraw = True
+
+	def add_static(self, painter):
+		# painter(surface) draws something that doesnt move onto surface, which is the size of the playfield.
+		# It is called when the background layer gets made, not every frame
+		self.__static_painters.append(painter)
+		self.__background = None
+		self.request_full_redraw()
+
+	def remove_static(self, painter):
+		if painter in self.__static_painters:
+			self.__static_painters.remove(painter)
+			self.__background = None
+			self.request_full_redraw()
+
+	def make_sprite(self, size, colour):
+		# a surface of size filled with colour, in the screen's pixel format, so blitting it every frame is a straight copy
+		surface = pygame.Surface(size)
+		surface.fill(colour)
+		return surface.convert(self.__screen)
+
+	def __pick_background(self):
+		painters = tuple(self.__static_painters)
+		background = self.__backgrounds.get(painters)
+		if background is None:
+			background = pygame.Surface(self.__viewport.get_logical_size()).convert(self.__screen)
+			background.fill(self.__back_colour)
+			for painter in painters:
+				painter(background)
+			self.__backgrounds[painters] = background
+		return background
+
+	def blit(self, source, dest, area=None, special_flags=0):
+		rect = self.__canvas.blit(source, dest, area, special_flags)
+		self.__rects.append(rect)
+		return rect
+
+	def blits(self, blit_sequence):
+		# lots of (source, dest) blits in one call, for things like multiball that draw hundreds of the same sprite
+		rects = self.__canvas.blits(blit_sequence)
+		self.__rects.extend(rects)
+		return rects
+
+	def __too_many_rects(self):
+		# past this many rects, putting back and pushing the whole playfield is quicker than doing them one by one
+		return len(self.__last_rects) + len(self.__rects) > MAX_DIRTY_RECTS
+
+	def begin_frame(self):
+		# put the background back, over the whole window or just where things were drawn last frame
+		if self.__background is None:
+			self.__background = self.__pick_background()
+		if self.__full_redraw:
+			self.__screen.fill(self.__bar_colour)
+		if self.__full_redraw or not self.__dirty or self.__viewport.is_scaled() or len(self.__last_rects) > MAX_DIRTY_RECTS:
+			self.__canvas.blit(self.__background, (0, 0))
+		else:
+			for rect in self.__last_rects:
+				self.__canvas.blit(self.__background, rect, rect)
+
+	def end_frame(self):
+		# push the frame to the screen. Returns the number of pixels pushed
+		area = self.__viewport.get_area()
+		if self.__viewport.is_scaled():
+			pygame.transform.scale(self.__canvas, area.size, self.__screen.subsurface(area))
+			pygame.display.update()
+			pixels = self.__screen.get_width()*self.__screen.get_height()
+		elif self.__full_redraw or not self.__dirty:
+			pygame.display.update()
+			pixels = self.__screen.get_width()*self.__screen.get_height()
+		elif self.__too_many_rects():
+			pygame.display.update(area)
+			pixels = area.width*area.height
+		else:
+			# an object that didnt move has the same old and new rect, only send it once
+			changed = {tuple(rect): rect.move(area.topleft) for rect in self.__last_rects + self.__rects if rect.width and rect.height}
+			pygame.display.update(list(changed.values()))
+			pixels = sum(rect.width*rect.height for rect in changed.values())
+		self.__full_redraw = False
+		self.__last_rects = self.__rects
+		self.__rects = []
+		return pixels
+
+class TextCache:
+	# keeps the surfaces font.render makes, so text that doesnt change between frames only gets rasterised once.
+	# Holds at most max_size surfaces, and throws away the least recently used one when it needs room for another.
+	def __init__(self, max_size=64):
+		self.__max_size = max_size
+		self.__surfaces = OrderedDict()	#(font, text, antialias, colour) -> rendered surface, least recently used first
+		self.__hits = 0
+		self.__misses = 0
+
+	def render(self, font, text, antialias, colour):
+		# same as font.render(text, antialias, colour), but only renders text it hasnt seen recently
+		key = (font, text, bool(antialias), tuple(colour))
+		surface = self.__surfaces.get(key)
+		if surface is not None:
+			self.__hits += 1
+			self.__surfaces.move_to_end(key)
+			return surface
+		self.__misses += 1
+		surface = font.render(text, antialias, colour)
+		if pygame.display.get_surface() is not None:
+			# in the screen's pixel format, so it isnt converted every time it is blitted
+			surface = surface.convert_alpha()
+		self.__surfaces[key] = surface
+		if len(self.__surfaces) > self.__max_size:
+			self.__surfaces.popitem(last=False)
+		return surface
+
+	def get_stats(self):
+		# returns (hits, misses)
+		return (self.__hits, self.__misses)
+
+	def clear(self):
+		self.__surfaces.clear()
+
+	def __len__(self):
+		return len(self.__surfaces)
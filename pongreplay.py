@@ -0,0 +1,219 @@
+"""Jordan Ogilvy, 'pypong' replays. A match is saved as its seed and settings, one byte of input per tick, and a full
+copy of the match state every so often (a keyframe). Playing the inputs back through a pongsim.World plays the match
+again exactly, and the keyframes let a replay jump to any tick without playing everything before it.
+Replay files are read through mmap, so opening one only reads the parts that get used.
+
+File layout, all numbers little endian:
+	b"PONGRPL1"
+	header length (uint32), header (JSON: seed, difficulty, predictive, width, height, fixed_point, ticks, keyframe_interval)
+	inputs, one byte per tick: bit 0 up, bit 1 down
+	keyframes, each: tick (uint32), length (uint32), state length (uint32), state (JSON), random number generator state (625 uint32s)
+	index: keyframe count (uint32), then tick (uint32) and file offset (uint64) of each keyframe
+	index offset (uint64)
+
+e.g. python pongreplay.py match.pongreplay --seek 3600 --realtime
+e.g. python pongreplay.py match.pongreplay --hash-every 600		state hashes to compare with another machine
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import struct
+import time
+from array import array
+import pongsim
+
+MAGIC = b"PONGRPL1"
+UP = 1
+DOWN = 2
+
+def pack_inputs(up, down):
+	return (UP if up else 0) | (DOWN if down else 0)
+
+def unpack_inputs(byte):
+	return (bool(byte & UP), bool(byte & DOWN))
+
+def pack_state(state):
+	# a World state as bytes. The random number generator state is most of it, so it is stored as raw ints instead of JSON
+	state = dict(state)
+	version, internal, gauss_next = state.pop("rng")
+	state["rng"] = [version, gauss_next]
+	text = json.dumps(state, separators=(",", ":")).encode()
+	return struct.pack("<I", len(text)) + text + array("I", internal).tobytes()
+
+def unpack_state(data):
+	length, = struct.unpack_from("<I", data)
+	state = json.loads(bytes(data[4:4+length]))
+	internal = array("I")
+	internal.frombytes(bytes(data[4+length:]))
+	version, gauss_next = state["rng"]
+	state["rng"] = (version, tuple(internal), gauss_next)
+	return state
+
+class ReplayRecorder:
+	# collects the player's inputs for one match as it is played. The seed and settings must be the ones the match was
+	# started with, and everything random in the match must come from random.Random(seed), so the match can be played again
+	def __init__(self, seed, difficulty=1, predictive=False, width=pongsim.FIELD_SIZE[0], height=pongsim.FIELD_SIZE[1],
+			fixed_point=False):
+		self.__settings = {"seed": seed, "difficulty": difficulty, "predictive": predictive, "width": width, "height": height,
+			"fixed_point": fixed_point}
+		self.__inputs = bytearray()		#one byte per tick, from pack_inputs
+
+	def reset(self, seed, difficulty=1, predictive=False, fixed_point=False):
+		# start recording a new match, throwing away the last one
+		self.__settings.update(seed=seed, difficulty=difficulty, predictive=predictive, fixed_point=fixed_point)
+		del self.__inputs[:]
+
+	def record(self, up, down):
+		# called once a tick with the keys that moved the player paddle that tick
+		self.__inputs.append(pack_inputs(up, down))
+
+	def get_tick_count(self):
+		return len(self.__inputs)
+
+	def get_settings(self):
+		return dict(self.__settings)
+
+	def save(self, path, keyframe_interval=30*pongsim.TICK_RATE):
+		# play the match through a World to make the keyframes, then write the replay file. Ticks recorded after the match
+		# finished are left out. Returns the size of the file in bytes
+		world = new_world(self.__settings)
+		keyframes = []
+		for tick, byte in enumerate(self.__inputs):
+			if world.is_over():
+				break
+			if tick and tick % keyframe_interval == 0:
+				keyframes.append((tick, pack_state(world.get_state())))
+			world.step(unpack_inputs(byte))
+		ticks = world.get_tick()
+
+		header = dict(self.__settings, ticks=ticks, keyframe_interval=keyframe_interval)
+		header = json.dumps(header).encode()
+		with open(path, "wb") as out:
+			out.write(MAGIC)
+			out.write(struct.pack("<I", len(header)))
+			out.write(header)
+			out.write(self.__inputs[:ticks])
+			index = []
+			for tick, data in keyframes:
+				index.append((tick, out.tell()))
+				out.write(struct.pack("<II", tick, len(data)))
+				out.write(data)
+			index_offset = out.tell()
+			out.write(struct.pack("<I", len(index)))
+			for tick, offset in index:
+				out.write(struct.pack("<IQ", tick, offset))
+			out.write(struct.pack("<Q", index_offset))
+			return out.tell()
+
+def new_world(settings):
+	# a World at tick 0 of the match the settings describe. Replays from before fixed point physics dont have it set
+	return pongsim.World(settings["width"], settings["height"], settings["difficulty"], settings["seed"], settings["predictive"],
+		settings.get("fixed_point", False))
+
+class Replay:
+	# a saved match, opened for playing back. Use it in a with statement, or call close() when done with it
+	def __init__(self, path):
+		self.__file = open(path, "rb")
+		self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+		if self.__map[:len(MAGIC)] != MAGIC:
+			self.close()
+			raise ValueError("%s is not a pypong replay" % path)
+		length, = struct.unpack_from("<I", self.__map, len(MAGIC))
+		self.__inputs_offset = len(MAGIC) + 4 + length
+		self.__settings = json.loads(self.__map[len(MAGIC)+4:self.__inputs_offset])
+		self.__ticks = self.__settings.pop("ticks")
+		index_offset, = struct.unpack_from("<Q", self.__map, len(self.__map) - 8)
+		count, = struct.unpack_from("<I", self.__map, index_offset)
+		self.__keyframe_ticks = []		#sorted, for finding the keyframe before a tick with bisect
+		self.__keyframe_offsets = []
+		for i in range(count):
+			tick, offset = struct.unpack_from("<IQ", self.__map, index_offset + 4 + 12*i)
+			self.__keyframe_ticks.append(tick)
+			self.__keyframe_offsets.append(offset)
+
+	def get_settings(self):
+		# seed, difficulty, predictive, width, height, keyframe_interval and, in newer replays, fixed_point
+		return dict(self.__settings)
+
+	def get_tick_count(self):
+		return self.__ticks
+
+	def get_keyframe_ticks(self):
+		return list(self.__keyframe_ticks)
+
+	def get_inputs(self, tick):
+		# the (up, down) inputs for tick
+		if not 0 <= tick < self.__ticks:
+			raise IndexError("tick %d is not in this replay" % tick)
+		return unpack_inputs(self.__map[self.__inputs_offset + tick])
+
+	def seek(self, tick):
+		# a World at the start of tick, made from the last keyframe before it and playing the inputs from there
+		tick = max(0, min(tick, self.__ticks))
+		world = new_world(self.__settings)
+		i = bisect.bisect_right(self.__keyframe_ticks, tick) - 1
+		if i >= 0:
+			offset = self.__keyframe_offsets[i]
+			keyframe_tick, length = struct.unpack_from("<II", self.__map, offset)
+			world.set_state(unpack_state(memoryview(self.__map)[offset+8:offset+8+length]))
+		inputs = self.__map[self.__inputs_offset + world.get_tick():self.__inputs_offset + tick]
+		for byte in inputs:
+			world.step(unpack_inputs(byte))
+		return world
+
+	def play(self, start=0, realtime=False):
+		# play the match from tick start to the end, yielding (world, events) after every tick. With realtime set it
+		# runs at pongsim.TICK_RATE ticks a second, otherwise as fast as it can
+		world = self.seek(start)
+		inputs = self.__map[self.__inputs_offset + world.get_tick():self.__inputs_offset + self.__ticks]
+		tick_time = 1/pongsim.TICK_RATE
+		next_tick = time.perf_counter()
+		for byte in inputs:
+			if realtime:
+				next_tick += tick_time
+				delay = next_tick - time.perf_counter()
+				if delay > 0:
+					time.sleep(delay)
+			yield (world, world.step(unpack_inputs(byte)))
+
+	def close(self):
+		self.__map.close()
+		self.__file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Play a saved pypong match again with no window, printing the points as they happen.")
+	parser.add_argument("replay", help="the .pongreplay file to play")
+	parser.add_argument("--seek", type=int, default=0, help="tick to start playing from")
+	parser.add_argument("--realtime", action="store_true", help="play at normal speed instead of as fast as possible")
+	parser.add_argument("--hash-every", type=int, metavar="TICKS", help="print the state hash every this many ticks")
+	args = parser.parse_args(argv)
+
+	with Replay(args.replay) as replay:
+		settings = replay.get_settings()
+		print("seed %s, difficulty %d%s%s, %d ticks, keyframes at %s" % (settings["seed"], settings["difficulty"],
+			" (predictive)" if settings["predictive"] else "", " (fixed point)" if settings.get("fixed_point") else "",
+			replay.get_tick_count(), replay.get_keyframe_ticks()))
+		start = time.perf_counter()
+		world = None
+		for world, events in replay.play(args.seek, args.realtime):
+			for event, value in events:
+				if event == pongsim.POINT_SCORED:
+					player_score, opponent_score = world.get_rules().get_scores()
+					print("tick %d: %s scored, %d-%d" % (world.get_tick(), value, opponent_score, player_score))
+			if args.hash_every and world.get_tick() % args.hash_every == 0:
+				print("tick %d: state hash %s" % (world.get_tick(), world.get_state_hash()))
+		elapsed = time.perf_counter() - start
+		if world is not None:
+			print("winner %s after %d ticks, played in %.3fs, state hash %s" % (world.get_winner(), world.get_tick(), elapsed,
+				world.get_state_hash()))
+
+if __name__ == "__main__":
+	main()
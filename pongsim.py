@@ -0,0 +1,808 @@
+"""Jordan Ogilvy, 'pypong' simulation core. The game state and rules of pypong in pure python, with no pygame in sight.
+The pygame classes in pypong.py draw from these objects, and World steps a whole match on its own with no window at all.
+
+Everything random in a World comes from its own random.Random(seed), so the same seed and inputs always play the same
+match. The ball normally moves with floats and math.cos, sin and atan, which can come out a tiny bit differently on a
+different machine or maths library. FixedBallBody moves it with whole numbers only, so a match plays exactly the same
+everywhere, and state_hash gives the same answer for it on every machine."""
+
+import hashlib
+import json
+import math
+import random
+import struct
+from myqueue import MyQueue
+
+# the things that can happen during a step. The step methods return lists of (event, value) tuples using these
+PADDLE_HIT = "paddle_hit"		# value is None
+POINT_SCORED = "point_scored"	# value is PLAYER or OPPONENT, whoever won the point
+SERVE = "serve"					# value is None
+MATCH_OVER = "match_over"		# value is PLAYER or OPPONENT, whoever won the match
+
+PLAYER = "player"		# the paddle on the right
+OPPONENT = "opponent"	# the ai paddle on the left
+
+FIELD_SIZE = (640, 480)		# width and height of the playfield. Everything in the simulation is in these logical units
+
+TICK_RATE = 60		# simulation ticks per second. The game was written to run one tick per frame at 60 frames per second
+
+# ball speed, max serve angle and opponent difficulty for each difficulty. 0 for easy, 1 for normal, 2 for hard
+DIFFICULTY_PRESETS = (
+	{"ball_speed": 10, "max_serve_angle": math.pi/36, "ai_difficulty": 0},
+	{"ball_speed": 12, "max_serve_angle": math.pi/18, "ai_difficulty": 1},
+	{"ball_speed": 14, "max_serve_angle": math.pi/12, "ai_difficulty": 2},
+)
+
+AI_REACTION_TIMES = (14, 8, 3)		# reaction time in ticks of the ai on easy, normal and hard
+
+# reaction time in ticks and aiming error of the predictive ai on easy, normal and hard. See PredictiveBrain
+PREDICTIVE_AI_PRESETS = (
+	{"reaction_time": 12, "error": 120},
+	{"reaction_time": 6, "error": 50},
+	{"reaction_time": 2, "error": 10},
+)
+
+# fixed point units for FixedBallBody. Positions and speeds are in 1/FIXED_ONE of a pixel, and directions are in
+# 1/TURN of a full turn
+FIXED_BITS = 16
+FIXED_ONE = 1 << FIXED_BITS
+TURN = 1 << 16
+_SERIES_BITS = 64		#precision the sines and cosines are worked out to before rounding to FIXED_BITS
+_PI = int("31415926535897932384626433832795028841971693993751") * (1 << _SERIES_BITS) // 10**49
+
+def to_angle(radians):
+	# radians as a whole number of TURN units. Multiplying and dividing floats gives the same answer everywhere
+	return round(radians*(TURN//2)/math.pi) % TURN
+
+def _series(term, n, x2):
+	# the taylor series starting at term, for sin with n 1 or cos with n 0
+	total = 0
+	sign = 1
+	while term:
+		total += sign*term
+		term = (term*x2 >> _SERIES_BITS) // ((n+1)*(n+2))
+		n += 2
+		sign = -sign
+	return total
+
+def fixed_cos_sin(angle):
+	# (cos, sin) of angle TURN units, times FIXED_ONE, with whole numbers only so it is the same on every machine.
+	# Only the first quarter turn is worked out, so a bounce off a wall or paddle gives exactly the mirrored speeds
+	angle %= TURN
+	if angle > TURN//2:
+		cos, sin = fixed_cos_sin(TURN - angle)
+		return (cos, -sin)
+	if angle > TURN//4:
+		cos, sin = fixed_cos_sin(TURN//2 - angle)
+		return (-cos, sin)
+	x = angle*2*_PI // TURN
+	x2 = x*x >> _SERIES_BITS
+	half = 1 << (_SERIES_BITS - FIXED_BITS - 1)		#for rounding to the nearest
+	cos = (_series(1 << _SERIES_BITS, 0, x2) + half) >> (_SERIES_BITS - FIXED_BITS)
+	sin = (_series(x, 1, x2) + half) >> (_SERIES_BITS - FIXED_BITS)
+	return (cos, sin)
+
+def state_hash(state):
+	# a short hex digest of a World.get_state(). Two Worlds with the same hash are in the same state. json writes floats
+	# exactly, so this is the same on every machine for the same state
+	state = dict(state)
+	version, internal, gauss_next = state.pop("rng")
+	state["rng"] = [version, gauss_next]
+	digest = hashlib.blake2b(json.dumps(state, sort_keys=True, separators=(",", ":")).encode(), digest_size=8)
+	digest.update(struct.pack("<%dI" % len(internal), *internal))
+	return digest.hexdigest()
+
+class PaddleBody:
+	def __init__(self):
+		self.__x = 0		# x and y co ordinates for the top left corner of the paddle
+		self.__y = 0
+		self.__height = 80	# width and height of paddle in pixels
+		self.__width = 15
+		self.__speed = 5	#speed of paddle in pixels per tick. paddle moves at this speed, or it doesnt move at all. also vertical.
+
+	def get_rect(self):
+		# return the x, y, width, and height of the paddle in a tuple. Used for collision checking
+		return (self.__x, self.__y, self.__width, self.__height)
+
+	def get_position(self):
+		return (self.__x, self.__y)
+
+	def get_speed(self):
+		return self.__speed
+
+	def move_up(self):
+		self.__y -= self.__speed
+
+	def move_down(self):
+		self.__y += self.__speed
+
+	def set_position(self, newx, newy):
+		self.__x = newx
+		self.__y = newy
+
+	# get_state returns everything that changes as the paddle moves, and set_state puts it back. Used for saving and restoring matches
+	def get_state(self):
+		return [self.__x, self.__y]
+
+	def set_state(self, state):
+		self.__x, self.__y = state
+
+class BallBody:
+	def __init__(self, width, height, rng=random):
+		self.__width = width		#size of the playfield the ball bounces around in
+		self.__height = height
+		self.__rng = rng		#anything with a uniform() method, like the random module or a random.Random
+		self.__size = 16		#the ball is a square
+		#between 0 and pi/2, the  max angle from the horizontal in either direction the ball bounces from a paddle
+		self.__max_bounce_angle = math.pi/5
+		self.reset()
+
+	def reset(self):
+		# stop the ball in the corner, where it starts, so the rules serve it for a new match
+		self.__velocity = 0	# current velocity of the ball in pixels per tick
+		self.__direction = 0	#direction of the ball in radians, 0 is right, pi/2 is up.
+		self.__hspeed = 0
+		self.__vspeed = 0 	#2d speed components of the velocity
+		self.__x = 0
+		self.__y = 0	#coords of the top left corner of the ball
+		self.__next_x = self.__x + self.__hspeed
+		self.__next_y = self.__y + self.__vspeed
+
+	def get_size(self):
+		return self.__size
+
+	def get_position(self):
+		return (self.__x, self.__y)
+
+	def get_direction(self):
+		return self.__direction
+
+	def get_velocity(self):
+		return self.__velocity
+
+	def set_position(self, newx, newy):
+		self.__x = newx
+		self.__y = newy
+
+	def set_velocity(self, new_velocity):
+		self.__velocity = new_velocity
+		self.__calculate_speed_components()
+
+	def set_direction(self, new_direction):
+		self.__direction = new_direction
+		self.__calculate_speed_components()
+
+	def __calculate_speed_components(self):
+		self.__hspeed = self.__velocity*math.cos(self.__direction)
+		self.__vspeed = self.__velocity*math.sin(self.__direction)
+
+	def set_direction_random(self, base_direction, error):
+		# set direction to a random direction plus or minus a random value within the range of the specified error. All in radians
+		offset = self.__rng.uniform(0, error*2)
+		self.__direction = base_direction + error - offset
+		self.__calculate_speed_components()
+
+	def is_in_play(self):
+		return (self.__x > 0 and self.__x < self.__width)
+
+	def get_speed(self):
+		# (hspeed, vspeed) in pixels per tick that the next step moves the ball by, with vspeed up the screen
+		self.__calculate_speed_components()
+		return (self.__hspeed, self.__vspeed)
+
+	def get_state(self):
+		# the speed components and next position are worked out from these at the start of every step, so they arent needed
+		return [self.__x, self.__y, self.__velocity, self.__direction]
+
+	def set_state(self, state):
+		self.__x, self.__y, self.__velocity, self.__direction = state
+		self.__calculate_speed_components()
+
+	def __check_wall_collision(self):
+		#check for collisions with the top and bottom of the playfield
+		if self.__next_y < 0 or self.__next_y > self.__height-self.__size:
+			self.__vspeed = -self.__vspeed	#bounce of the walls by reversing the vertical direction (walls are only top and bottom)
+			try:	#beware of division by 0 when working out the new direction based on the 2d speeds
+				self.__direction = math.atan(self.__vspeed/self.__hspeed)
+				if self.__hspeed<0:
+					self.__direction += math.pi
+			except ZeroDivisionError:
+				self.__direction = 0
+
+	def __check_paddle_collision(self, paddles):
+		hit = False
+		for paddle in paddles:
+			#for every paddle, check if the ball will overlap with the paddle in the next tick
+			x1, y1, w1, h1 = self.__next_x, self.__next_y, self.__size, self.__size
+			(x2, y2, w2, h2) = paddle.get_rect()
+			if not (x2>x1+w1 or x2+w2<x1 or y1+h1<y2 or y1>y2+h2):	#AABB collision check
+				#after colliding with a paddle, the ball bounces back the other way (left->right) in a direction within a random cone
+				if self.__hspeed<0:	#if going left, go right in a random direction
+					new_base_direction = 0
+				else:	#otherwise we must be going right, so change to going left
+					new_base_direction = math.pi
+				self.set_direction_random(new_base_direction, self.__max_bounce_angle)
+				hit = True
+		return hit
+
+	def step(self, paddles):
+		# move the ball one tick, bouncing it off the walls and the passed paddles. Returns True if it hit a paddle
+		#calculate the would-be position of the ball in the next tick, based on the current direction and velocity.
+		self.__calculate_speed_components()
+		self.__next_x = self.__x + self.__hspeed
+		self.__next_y = self.__y - self.__vspeed
+
+		#handle collisions
+		self.__check_wall_collision()
+		hit = self.__check_paddle_collision(paddles)
+
+		#move the balll
+		self.__x += self.__hspeed
+		self.__y -= self.__vspeed	#subtract because the screen has 0 at the top, not the bottom
+		return hit
+
+class FixedBallBody:
+	# the same ball as BallBody, but everything it works out is whole numbers: positions and speeds in 1/FIXED_ONE of a
+	# pixel, and the direction in TURN units, with fixed_cos_sin instead of math.cos and sin, so it moves exactly the same
+	# on every machine. Positions, speeds and directions are still given and returned in pixels and radians
+	def __init__(self, width, height, rng=random):
+		self.__width = width*FIXED_ONE		#size of the playfield the ball bounces around in
+		self.__height = height*FIXED_ONE
+		self.__rng = rng		#anything with a randint() method, like the random module or a random.Random
+		self.__size = 16
+		self.__max_bounce_angle = to_angle(math.pi/5)
+		self.reset()
+
+	def reset(self):
+		self.__velocity = 0
+		self.__direction = 0	#TURN units, 0 is right, TURN//4 is up
+		self.__hspeed = 0
+		self.__vspeed = 0
+		self.__x = 0
+		self.__y = 0
+
+	def get_size(self):
+		return self.__size
+
+	def get_position(self):
+		# dividing by a power of 2 is exact, so these are the same everywhere too
+		return (self.__x/FIXED_ONE, self.__y/FIXED_ONE)
+
+	def get_direction(self):
+		return self.__direction*math.pi/(TURN//2)
+
+	def get_velocity(self):
+		return self.__velocity/FIXED_ONE
+
+	def set_position(self, newx, newy):
+		self.__x = round(newx*FIXED_ONE)
+		self.__y = round(newy*FIXED_ONE)
+
+	def set_velocity(self, new_velocity):
+		self.__velocity = round(new_velocity*FIXED_ONE)
+		self.__calculate_speed_components()
+
+	def set_direction(self, new_direction):
+		self.__direction = to_angle(new_direction)
+		self.__calculate_speed_components()
+
+	def __calculate_speed_components(self):
+		cos, sin = fixed_cos_sin(self.__direction)
+		self.__hspeed = (self.__velocity*cos + FIXED_ONE//2) >> FIXED_BITS
+		self.__vspeed = (self.__velocity*sin + FIXED_ONE//2) >> FIXED_BITS
+
+	def set_direction_random(self, base_direction, error):
+		error = to_angle(error)
+		self.__direction = (to_angle(base_direction) + error - self.__rng.randint(0, error*2)) % TURN
+		self.__calculate_speed_components()
+
+	def is_in_play(self):
+		return (self.__x > 0 and self.__x < self.__width)
+
+	def get_speed(self):
+		# the speeds step uses, rounded to whole fixed point units, so a prediction from them rounds the same way
+		return (self.__hspeed/FIXED_ONE, self.__vspeed/FIXED_ONE)
+
+	def get_state(self):
+		# whole numbers, in the fixed point units
+		return [self.__x, self.__y, self.__velocity, self.__direction]
+
+	def set_state(self, state):
+		self.__x, self.__y, self.__velocity, self.__direction = state
+		self.__calculate_speed_components()
+
+	def step(self, paddles):
+		# move the ball one tick, bouncing it off the walls and the passed paddles. Returns True if it hit a paddle
+		size = self.__size*FIXED_ONE
+		next_x = self.__x + self.__hspeed
+		next_y = self.__y - self.__vspeed
+		if next_y < 0 or next_y > self.__height - size:
+			# a wall bounce mirrors the direction, which is what BallBody works out with atan
+			self.__direction = -self.__direction % TURN
+			self.__calculate_speed_components()
+		hit = False
+		for paddle in paddles:
+			x, y, w, h = (value*FIXED_ONE for value in paddle.get_rect())
+			if not (x > next_x+size or x+w < next_x or next_y+size < y or next_y > y+h):
+				base_direction = 0 if self.__hspeed < 0 else TURN//2
+				self.__direction = (base_direction + self.__max_bounce_angle - self.__rng.randint(0, self.__max_bounce_angle*2)) % TURN
+				self.__calculate_speed_components()
+				hit = True
+		self.__x += self.__hspeed
+		self.__y -= self.__vspeed
+		return hit
+
+class PlayerControl:
+	# moves a paddle from the state of the up and down keys, the way the player paddle has always moved
+	def __init__(self, paddle):
+		self.__paddle = paddle
+		self.__last_move = lambda *args: None		#track the direction the paddle moved last. points to a method.
+
+	def step(self, up, down):
+		if up and down:
+			# if both keys are down, move in the direction of the key that was pressed first.
+			self.__last_move()
+		elif up:
+			self.__paddle.move_up()
+			self.__last_move = self.__paddle.move_up
+		elif down:
+			self.__paddle.move_down()
+			self.__last_move = self.__paddle.move_down
+		else:	# if no keys are being pressed, set last_move to a do nothing function using lambda
+			self.__last_move = lambda *args: None
+
+	def get_state(self):
+		# the direction the paddle last moved: -1 for up, 1 for down, 0 for not moving
+		if self.__last_move == self.__paddle.move_up:
+			return -1
+		elif self.__last_move == self.__paddle.move_down:
+			return 1
+		return 0
+
+	def set_state(self, state):
+		self.__last_move = {-1: self.__paddle.move_up, 1: self.__paddle.move_down}.get(state, lambda *args: None)
+
+	def reset(self):
+		self.set_state(0)
+
+class OpponentBrain:
+	# the thinking of the ai paddle. Moves a paddle towards where it saw the ball a few ticks ago
+	# side is OPPONENT for a paddle on the left, or PLAYER for an ai playing the right hand paddle
+	def __init__(self, paddle, height, side=OPPONENT):
+		self.__paddle = paddle
+		self.__height = height		#height of the playfield, so the paddle doesnt leave it
+		self.__brain = MyQueue(max(AI_REACTION_TIMES)+1)	# tracks the balls position on different ticks. Used for simulating delayed reaction time
+		self.__reaction_time = 5	# reaction time of AI in ticks
+		self.__reaction_override = None		#reaction time to use instead of the difficulty's, if set
+		self.__away = 1 if side == OPPONENT else -1		#sign of cos(ball direction) when the ball is moving away from the paddle
+		self.__difficulties = (self.__ai_easy, self.__ai_normal, self.__ai_hard)
+		self.__current_difficulty = 0		#0 for easy, 1 for normal, 2 for hard
+
+	def set_difficulty(self, new_difficulty):
+		# new_difficulty must be an int between 0-2. 0 for easy, 1 for normal, 2 for hard
+		self.__current_difficulty = new_difficulty
+
+	def get_difficulty(self):
+		return self.__current_difficulty
+
+	def set_reaction_time(self, new_reaction_time):
+		# use new_reaction_time ticks whatever the difficulty, or go back to the difficulty's reaction time with None
+		self.__reaction_override = new_reaction_time
+		if new_reaction_time is not None and new_reaction_time >= max(AI_REACTION_TIMES):
+			self.__brain = MyQueue(new_reaction_time+1)
+
+	def __remember(self, ball, reaction_time):
+		# forget anything older than the reaction time, then remember where the ball is now
+		if self.__reaction_override is not None:
+			reaction_time = self.__reaction_override
+		self.__reaction_time = reaction_time
+		while(self.__brain.size()>self.__reaction_time):
+			self.__brain.dequeue()
+		self.__brain.enqueue(ball.get_position())
+
+	def __move_towards(self, target_y):
+		# move the paddle towards target_y, making sure it doesnt move off the playfield
+		paddle_rect = self.__paddle.get_rect()
+		paddle_speed = self.__paddle.get_speed()
+		if paddle_rect[1]+paddle_rect[3]//2 < target_y - paddle_speed and \
+		paddle_rect[1]+paddle_rect[3]<self.__height:
+			self.__paddle.move_down()
+		elif paddle_rect[1]+paddle_rect[3]//2 > target_y + paddle_speed and \
+		paddle_rect[1]>0:
+			self.__paddle.move_up()
+
+	# the ai methods. different thinking process for each difficulty
+	def __ai_base(self, ball, reaction_time):
+		self.__remember(ball, reaction_time)
+		# only check the ball position and move to it if the ball is in play
+		if ball.is_in_play():
+			if self.__brain.size()>self.__reaction_time:
+				ball_position = self.__brain.dequeue()	#get the position of the ball from reaction_time ticks ago, in a (x, y) tuple
+				self.__move_towards(ball_position[1])
+
+	def __ai_easy(self, ball):
+		#same as ai_normal but with a slower reaction time
+		self.__ai_base(ball, AI_REACTION_TIMES[0])
+
+	def __ai_normal(self, ball):
+		self.__ai_base(ball, AI_REACTION_TIMES[1])
+
+	def __ai_hard(self, ball):
+		#same as ai_normal but with a faster reaction time, and moves to the middle after returning a shot.
+		self.__remember(ball, AI_REACTION_TIMES[2])
+		if ball.is_in_play():
+			if self.__brain.size()>self.__reaction_time:
+				ball_position = self.__brain.dequeue()	#get the position of the ball from reaction_time ticks ago, in a (x, y) tuple
+				# if the ball is moving away from the ai, move towards the middle of the playfield
+				if math.cos(ball.get_direction())*self.__away>0:
+					paddle_rect = self.__paddle.get_rect()
+					paddle_speed = self.__paddle.get_speed()
+					if paddle_rect[1]+paddle_rect[3]//2<self.__height//2-paddle_speed:
+						self.__paddle.move_down()
+					elif paddle_rect[1]+paddle_rect[3]//2>self.__height//2+paddle_speed:
+						self.__paddle.move_up()
+				# otherwise move the ai paddle towards the balls y position
+				else:
+					self.__move_towards(ball_position[1])
+
+	def step(self, ball):
+		self.__difficulties[self.__current_difficulty](ball)
+
+	def get_state(self):
+		return {"difficulty": self.__current_difficulty, "reaction_override": self.__reaction_override,
+			"seen": [list(position) for position in self.__brain]}
+
+	def reset(self):
+		# forget where it has seen the ball, ready for a new match. The difficulty and reaction time stay the same
+		while not self.__brain.is_empty():
+			self.__brain.dequeue()
+
+	def set_state(self, state):
+		self.set_difficulty(state["difficulty"])
+		self.set_reaction_time(state["reaction_override"])
+		self.reset()
+		self.__brain.enqueue_many(tuple(position) for position in state["seen"])
+
+class PredictiveBrain:
+	# an ai that works out where the ball will cross the paddle, bouncing off the walls on the way, instead of chasing
+	# where it saw the ball. The prediction only gets worked out again when the ball changes direction or speed (a paddle hit,
+	# a wall bounce or a serve), and the paddle just heads for the predicted spot the rest of the time.
+	# reaction_time: ticks between the ball changing direction and the ai noticing and predicting again
+	# error: standard deviation in pixels of the aiming mistake for a ball crossing the whole width of the playfield.
+	# Shorter shots are guessed more accurately.
+	def __init__(self, paddle, width, height, reaction_time=0, error=0.0, rng=random):
+		self.__paddle = paddle
+		self.__width = width		#size of the playfield
+		self.__height = height
+		self.__reaction_time = reaction_time
+		self.__error = error
+		self.__rng = rng
+		self.reset()
+
+	def reset(self):
+		# forget the last prediction, ready for a new match. The reaction time and error stay the same
+		self.__last_direction = None	#direction and velocity of the ball when the last prediction was made
+		self.__last_velocity = None
+		self.__countdown = 0		#ticks until the ai notices the ball changed direction
+		self.__pending = False		#True while waiting to notice a change
+		self.__target = self.__height/2	#the y the centre of the paddle is heading for
+		self.__predictions = 0		#number of predictions made so far
+
+	def set_reaction_time(self, new_reaction_time):
+		self.__reaction_time = new_reaction_time
+
+	def set_error(self, new_error):
+		self.__error = new_error
+
+	def get_target(self):
+		return self.__target
+
+	def get_prediction_count(self):
+		return self.__predictions
+
+	def predict(self, ball):
+		# returns (y, ticks): the y the centre of the ball will be at when it reaches the paddle, and how many ticks away that is.
+		# Returns None if the ball isnt coming towards the paddle.
+		paddle_x, paddle_y, paddle_w, paddle_h = self.__paddle.get_rect()
+		size = ball.get_size()
+		hspeed, vspeed = ball.get_speed()
+		if paddle_x + paddle_w/2 < self.__width/2:	#paddle on the left, the ball has to be moving left
+			plane_x = paddle_x + paddle_w
+			incoming = hspeed < 0
+		else:
+			plane_x = paddle_x - size
+			incoming = hspeed > 0
+		if not incoming:
+			return None
+		# the step the ball would hit the paddle on, and the y the paddle check is done at on that step. Nothing is stepped:
+		# a FixedBallBody's positions and speeds are whole numbers of 1/FIXED_ONE pixels, which these sums get exactly, and
+		# a BallBody only drifts from them by the rounding of its own sums, a few 1e-12 of a pixel
+		x, y = ball.get_position()
+		ticks = max(math.ceil((plane_x - x)/hspeed), 1)
+		return (self.__bounce_y(y, vspeed, ticks, size) + size/2, ticks)
+
+	def __bounce_y(self, y, vspeed, ticks, size):
+		# the same as pongbatch.BatchWorld's: a ball turns round a tick before it would go through a wall, so it goes back and
+		# forth over the same points, one step apart, and the walls are unfolded over those points instead of the playfield
+		step = abs(vspeed)
+		if step == 0:
+			return y
+		moving = -1 if vspeed > 0 else 1	#1 if the ball is going down the screen
+		top = y % step		#the y of the point nearest the top
+		start = math.floor(y/step)		#how many points below it the ball is now
+		points = max(math.floor((self.__height - size - top)/step), 1)		#points below it
+		def fold(i):
+			# which point the ball is on after it has moved i points, with the walls unfolded
+			i = i % (2*points)
+			return 2*points - i if i > points else i
+		last = fold(start + moving*(ticks-1))		#the point before the one the paddle is checked at
+		# the way it was going there. The bounce comes after the paddle check, so the check can be a point past a wall
+		going = moving
+		if ticks >= 2:
+			going = 1 if last > fold(start + moving*(ticks-2)) else -1
+		return top + (last + going)*step
+
+	def __think(self, ball):
+		prediction = self.predict(ball)
+		self.__predictions += 1
+		if prediction is None:
+			#the ball is going away, head back to the middle
+			self.__target = self.__height/2
+		else:
+			y, ticks = prediction
+			# the further the ball has to travel, the bigger the mistake can be
+			mistake = 0
+			if self.__error:
+				distance = abs(ticks*ball.get_velocity()*math.cos(ball.get_direction()))
+				mistake = self.__rng.gauss(0, self.__error*distance/self.__width)
+			self.__target = y + mistake
+
+	def step(self, ball):
+		direction = ball.get_direction()
+		velocity = ball.get_velocity()
+		if direction != self.__last_direction or velocity != self.__last_velocity:
+			self.__last_direction = direction
+			self.__last_velocity = velocity
+			if not self.__pending:
+				self.__pending = True
+				self.__countdown = self.__reaction_time
+		if self.__pending:
+			if self.__countdown > 0:
+				self.__countdown -= 1
+			else:
+				self.__pending = False
+				self.__think(ball)
+
+		# move the paddle towards the target, making sure it doesnt move off the playfield
+		paddle_rect = self.__paddle.get_rect()
+		paddle_speed = self.__paddle.get_speed()
+		if paddle_rect[1]+paddle_rect[3]//2 < self.__target - paddle_speed and \
+		paddle_rect[1]+paddle_rect[3]<self.__height:
+			self.__paddle.move_down()
+		elif paddle_rect[1]+paddle_rect[3]//2 > self.__target + paddle_speed and \
+		paddle_rect[1]>0:
+			self.__paddle.move_up()
+
+	def get_state(self):
+		return {"reaction_time": self.__reaction_time, "error": self.__error, "last_direction": self.__last_direction,
+			"last_velocity": self.__last_velocity, "countdown": self.__countdown, "pending": self.__pending,
+			"target": self.__target, "predictions": self.__predictions}
+
+	def set_state(self, state):
+		self.__reaction_time = state["reaction_time"]
+		self.__error = state["error"]
+		self.__last_direction = state["last_direction"]
+		self.__last_velocity = state["last_velocity"]
+		self.__countdown = state["countdown"]
+		self.__pending = state["pending"]
+		self.__target = state["target"]
+		self.__predictions = state["predictions"]
+
+class MatchRules:
+	# keeps score, puts the ball back in the centre when somebody wins a point, and serves it again after a wait
+	def __init__(self, width, height, rng=random):
+		self.__rng = rng
+		self.__restart_wait_ticks = 2*TICK_RATE	# ticks between the ball returning to the center, and the ball starting moving
+		self.reset()
+		self.__centre_x = width//2
+		self.__centre_y = height//2
+		self.__ball_speed = 12		# speed the ball moves at in pixels per tick
+		self.__score_limit = 7
+		self.__max_serve_angle = math.pi/8		# max angle from horizontal in radians the ball can move on a serve
+
+	def reset(self):
+		# back to 0-0 for a new match. The ball speed and serve angle stay the same
+		self.__player_score = 0
+		self.__opponent_score = 0
+		self.__serve_countdown = 0		#ticks left until the next serve, 0 if no serve is waiting
+
+	def set_ball_speed(self, new_speed):
+		self.__ball_speed = new_speed
+
+	def set_max_serve_angle(self, new_angle):
+		self.__max_serve_angle = new_angle		#remember, its all in radians
+
+	def get_scores(self):
+		# returns (player_score, opponent_score)
+		return (self.__player_score, self.__opponent_score)
+
+	def get_score_limit(self):
+		return self.__score_limit
+
+	def get_state(self):
+		return [self.__player_score, self.__opponent_score, self.__serve_countdown, self.__ball_speed, self.__max_serve_angle]
+
+	def set_state(self, state):
+		self.__player_score, self.__opponent_score, self.__serve_countdown, self.__ball_speed, self.__max_serve_angle = state
+
+	def __centre_ball(self, ball, events):
+		# called when somebody wins a point. Increments the scores, starts the serve countdown, and moves the ball to the centre.
+		ball_position = ball.get_position()
+		if ball_position[0]<0:		#increment the score of whoever won the point. determined by balls position off the playfield
+			self.__player_score += 1
+			events.append((POINT_SCORED, PLAYER))
+		elif ball_position[0]>self.__centre_x*2:
+			self.__opponent_score += 1
+			events.append((POINT_SCORED, OPPONENT))
+		self.__serve_countdown = self.__restart_wait_ticks
+		# stop the ball moving and place it in the centre of the playfield
+		ball.set_velocity(0)
+		ball.set_position(self.__centre_x-ball.get_size()//2, self.__centre_y-ball.get_size()//2)
+
+	def __restart_ball(self, ball, events):
+		base_direction = self.__rng.choice((0,  math.pi))	# left or right
+		ball.set_direction_random(base_direction, self.__max_serve_angle)
+		ball.set_velocity(self.__ball_speed)
+		events.append((SERVE, None))
+
+	def __check_for_winner(self, events):
+		# called at the end of each point. Check if the player or opponent won.
+		if self.__player_score == self.__score_limit:
+			events.append((MATCH_OVER, PLAYER))
+		if self.__opponent_score == self.__score_limit:
+			events.append((MATCH_OVER, OPPONENT))
+
+	def step(self, ball):
+		events = []
+		need_restart = False
+		if self.__serve_countdown > 0:
+			self.__serve_countdown -= 1
+			#when the countdown runs out, the ball needs to start moving again
+			need_restart = self.__serve_countdown == 0
+
+		# if the ball is not in play, somebody must have won the point, so put it back in the centre
+		if not ball.is_in_play():
+			self.__centre_ball(ball, events)
+			self.__check_for_winner(events)
+		if need_restart:
+			self.__restart_ball(ball, events)
+		return events
+
+class World:
+	# a whole match of pypong: the player paddle, the ai paddle, the ball and the rules, stepped together one tick at a time
+	# difficulty picks the ball speed, serve angle and ai from DIFFICULTY_PRESETS. With predictive set, the ai is a
+	# PredictiveBrain using the PREDICTIVE_AI_PRESETS for the same difficulty instead of the usual OpponentBrain.
+	# With fixed_point set the ball is a FixedBallBody, so the match plays exactly the same on every machine. The
+	# predictive ai still makes its mistakes with floats, so that only holds for the usual ai
+	def __init__(self, width=FIELD_SIZE[0], height=FIELD_SIZE[1], difficulty=1, seed=None, predictive=False, fixed_point=False):
+		self.__width = width
+		self.__height = height
+		self.__rng = random.Random(seed)
+		self.__player = PaddleBody()
+		self.__player.set_position(width-35, 200)		#player on the right hand side, ai on the left
+		self.__player_control = PlayerControl(self.__player)
+		self.__opponent = PaddleBody()
+		self.__opponent.set_position(15, 200)
+		self.__fixed_point = fixed_point
+		self.__ball = (FixedBallBody if fixed_point else BallBody)(width, height, self.__rng)
+		self.__rules = MatchRules(width, height, self.__rng)
+		preset = DIFFICULTY_PRESETS[difficulty]
+		if predictive:
+			ai_preset = PREDICTIVE_AI_PRESETS[preset["ai_difficulty"]]
+			self.__brain = PredictiveBrain(self.__opponent, width, height, ai_preset["reaction_time"], ai_preset["error"], self.__rng)
+		else:
+			self.__brain = OpponentBrain(self.__opponent, height)
+			self.__brain.set_difficulty(preset["ai_difficulty"])
+		self.__rules.set_ball_speed(preset["ball_speed"])
+		self.__rules.set_max_serve_angle(preset["max_serve_angle"])
+		self.__player_brain = None
+		self.__tick = 0
+		self.__winner = None
+
+	def get_size(self):
+		return (self.__width, self.__height)
+
+	def is_fixed_point(self):
+		return self.__fixed_point
+
+	def get_player(self):
+		return self.__player
+
+	def get_opponent(self):
+		return self.__opponent
+
+	def get_ball(self):
+		return self.__ball
+
+	def get_rules(self):
+		return self.__rules
+
+	def get_brain(self):
+		return self.__brain
+
+	def set_opponent_brain(self, brain):
+		# swap the ai for another one made for get_opponent(). Anything with a step(ball) method will do
+		self.__brain = brain
+
+	def set_player_brain(self, brain):
+		# let an ai made for get_player() move the player paddle instead of the inputs to step. None gives control back
+		self.__player_brain = brain
+
+	def get_tick(self):
+		return self.__tick
+
+	def get_winner(self):
+		# PLAYER or OPPONENT once the match is over, None until then
+		return self.__winner
+
+	def is_over(self):
+		return self.__winner is not None
+
+	def get_state(self):
+		# everything about the match that changes as it is played, as a dict of plain python values, including the
+		# state of the random number generator. A World made with the same settings and given this with set_state
+		# carries on exactly as this one would
+		state = {
+			"tick": self.__tick,
+			"winner": self.__winner,
+			"rng": self.__rng.getstate(),
+			"player": self.__player.get_state(),
+			"opponent": self.__opponent.get_state(),
+			"ball": self.__ball.get_state(),
+			"rules": self.__rules.get_state(),
+			"player_control": self.__player_control.get_state(),
+			"brain": self.__brain.get_state(),
+		}
+		if self.__player_brain is not None:
+			state["player_brain"] = self.__player_brain.get_state()
+		return state
+
+	def get_state_hash(self):
+		# state_hash of get_state. The same seed and inputs give the same hash every tick
+		return state_hash(self.get_state())
+
+	def set_state(self, state):
+		# checked first, so a state that doesnt fit leaves this World as it was
+		if "player_brain" in state and self.__player_brain is None:
+			raise ValueError("the state has a player brain in it but this World doesnt, see set_player_brain")
+		self.__tick = state["tick"]
+		self.__winner = state["winner"]
+		version, internal, gauss_next = state["rng"]
+		self.__rng.setstate((version, tuple(internal), gauss_next))
+		self.__player.set_state(state["player"])
+		self.__opponent.set_state(state["opponent"])
+		self.__ball.set_state(state["ball"])
+		self.__rules.set_state(state["rules"])
+		self.__player_control.set_state(state["player_control"])
+		self.__brain.set_state(state["brain"])
+		if "player_brain" in state:
+			self.__player_brain.set_state(state["player_brain"])
+
+	def step(self, inputs=(False, False)):
+		# advance the match one tick. inputs is (up, down) for the player paddle. Returns the list of events that happened.
+		# things happen in the same order the objects were updated in the window: ai, rules, player, then the ball
+		if self.__winner is not None:
+			return []
+		self.__brain.step(self.__ball)
+		events = self.__rules.step(self.__ball)
+		if self.__player_brain is None:
+			self.__player_control.step(inputs[0], inputs[1])
+		else:
+			self.__player_brain.step(self.__ball)
+		if self.__ball.step((self.__opponent, self.__player)):
+			events.append((PADDLE_HIT, None))
+		for event, value in events:
+			if event == MATCH_OVER:
+				self.__winner = value
+		self.__tick += 1
+		return events
@@ -0,0 +1,403 @@
+"""Jordan Ogilvy, 'pypong' match statistics. Records every serve, paddle hit and point of every match: the serve angles,
+where on the paddle the ball hit, ball speeds, rally lengths and how long each point took. Keeps running totals and
+recent percentiles of each, and can save every row to a file, a batch at a time on a background thread, so a game left
+running for hours can be looked at afterwards without the saving slowing the frames down.
+
+Nothing here needs pygame. MatchStats.observe records a pongsim.World, and pypong.StatsRecorder records the game in the
+window from the signals on its event bus.
+
+File layout, all numbers little endian:
+	b"PONGSTA1"
+	then any number of blocks, each one batch of rows of one table:
+		table name length (uint32), table name, rows (uint32), columns (uint32)
+		then for each column: name length (uint32), name, and its value in every row (float64s)
+
+e.g. python pongstats.py simulate --matches 200 --out stats.pongstats
+e.g. python pongstats.py summary stats.pongstats
+"""
+
+import argparse
+import math
+import queue
+import struct
+import sys
+import threading
+import time
+from array import array
+import pongsim
+from myqueue import MyQueue
+
+MAGIC = b"PONGSTA1"
+
+# the tables, and the columns in each. side and winner are 1 for the player on the right and 0 for the opponent on the
+# left, offset is where on the paddle the ball hit from -1 at the top edge to 1 at the bottom edge, angle is degrees
+# above the horizontal, speed is pixels per tick, duration is seconds from the serve, and rally is paddle hits so far
+TABLES = {
+	"serves": ("match", "tick", "angle", "speed"),
+	"hits": ("match", "tick", "side", "offset", "speed", "rally"),
+	"points": ("match", "tick", "winner", "duration", "rally"),
+}
+UNSUMMARISED = ("match", "tick")		#columns that only say when a row happened, so arent worth totals
+
+def percentile(values, percent):
+	# the value percent of values are at or under, 0 if there arent any
+	values = sorted(values)
+	if not values:
+		return 0.0
+	return values[min(len(values)-1, int(len(values)*percent/100))]
+
+class RunningStats:
+	# totals for one column that dont need every value kept: count, mean, standard deviation, smallest and biggest of
+	# everything added, and percentiles of the last history values
+	def __init__(self, history=1000):
+		self.__recent = MyQueue(history, typecode="d")
+		self.__count = 0
+		self.__mean = 0.0
+		self.__squares = 0.0		#sum of squared differences from the mean, for the standard deviation (Welford's method)
+		self.__min = math.inf
+		self.__max = -math.inf
+
+	def add(self, value):
+		self.__recent.enqueue(value)
+		self.__count += 1
+		difference = value - self.__mean
+		self.__mean += difference/self.__count
+		self.__squares += difference*(value - self.__mean)
+		if value < self.__min:
+			self.__min = value
+		if value > self.__max:
+			self.__max = value
+
+	def get_count(self):
+		return self.__count
+
+	def get_mean(self):
+		return self.__mean
+
+	def get_std(self):
+		if self.__count < 2:
+			return 0.0
+		return math.sqrt(self.__squares/(self.__count - 1))
+
+	def get_percentile(self, percent):
+		# of the recent values only
+		return percentile(self.__recent, percent)
+
+	def get_summary(self):
+		if not self.__count:
+			return {"count": 0}
+		recent = sorted(self.__recent)
+		return {"count": self.__count, "mean": self.__mean, "std": self.get_std(), "min": self.__min, "max": self.__max,
+			"p50": percentile(recent, 50), "p90": percentile(recent, 90), "p99": percentile(recent, 99)}
+
+class ColumnarWriter:
+	# writes batches of rows to a stats file on its own thread. Each table gets spare_batches batches of batch_rows rows
+	# made up front, and a full batch goes back to its table's spares once it is written, so recording a row never
+	# allocates anything or waits for the disk
+	def __init__(self, path, batch_rows=256, spare_batches=4):
+		self.__file = open(path, "wb")
+		self.__file.write(MAGIC)
+		self.__batch_rows = batch_rows
+		self.__spare_batches = spare_batches
+		self.__spares = {}		#table name -> queue.Queue of empty batches, each a list of one array per column
+		self.__pending = queue.Queue()		#(table name, columns, batch, rows) waiting to be written, None to stop
+		self.__written = 0		#rows written so far
+		self.__thread = threading.Thread(target=self.__run, daemon=True)
+		self.__thread.start()
+
+	def get_batch_rows(self):
+		return self.__batch_rows
+
+	def get_written(self):
+		return self.__written
+
+	def add_table(self, name, columns):
+		spares = queue.Queue()
+		for i in range(self.__spare_batches):
+			spares.put([array("d", [0.0])*self.__batch_rows for column in columns])
+		self.__spares[name] = spares
+
+	def take_batch(self, name):
+		# an empty batch for table name, or None if every batch is still waiting to be written
+		try:
+			return self.__spares[name].get_nowait()
+		except queue.Empty:
+			return None
+
+	def submit(self, name, columns, batch, rows):
+		# write the first rows rows of batch. The batch mustnt be touched again until take_batch gives it back
+		self.__pending.put((name, columns, batch, rows))
+
+	def __run(self):
+		while True:
+			job = self.__pending.get()
+			if job is None:
+				return
+			name, columns, batch, rows = job
+			self.__write_block(name, columns, batch, rows)
+			self.__written += rows
+			self.__spares[name].put(batch)
+
+	def __write_block(self, name, columns, batch, rows):
+		out = self.__file
+		encoded = name.encode()
+		out.write(struct.pack("<I", len(encoded)) + encoded + struct.pack("<II", rows, len(columns)))
+		for column, values in zip(columns, batch):
+			encoded = column.encode()
+			out.write(struct.pack("<I", len(encoded)) + encoded)
+			values = values[:rows]
+			if sys.byteorder == "big":
+				values.byteswap()
+			out.write(values.tobytes())
+
+	def close(self):
+		# write everything submitted so far, then close the file
+		self.__pending.put(None)
+		self.__thread.join()
+		self.__file.close()
+
+class Table:
+	# the rows of one kind of thing that happens, with RunningStats for each column and, with a writer, a batch
+	# being filled to be written
+	def __init__(self, name, columns, history=1000, writer=None):
+		self.__name = name
+		self.__columns = columns
+		self.__stats = {column: RunningStats(history) for column in columns if column not in UNSUMMARISED}
+		self.__summarised = [(columns.index(column), stats) for column, stats in self.__stats.items()]
+		self.__writer = writer
+		self.__batch = None
+		self.__rows = 0			#rows in the batch so far
+		self.__dropped = 0		#rows that werent saved because the writer was too far behind
+		if writer is not None:
+			writer.add_table(name, columns)
+			self.__batch = writer.take_batch(name)
+
+	def get_stats(self, column):
+		return self.__stats[column]
+
+	def get_dropped(self):
+		return self.__dropped
+
+	def add(self, *values):
+		# one row, with a value for every column
+		for index, stats in self.__summarised:
+			stats.add(values[index])
+		if self.__writer is None:
+			return
+		if self.__batch is None:
+			self.__batch = self.__writer.take_batch(self.__name)
+			if self.__batch is None:
+				self.__dropped += 1
+				return
+		for column, value in zip(self.__batch, values):
+			column[self.__rows] = value
+		self.__rows += 1
+		if self.__rows == self.__writer.get_batch_rows():
+			self.flush()
+
+	def flush(self):
+		# hand the rows so far to the writer, even if the batch isnt full
+		if self.__writer is None or not self.__rows:
+			return
+		self.__writer.submit(self.__name, self.__columns, self.__batch, self.__rows)
+		self.__batch = self.__writer.take_batch(self.__name)
+		self.__rows = 0
+
+	def get_summary(self):
+		return {column: stats.get_summary() for column, stats in self.__stats.items()}
+
+class MatchStats:
+	# records matches into the TABLES. start_match at the start of each match, tick after every tick, serve, paddle_hit
+	# and point as they happen, and end_match at the end. observe does all of that for a pongsim.World.
+	# path: a file to save every row to, or None to only keep the totals
+	# history: how many recent values of each column the percentiles are worked out from
+	# batch_rows: rows saved at a time
+	def __init__(self, path=None, history=1000, batch_rows=256):
+		self.__writer = ColumnarWriter(path, batch_rows) if path is not None else None
+		self.__tables = {name: Table(name, columns, history, self.__writer) for name, columns in TABLES.items()}
+		self.__serves = self.__tables["serves"]
+		self.__hits = self.__tables["hits"]
+		self.__points = self.__tables["points"]
+		self.__match = 0
+		self.__finished = 0		#matches that got to end_match, so the last one isnt counted if it was cut short
+		self.__closed = False
+		self.__tick = 0
+		self.__serve_tick = 0	#tick the ball was last served on
+		self.__rally = 0		#paddle hits since the last serve
+
+	def get_table(self, name):
+		return self.__tables[name]
+
+	def get_match_count(self):
+		return self.__match
+
+	def start_match(self):
+		self.__match += 1
+		self.__tick = 0
+		self.__serve_tick = 0
+		self.__rally = 0
+
+	def tick(self):
+		self.__tick += 1
+
+	def serve(self, ball):
+		# the ball was just served. ball is a pongsim.BallBody
+		direction = ball.get_direction()
+		angle = math.degrees(math.atan2(math.sin(direction), abs(math.cos(direction))))
+		self.__serve_tick = self.__tick
+		self.__rally = 0
+		self.__serves.add(self.__match, self.__tick, angle, ball.get_velocity())
+
+	def paddle_hit(self, ball, paddles):
+		# the ball just bounced off one of paddles, which are pongsim.PaddleBody objects
+		x, y = ball.get_position()
+		size = ball.get_size()
+		centre_x = x + size/2
+		paddle = min(paddles, key=lambda paddle: abs(paddle.get_rect()[0] + paddle.get_rect()[2]/2 - centre_x))
+		paddle_x, paddle_y, paddle_w, paddle_h = paddle.get_rect()
+		# -1 when the bottom of the ball only just caught the top of the paddle, 1 for the other way round
+		offset = (y + size/2 - paddle_y - paddle_h/2)/((paddle_h + size)/2)
+		side = 0 if math.cos(ball.get_direction()) > 0 else 1		#bouncing off to the right means the left paddle hit it
+		self.__rally += 1
+		self.__hits.add(self.__match, self.__tick, side, offset, ball.get_velocity(), self.__rally)
+
+	def point(self, winner):
+		# winner is pongsim.PLAYER or pongsim.OPPONENT
+		duration = (self.__tick - self.__serve_tick)/pongsim.TICK_RATE
+		self.__points.add(self.__match, self.__tick, 1 if winner == pongsim.PLAYER else 0, duration, self.__rally)
+
+	def end_match(self):
+		self.__finished += 1
+		self.flush()
+
+	def flush(self):
+		# start saving the rows so far, without waiting for the batches to fill
+		for table in self.__tables.values():
+			table.flush()
+
+	def observe(self, world, events):
+		# record a tick of world, given the events world.step returned for it. start_match still needs calling for each match
+		for event, value in events:
+			if event == pongsim.SERVE:
+				self.serve(world.get_ball())
+			elif event == pongsim.PADDLE_HIT:
+				self.paddle_hit(world.get_ball(), (world.get_opponent(), world.get_player()))
+			elif event == pongsim.POINT_SCORED:
+				self.point(value)
+			elif event == pongsim.MATCH_OVER:
+				self.end_match()
+		self.tick()
+
+	def get_dropped(self):
+		# rows that werent saved because the writer fell behind
+		return sum(table.get_dropped() for table in self.__tables.values())
+
+	def get_summary(self):
+		return {name: table.get_summary() for name, table in self.__tables.items()}
+
+	def describe(self):
+		# get_summary as lines of text
+		lines = ["%d matches finished, of %d started" % (self.__finished, self.__match)]
+		for name, summary in self.get_summary().items():
+			for column, stats in summary.items():
+				lines.append(describe_column(name, column, stats))
+		if self.__writer is not None:
+			lines.append("%d rows saved, %d dropped" % (self.__writer.get_written(), self.get_dropped()))
+		return lines
+
+	def close(self):
+		# save whatever hasnt been saved yet, and wait for it to be written. The writer is kept, so describe can still
+		# say how many rows were saved
+		if self.__writer is None or self.__closed:
+			return
+		self.flush()
+		self.__writer.close()
+		self.__closed = True
+
+def describe_column(table, column, stats):
+	if not stats["count"]:
+		return "%s.%s: none" % (table, column)
+	return ("%(name)s: %(count)d, mean %(mean).3f, std %(std).3f, min %(min).3f, p50 %(p50).3f, p90 %(p90).3f, "
+		"p99 %(p99).3f, max %(max).3f") % dict(stats, name=table + "." + column)
+
+def read_stats(path):
+	# every row in a stats file, as {table name: {column name: array of float64}}
+	with open(path, "rb") as source:
+		data = source.read()
+	if data[:len(MAGIC)] != MAGIC:
+		raise ValueError("%s is not a pypong stats file" % path)
+	tables = {}
+	offset = len(MAGIC)
+	while offset < len(data):
+		length, = struct.unpack_from("<I", data, offset)
+		name = data[offset+4:offset+4+length].decode()
+		offset += 4 + length
+		rows, count = struct.unpack_from("<II", data, offset)
+		offset += 8
+		table = tables.setdefault(name, {})
+		for i in range(count):
+			length, = struct.unpack_from("<I", data, offset)
+			column = data[offset+4:offset+4+length].decode()
+			offset += 4 + length
+			values = array("d")
+			values.frombytes(data[offset:offset+8*rows])
+			if sys.byteorder == "big":
+				values.byteswap()
+			offset += 8*rows
+			table.setdefault(column, array("d")).extend(values)
+	return tables
+
+def simulate(matches, path=None, difficulty=2, seed=0):
+	# play matches between two ais with no window, recording them into a MatchStats saving to path, or only keeping the
+	# totals if path is None, or not recording them at all if path is False. Returns (the MatchStats or None, ticks
+	# played, seconds taken)
+	stats = MatchStats(path) if path is not False else None
+	ticks = 0
+	start = time.perf_counter()
+	for match in range(matches):
+		world = pongsim.World(difficulty=difficulty, seed=seed + match)
+		brain = pongsim.OpponentBrain(world.get_player(), world.get_size()[1], side=pongsim.PLAYER)
+		brain.set_difficulty(2)
+		world.set_player_brain(brain)
+		if stats is not None:
+			stats.start_match()
+		while not world.is_over():
+			events = world.step()
+			if stats is not None:
+				stats.observe(world, events)
+		ticks += world.get_tick()
+	if stats is not None:
+		stats.close()
+	return (stats, ticks, time.perf_counter() - start)
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Record pypong match statistics with no window, or summarise a stats file.")
+	commands = parser.add_subparsers(dest="command", required=True)
+	summary = commands.add_parser("summary", help="totals and percentiles of every column in a stats file")
+	summary.add_argument("path")
+	simulated = commands.add_parser("simulate", help="play matches between two ais and record them")
+	simulated.add_argument("--matches", type=int, default=100)
+	simulated.add_argument("--difficulty", type=int, default=2, choices=(0, 1, 2))
+	simulated.add_argument("--out", help="stats file to save every row to")
+	args = parser.parse_args(argv)
+
+	if args.command == "summary":
+		for name, columns in read_stats(args.path).items():
+			rows = len(next(iter(columns.values()), ()))
+			print("%s: %d rows" % (name, rows))
+			for column, values in columns.items():
+				if column in UNSUMMARISED or not values:
+					continue
+				values = sorted(values)
+				mean = sum(values)/len(values)
+				std = math.sqrt(sum((value - mean)**2 for value in values)/max(1, len(values) - 1))
+				print(describe_column(name, column, {"count": len(values), "mean": mean, "std": std, "min": values[0],
+					"max": values[-1], "p50": percentile(values, 50), "p90": percentile(values, 90), "p99": percentile(values, 99)}))
+		return
+	unrecorded, ticks, bare_seconds = simulate(args.matches, False, args.difficulty)
+	stats, ticks, seconds = simulate(args.matches, args.out, args.difficulty)
+	print("\n".join(stats.describe()))
+	print("%d ticks: %.2fus a tick recording, %.2fus without" % (ticks, 1e6*seconds/ticks, 1e6*bare_seconds/ticks))
+
+if __name__ == "__main__":
+	main()
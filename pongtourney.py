@@ -0,0 +1,158 @@
+"""Jordan Ogilvy, 'pypong' tournament runner. Plays lots of headless ai vs ai matches over a grid of difficulty settings,
+spread over every cpu core, and streams the results out as CSV or JSON lines for tuning the difficulties.
+
+e.g. python pongtourney.py --matches 200 --ball-speeds 10,12,14 --serve-angles 5,10,15 --opponents classic:0,classic:1,classic:2 -o results.csv
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+import pongsim
+
+FIELDS = ("cell", "match", "seed", "ball_speed", "serve_angle", "opponent", "player", "winner", "opponent_score",
+	"player_score", "ticks", "points", "hits", "rally_length", "points_per_second")
+
+class Tracker:
+	# a scripted player that moves its paddle straight towards the ball, with no delay and no thinking ahead
+	def __init__(self, paddle, height):
+		self.__paddle = paddle
+		self.__height = height
+
+	def step(self, ball):
+		paddle_x, paddle_y, paddle_w, paddle_h = self.__paddle.get_rect()
+		target_y = ball.get_position()[1] + ball.get_size()/2
+		if paddle_y + paddle_h/2 < target_y - self.__paddle.get_speed() and paddle_y + paddle_h < self.__height:
+			self.__paddle.move_down()
+		elif paddle_y + paddle_h/2 > target_y + self.__paddle.get_speed() and paddle_y > 0:
+			self.__paddle.move_up()
+
+def make_brain(spec, paddle, side, world, rng):
+	# build the ai described by spec to move paddle. The specs are:
+	#	classic:<difficulty>[:<reaction time>]	pongsim.OpponentBrain on difficulty 0-2, optionally with its own reaction time in ticks
+	#	predictive:<reaction time>:<error>		pongsim.PredictiveBrain with the given reaction time in ticks and aiming error in pixels
+	#	tracker									a Tracker, which follows the ball perfectly
+	width, height = world.get_size()
+	parts = spec.split(":")
+	if parts[0] == "classic":
+		brain = pongsim.OpponentBrain(paddle, height, side)
+		brain.set_difficulty(int(parts[1]))
+		if len(parts) > 2:
+			brain.set_reaction_time(int(parts[2]))
+		return brain
+	elif parts[0] == "predictive":
+		return pongsim.PredictiveBrain(paddle, width, height, int(parts[1]), float(parts[2]), rng)
+	elif parts[0] == "tracker":
+		return Tracker(paddle, height)
+	raise ValueError("unknown ai spec: " + spec)
+
+def play_match(job):
+	# play one match to the end, or until max_ticks runs out, and return its result as a dict with the FIELDS as keys
+	cell, match, seed, ball_speed, serve_angle, opponent_spec, player_spec, max_ticks = job
+	world = pongsim.World(seed=seed)
+	rules = world.get_rules()
+	rules.set_ball_speed(ball_speed)
+	rules.set_max_serve_angle(math.radians(serve_angle))
+	# the ais get their own random stream, so their mistakes dont change the serves
+	ai_rng = random.Random(seed + ":ai")
+	world.set_opponent_brain(make_brain(opponent_spec, world.get_opponent(), pongsim.OPPONENT, world, ai_rng))
+	world.set_player_brain(make_brain(player_spec, world.get_player(), pongsim.PLAYER, world, ai_rng))
+
+	hits = 0
+	points = 0
+	while not world.is_over() and world.get_tick() < max_ticks:
+		for event, value in world.step():
+			if event == pongsim.PADDLE_HIT:
+				hits += 1
+			elif event == pongsim.POINT_SCORED:
+				points += 1
+	player_score, opponent_score = rules.get_scores()
+	ticks = world.get_tick()
+	return {
+		"cell": cell, "match": match, "seed": seed, "ball_speed": ball_speed, "serve_angle": serve_angle,
+		"opponent": opponent_spec, "player": player_spec, "winner": world.get_winner() or "none",
+		"opponent_score": opponent_score, "player_score": player_score, "ticks": ticks, "points": points, "hits": hits,
+		"rally_length": hits/points if points else float(hits),
+		"points_per_second": points/(ticks/pongsim.TICK_RATE) if ticks else 0.0,
+	}
+
+def make_jobs(args):
+	# one job per match, for every combination of the grid settings. Each match gets its own seed from its place in the grid
+	grid = itertools.product(args.ball_speeds, args.serve_angles, args.opponents, args.players)
+	for cell, (ball_speed, serve_angle, opponent_spec, player_spec) in enumerate(grid):
+		for match in range(args.matches):
+			seed = "%s:%d:%d" % (args.seed, cell, match)
+			yield (cell, match, seed, ball_speed, serve_angle, opponent_spec, player_spec, args.max_ticks)
+
+def parse_args(argv):
+	parser = argparse.ArgumentParser(description="Play headless ai vs ai pypong matches over a grid of settings.")
+	numbers = lambda text: [float(value) for value in text.split(",")]
+	specs = lambda text: text.split(",")
+	parser.add_argument("--matches", type=int, default=100, help="matches per grid cell")
+	parser.add_argument("--ball-speeds", type=numbers, default=[10, 12, 14], help="ball speeds in pixels per tick")
+	parser.add_argument("--serve-angles", type=numbers, default=[5, 10, 15], help="max serve angles in degrees")
+	parser.add_argument("--opponents", type=specs, default=["classic:0", "classic:1", "classic:2"],
+		help="left hand ais: classic:<difficulty>[:<reaction>], predictive:<reaction>:<error> or tracker")
+	parser.add_argument("--players", type=specs, default=["tracker"], help="right hand ais, same specs as --opponents")
+	parser.add_argument("--max-ticks", type=int, default=10*60*pongsim.TICK_RATE, help="give up on a match after this many ticks")
+	parser.add_argument("--seed", default="0", help="base seed. The same seed and grid always play the same matches")
+	parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to play matches in, 1 plays them in this process")
+	parser.add_argument("--format", choices=("csv", "json"), default="csv", help="csv, or json with one match per line")
+	parser.add_argument("-o", "--output", help="file to write results to, stdout if not given")
+	return parser.parse_args(argv)
+
+def main(argv=None):
+	args = parse_args(argv)
+	out = open(args.output, "w", newline="") if args.output else sys.stdout
+	if args.format == "csv":
+		writer = csv.DictWriter(out, FIELDS)
+		writer.writeheader()
+		write = writer.writerow
+	else:
+		write = lambda result: out.write(json.dumps(result) + "\n")
+
+	cells = {}		#cell -> [matches, opponent wins, player wins, hits, points, ticks] for the summary
+	start = time.perf_counter()
+	if args.workers == 1:
+		results = map(play_match, make_jobs(args))
+		pool = None
+	else:
+		pool = Pool(args.workers)
+		results = pool.imap_unordered(play_match, make_jobs(args), chunksize=8)
+	try:
+		for result in results:
+			write(result)
+			totals = cells.setdefault(result["cell"], [0, 0, 0, 0, 0, 0, result])
+			totals[0] += 1
+			totals[1] += result["winner"] == pongsim.OPPONENT
+			totals[2] += result["winner"] == pongsim.PLAYER
+			totals[3] += result["hits"]
+			totals[4] += result["points"]
+			totals[5] += result["ticks"]
+	finally:
+		if pool is not None:
+			pool.close()
+			pool.join()
+		if out is not sys.stdout:
+			out.close()
+	elapsed = time.perf_counter() - start
+
+	# a summary of each grid cell, on stderr so it doesnt get mixed up with the results
+	all_ticks = 0
+	for cell in sorted(cells):
+		matches, opponent_wins, player_wins, hits, points, ticks, first = cells[cell]
+		all_ticks += ticks
+		print("speed %g angle %g %s vs %s: opponent wins %.1f%%, player wins %.1f%%, rally %.2f hits, %.3f points/s" % (
+			first["ball_speed"], first["serve_angle"], first["opponent"], first["player"], 100*opponent_wins/matches,
+			100*player_wins/matches, hits/points if points else 0, points/(ticks/pongsim.TICK_RATE) if ticks else 0), file=sys.stderr)
+	matches = sum(totals[0] for totals in cells.values())
+	print("%d matches, %d ticks in %.2fs (%.0f ticks/s)" % (matches, all_ticks, elapsed, all_ticks/elapsed if elapsed else 0), file=sys.stderr)
+
+if __name__ == "__main__":
+	main()
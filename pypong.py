@@ -1,42 +1,95 @@
 """Jordan Ogilvy, 19th June, 'pypong', a Pong clone implementation using pygame"""
 
+import time
+STARTED = time.perf_counter()	#when pypong started loading, for the startup report
+
 import pygame
-import math
+import pongsim
+import pongrender
+import pongentities
+import pongevents
+import pongloop
+import pongprofile
+import pongreplay
+import pongstats
+import pongassets
+import pongnet
+import argparse
+import os
 import random
-from myqueue import MyQueue
+try:
+	import pongmulti	#multiball needs numpy, the rest of the game doesnt
+except ImportError:
+	pongmulti = None
+
+FONTS = (("Arial", 48), ("Arial", 18), pongprofile.FONT)	#every font the menus, scores and profiler overlay use, as (name, size)
+FONT_CACHE = os.path.join(os.path.expanduser("~"), ".pypong_fonts.json")	#where the system fonts were found last time
+
+# the choices on the difficulty screen: easy, normal, hard and expert. Each is the pongsim.DIFFICULTY_PRESETS entry it
+# uses, plus which difficulty that is and whether the ai predicts where the ball is going. The match objects are set up
+# for a match by passing one of these to their reset methods
+GAME_MODES = (
+	dict(pongsim.DIFFICULTY_PRESETS[0], difficulty=0, predictive=False),
+	dict(pongsim.DIFFICULTY_PRESETS[1], difficulty=1, predictive=False),
+	dict(pongsim.DIFFICULTY_PRESETS[2], difficulty=2, predictive=False),
+	dict(pongsim.DIFFICULTY_PRESETS[2], difficulty=2, predictive=True),	#expert: hard, against the ai that predicts where the ball is going
+	dict(pongsim.DIFFICULTY_PRESETS[1], difficulty=1, predictive=False, multiball=True),	#normal, with lots of balls at once
+	dict(pongsim.DIFFICULTY_PRESETS[1], difficulty=1, predictive=False, network=True),	#against a person, the server picks the difficulty
+)
+
+MULTIBALL_COUNT = 500		#balls in a multiball match, unless the game is told otherwise
+MULTIBALL_SECONDS = 60		#length of a multiball match. Whoever has the most points at the end wins
+LATENCY_REPORT_SECONDS = 5		#how often --latency-report prints
+
+def interpolate(last_position, position, alpha):
+	# the (x, y) position alpha of the way from last_position to position. Used to draw objects smoothly between ticks
+	if last_position is None:
+		return position
+	return (last_position[0] + (position[0]-last_position[0])*alpha, last_position[1] + (position[1]-last_position[1])*alpha)
+
+def draw_centre_line(surface, colour=(255, 255, 255), width=2):
+	# the line down the middle of the playfield. Matches put it on the background with DirtyRenderer.add_static
+	surface.fill(colour, (surface.get_width()//2-width//2, 0, width, surface.get_height()))
 
 class Paddle:
 	def __init__(self, display):
-		self.__x = 0		# x and y co ordinates for the top left corner of the paddle, in absolute respect to the screen/surface
-		self.__y = 0
-		self.__height = 80	# width and height of paddle in pixels
-		self.__width = 15
-		self.__surface = pygame.Surface((self.__width, self.__height))	#the surface we draw the paddle to. It is then blitted to the display.
-		self.__speed = 5	#speed of paddle in pixels per frame. speed is constant - paddle moves at this speed, or it doesnt move at all. also vertical.
+		self.__body = pongsim.PaddleBody()	#the position and movement of the paddle. this class just draws it
 		self.__display = display		#the display to draw the paddle surface on
 		self.__colour = (255, 255, 255)	#RGB colour tuple. Not color.
+		# the paddle, filled in once, which gets blitted to the display every frame
+		self.__surface = display.make_sprite(self.__body.get_rect()[2:], self.__colour)
+		self.__last_position = None		#where the paddle was before the last tick, for drawing between ticks
+		
+	def get_body(self):
+		return self.__body
 		
 	def get_rect(self):
 		# return the x, y, width, and height of the paddle in a tuple. Used for collision checking
-		return (self.__x, self.__y, self.__width, self.__height)
+		return self.__body.get_rect()
 		
 	def get_speed(self):
-		return self.__speed
+		return self.__body.get_speed()
 		
 	def move_up(self):
-		self.__y -= self.__speed
+		self.__body.move_up()
 		
 	def move_down(self):
-		self.__y += self.__speed	
+		self.__body.move_down()
 		
 	def set_position(self, newx, newy):
-		self.__x = newx
-		self.__y = newy
+		self.__body.set_position(newx, newy)
 		
-	def update(self):
-		#draw the paddle to surface, and blit the surface to the display. Thats it for the paddle
-		self.__surface.fill(self.__colour)
-		self.__display.blit(self.__surface, (self.__x, self.__y))
+	def reset(self, config):
+		# forget where the paddle was, ready for a new match
+		self.__last_position = None
+
+	def update(self, objects):
+		#remember where the paddle was before this tick moves it
+		self.__last_position = self.__body.get_position()
+		
+	def draw(self, alpha):
+		#blit the paddle to the display, alpha of the way from its last position to its current one
+		self.__display.blit(self.__surface, interpolate(self.__last_position, self.__body.get_position(), alpha))
 		
 class Player(Paddle):
 	# the point of the player havings its own class is to handle the player paddle and player keypress events separately
@@ -47,454 +100,858 @@ class Player(Paddle):
 		self.set_position(605, 200)		#move the paddle to the right hand side of the screen at the start
 		self.__press_move_up = False		#bools to control movement of the paddle
 		self.__press_move_down = False
-		self.__last_move = lambda *args: None		#track the direction the player paddle moved last. points to a method. 
+		self.__control = pongsim.PlayerControl(self.get_body())	#moves the paddle from the key states
 	
-	def update(self, events, objects):
-		# handle the events. Check for the up and down arrows.
-		for event in events:
-			if event.type == pygame.KEYDOWN:
-				if event.key == pygame.K_UP:
-					self.__press_move_up = True
-				elif event.key == pygame.K_DOWN:
-					self.__press_move_down = True
-					
-			elif event.type == pygame.KEYUP:
-				if event.key == pygame.K_UP:
-					self.__press_move_up = False
-				elif event.key == pygame.K_DOWN:
-					self.__press_move_down = False
-					
-		#	move the paddle
-		if self.__press_move_up and self.__press_move_down:
-			# if both keys are down, move in the direction of the key that was pressed first.
-			self.__last_move()
-		elif self.__press_move_up:
-			self.move_up()
-			self.__last_move = self.move_up
-		elif self.__press_move_down:
-			self.move_down()
-			self.__last_move = self.move_down
-		else:	# if no keys are being pressed, set last_move to a do nothing function using lambda
-			self.__last_move = lambda *args: None
+	def connect(self, objects):
+		# listen for the up and down arrows
+		bus = objects.get_bus()
+		bus.subscribe(pygame.KEYDOWN, self.__on_up, pygame.K_UP)
+		bus.subscribe(pygame.KEYUP, self.__on_up, pygame.K_UP)
+		bus.subscribe(pygame.KEYDOWN, self.__on_down, pygame.K_DOWN)
+		bus.subscribe(pygame.KEYUP, self.__on_down, pygame.K_DOWN)
+
+	def __on_up(self, event):
+		self.__press_move_up = event.type == pygame.KEYDOWN
+
+	def __on_down(self, event):
+		self.__press_move_down = event.type == pygame.KEYDOWN
+
+	def get_keys(self):
+		# (up, down), whether the up and down arrows are being held
+		return (self.__press_move_up, self.__press_move_down)
+
+	def reset(self, config):
+		super(Player, self).reset(config)
+		self.set_position(605, 200)
+		self.__press_move_up = False
+		self.__press_move_down = False
+		self.__control.reset()
 		
-		# draw the paddle (through its update method)
-		super(Player, self).update()
+	def update(self, objects):
+		super(Player, self).update(objects)
+		#	move the paddle
+		self.__control.step(self.__press_move_up, self.__press_move_down)
 		
 class Opponent(Paddle):
-	def __init__(self, display):
+	# rng: where the predictive ai gets its mistakes from
+	def __init__(self, display, rng=random):
 		super(Opponent, self).__init__(display)
 		self.__display = display
-		self.__brain = MyQueue()	# a list that tracks the balls position on different frames. Used for simulating delayed reaction time
-		self.__reaction_time = 5	# reaction time of AI in frames
-		self.__difficulties = (self.__ai_easy, self.__ai_normal, self.__ai_hard)
-		self.__current_difficulty = 0		#0 for easy, 1 for normal, 2 for hard
-		self.__winfo = pygame.display.Info()
+		# both ais are made once, and set_difficulty picks between them, so a new match doesnt need new ones
+		self.__classic_brain = pongsim.OpponentBrain(self.get_body(), display.get_height())
+		self.__predictive_brain = pongsim.PredictiveBrain(self.get_body(), display.get_width(), display.get_height(), rng=rng)
+		self.__brain = self.__classic_brain		# the ai that moves the paddle
 		self.set_position(15, 200)	#move the ai paddle to the left side of the screen
 
-	def set_difficulty(self, new_difficulty):
+	def set_difficulty(self, new_difficulty, predictive=False):
 		# new_difficulty must be an int between 0-2. 0 for easy, 1 for normal, 2 for hard
-		self.__current_difficulty = new_difficulty
-		
-	# the ai methods of the opponent. different thinking process for each difficulty	
-	def __ai_base(self, ball, reaction_time):
-		self.__reaction_time = reaction_time
-		while(self.__brain.size()>self.__reaction_time):
-			self.__brain.dequeue()
-	
-		self.__brain.enqueue(ball.get_position())	#add the position of the ball to the brain delay queue
-		# only check the ball position and move to it if the ball is on screen
-		if ball.is_in_play():
-			if self.__brain.size()>self.__reaction_time:
-				ball_position = self.__brain.dequeue()	#get the position of the ball from reaction_time frames ago, in a (x, y) tuple
-				paddle_rect = self.get_rect()
-				paddle_speed = self.get_speed()
-				# move the ai paddle towards the balls y position, making sure they dont move off the screen
-				if paddle_rect[1]+paddle_rect[3]//2 < ball_position[1] - paddle_speed and \
-				paddle_rect[1]+paddle_rect[3]<self.__winfo.current_h:
-					self.move_down()
-				elif paddle_rect[1]+paddle_rect[3]//2 > ball_position[1] + paddle_speed and \
-				paddle_rect[1]>0:
-					self.move_up()
-	
-	def __ai_easy(self, ball):
-		#same as ai_normal but with a slower reaction time
-		self.__ai_base(ball, 14)
-		
-	def __ai_normal(self, ball):
-		self.__ai_base(ball, 8)
-	
-	def __ai_hard(self, ball):
-		#same as ai_normal but with a faster reaction time, and moves to the middle after returning a shot.
-		self.__reaction_time = 3
-		while(self.__brain.size()>self.__reaction_time):
-			self.__brain.dequeue()
-	
-		self.__brain.enqueue(ball.get_position())
-		if ball.is_in_play():
-			if self.__brain.size()>self.__reaction_time:
-				paddle_rect = self.get_rect()
-				paddle_speed = self.get_speed()
-				ball_position = self.__brain.dequeue()	#get the position of the ball from reaction_time frames ago, in a (x, y) tuple
-				ball_direction = ball.get_direction()
-				# if the ball is moving away from the ai, move towards the middle of the screen
-				if math.cos(ball_direction)>0:		#assumes ai is on the left
-					if paddle_rect[1]+paddle_rect[3]//2<self.__winfo.current_h//2-paddle_speed:
-						self.move_down()
-					elif paddle_rect[1]+paddle_rect[3]//2>self.__winfo.current_h//2+paddle_speed:
-						self.move_up()
-				# otherwise move the ai paddle towards the balls y position, making sure they dont move off the screen
-				else:
-					if paddle_rect[1]+paddle_rect[3]//2 < ball_position[1] - paddle_speed and \
-					paddle_rect[1]+paddle_rect[3]<self.__winfo.current_h:
-						self.move_down()
-					elif paddle_rect[1]+paddle_rect[3]//2 > ball_position[1] + paddle_speed and \
-					paddle_rect[1]>0:
-						self.move_up()
-			
-		
-	def update(self, events, objects):	
-		for object in objects:
-			if isinstance(object, Ball):
-				#call the ai method for the opponent. Moves the paddle based on the ball and its own positions'
-				self.__difficulties[self.__current_difficulty](object)	
-		
-		#update the paddle
-		super(Opponent, self).update()		
+		# with predictive set, the ai predicts where the ball is going instead of following it
+		if predictive:
+			preset = pongsim.PREDICTIVE_AI_PRESETS[new_difficulty]
+			self.__predictive_brain.set_reaction_time(preset["reaction_time"])
+			self.__predictive_brain.set_error(preset["error"])
+			self.__brain = self.__predictive_brain
+		else:
+			self.__classic_brain.set_difficulty(new_difficulty)
+			self.__brain = self.__classic_brain
+
+	def reset(self, config):
+		super(Opponent, self).reset(config)
+		self.set_position(15, 200)
+		self.set_difficulty(config["ai_difficulty"], config["predictive"])
+		self.__brain.reset()
+		
+	def update(self, objects):	
+		super(Opponent, self).update(objects)
+		for ball in objects.of_type(Ball):
+			#call the ai for the opponent. Moves the paddle based on the ball and its own positions'
+			self.__brain.step(ball.get_body())
+		for match in objects.of_type(MultiballMatch):
+			# with lots of balls, the ai goes for whichever one will get to it first
+			self.__brain.step(match.get_threat(self.get_rect()[0]))
 
 class Ball:
-	def __init__(self, display):
+	# with fixed_point set the ball moves with whole numbers only, see pongsim.FixedBallBody
+	def __init__(self, display, rng=random, fixed_point=False):
 		self.__display = display
-		self.__size = 16		#the ball is a square
-		self.__surface = pygame.Surface((self.__size, self.__size))
+		body_type = pongsim.FixedBallBody if fixed_point else pongsim.BallBody
+		self.__body = body_type(display.get_width(), display.get_height(), rng)	#the ball's movement and bouncing. this class just draws it
+		self.__size = self.__body.get_size()		#the ball is a square
 		self.__colour = (255, 255, 255)
-		self.__velocity = 0	# current velocity of the ball in pixels per frame
-		self.__direction = 0	#direction of the ball in radians, 0 is right, pi/2 is up.
-		self.__hspeed = 0
-		self.__vspeed = 0 	#2d speed components of the 
-		self.__x = 0
-		self.__y = 0	#coords of the top left corner of the ball
-		#between 0 and pi/2, the  max angle from the horizontal in either direction the ball bounces from a paddle
-		self.__max_bounce_angle = math.pi/5
-		self.__next_x = self.__x + self.__hspeed
-		self.__next_y = self.__y + self.__vspeed
+		self.__surface = display.make_sprite((self.__size, self.__size), self.__colour)
+		self.__last_position = None		#where the ball was before the last tick, for drawing between ticks
+		self.__bus = None				#the event bus to tell about paddle hits, once the ball is in the game
+		
+	def connect(self, objects):
+		self.__bus = objects.get_bus()
+
+	def reset(self, config):
+		# back in the corner, ready for the rules to serve it in a new match
+		self.__body.reset()
+		self.__last_position = None
+
+	def get_body(self):
+		return self.__body
 		
 	def get_size(self):
 		return self.__size
 		
 	def get_position(self):
-		return (self.__x, self.__y)
+		return self.__body.get_position()
 		
 	def get_direction(self):
-		return self.__direction
+		return self.__body.get_direction()
 	
 	def set_position(self, newx, newy):
-		self.__x = newx
-		self.__y = newy
+		self.__body.set_position(newx, newy)
 		
 	def set_velocity(self, new_velocity):
-		self.__velocity = new_velocity
-		self.__calculate_speed_components()
+		self.__body.set_velocity(new_velocity)
 		
 	def set_direction(self, new_direction):
-		self.__direction = new_direction
-		self.__calculate_speed_components()
-		
-	def __calculate_speed_components(self):
-		self.__hspeed = self.__velocity*math.cos(self.__direction)
-		self.__vspeed = self.__velocity*math.sin(self.__direction)
+		self.__body.set_direction(new_direction)
 		
 	def set_direction_random(self, base_direction, error):
-		# set direction to a random direction plus or minus a random value within the range of the specified error. All in radians
-		offset = random.uniform(0, error*2)
-		self.__direction = base_direction + error - offset
-		self.__calculate_speed_components()
+		self.__body.set_direction_random(base_direction, error)
 		
 	def is_in_play(self):
-		w = pygame.display.Info().current_w
-		return (self.__x > 0 and self.__x < w)
+		return self.__body.is_in_play()
 		
-	def __check_wall_collision(self):
-		#check for collisions with the top and bottom of the screen
-		winfo = pygame.display.Info()
-		if self.__next_y < 0 or self.__next_y > winfo.current_h-self.__size:
-			self.__vspeed = -self.__vspeed	#bounce of the walls by reversing the vertical direction (walls are only top and bottom)
-			try:	#beware of division by 0 when working out the new direction based on the 2d speeds
-				self.__direction = math.atan(self.__vspeed/self.__hspeed)
-				if self.__hspeed<0:
-					self.__direction += math.pi
-			except ZeroDivisionError:
-				self.__direction = 0
-	
-	def __check_paddle_collision(self, objects):
-		for paddle in objects:
-			if isinstance(paddle, Paddle):
-				#for every paddle in the objects list, check if the ball will overlap with the paddle in the next frame
-				x1, y1, w1, h1 = self.__next_x, self.__next_y, self.__size, self.__size
-				(x2, y2, w2, h2) = paddle.get_rect()
-				if not (x2>x1+w1 or x2+w2<x1 or y1+h1<y2 or y1>y2+h2):	#AABB collision check
-					#after colliding with a paddle, the ball bounces back the other way (left->right) in a direction within a random cone
-					if self.__hspeed<0:	#if going left, go right in a random direction
-						new_base_direction = 0
-					else:	#otherwise we must be going right, so change to going left
-						new_base_direction = math.pi
-					#set the new direction
-					self.set_direction_random(new_base_direction, self.__max_bounce_angle)
-					# post an event so the main game loop will see it and change the background colour
-					hit_event = pygame.event.Event(pygame.USEREVENT+4)
-					pygame.event.post(hit_event)
+	def update(self, objects):			
+		#move the ball, bouncing it off the walls and any paddles
+		self.__last_position = self.__body.get_position()
+		paddles = [paddle.get_body() for paddle in objects.of_type(Paddle)]
+		if self.__body.step(paddles) and self.__bus is not None:
+			# tell anything that wants to know, e.g. to change the background colour
+			self.__bus.emit(pongsim.PADDLE_HIT)
 		
-	def update(self, events, objects):			
-		#calculate the would-be position of the ball in the next frame, based on the current direction and velocity.
-		self.__calculate_speed_components()
-		self.__next_x = self.__x + self.__hspeed
-		self.__next_y = self.__y - self.__vspeed
-		
-		#handle collisions
-		self.__check_wall_collision()
-		self.__check_paddle_collision(objects)	
-			
-		#move the balll
-		self.__x += self.__hspeed
-		self.__y -= self.__vspeed	#subtract because the pygame window has 0 at the top, not the bottom
-		
-		#draw the ball
-		self.__surface.fill(self.__colour)
-		self.__display.blit(self.__surface, (self.__x, self.__y))
+	def draw(self, alpha):
+		#draw the ball alpha of the way from its last position to its current one
+		self.__display.blit(self.__surface, interpolate(self.__last_position, self.__body.get_position(), alpha))
 		
 # restarts points when player/opponent wins round, keeps score and prints it		
 class MatchController:
-	def __init__(self, display):
+	def __init__(self, display, text_cache=None, rng=random, assets=None):
 		self.__display = display
-		self.__player_score = 0
-		self.__opponent_score = 0
-		self.__restart_wait_time = 2000	# time in milliseconds between the ball returning to the center, and the ball starting moving
-		winfo = pygame.display.Info()
-		self.__centre_x = winfo.current_w//2
-		self.__centre_y = winfo.current_h//2
-		self.__centre_line_width = 2
-		self.__centre_line_surface = pygame.Surface((self.__centre_line_width, winfo.current_h))	#surface to draw the centre line on
+		self.__text_cache = text_cache		#so the scores only get rendered when they change
+		if text_cache is None:
+			self.__text_cache = pongrender.TextCache()
+		self.__assets = assets
+		if assets is None:
+			self.__assets = pongassets.AssetManager()
+		self.__rules = pongsim.MatchRules(display.get_width(), display.get_height(), rng)	#scoring and serving
+		self.__centre_x = display.get_width()//2
 		self.__draw_colour = (255, 255, 255)		#draw colour for text and centre line, RGB tuple
-		self.__ball_speed = 12		# speed the ball moves at in pixels per frame
-		self.__score_font = pygame.font.SysFont("Arial", 48)
-		self.__score_limit = 7
-		self.__max_serve_angle = math.pi/8		# max angle from horizontal in radians the ball can move on a serve
-		
+		self.__score_font = None	#got the first time the scores are drawn, so making the controller doesnt wait for the fonts
+		self.__match_over = False	#once somebody has won, the rules stop, even if more ticks run before the match is cleared away
+		self.__bus = None			#the event bus the points, serves and the end of the match are sent to
+		
+	def connect(self, objects):
+		self.__bus = objects.get_bus()
+		# the centre line never moves, so it goes on the background with the back colour, and isnt drawn every frame
+		self.__display.add_static(draw_centre_line)
+
+	def disconnect(self, objects):
+		self.__display.remove_static(draw_centre_line)
+		
+	def reset(self, config):
+		# 0-0, with the ball speed and serve angle from config
+		self.__rules.reset()
+		self.set_ball_speed(config["ball_speed"])
+		self.set_max_serve_angle(config["max_serve_angle"])
+		self.__match_over = False
+
+	def get_rules(self):
+		return self.__rules
+
 	def set_ball_speed(self, new_speed):
-		self.__ball_speed = new_speed
+		self.__rules.set_ball_speed(new_speed)
 		
 	def set_max_serve_angle(self, new_angle):
-		self.__max_serve_angle = new_angle		#remember, its all in radians
-		
-	def __centre_ball(self, ball):
-		# called when somebody wins a point. Increments the scores, sets a timer, and moves the ball to the centre.
-		ball_position = ball.get_position()
-		if ball_position[0]<0:		#increment the score of whoever won the point. determined by balls position off screen
-			self.__player_score += 1
-		elif ball_position[0]>self.__centre_x*2:
-			self.__opponent_score += 1
-		# set a timer that when reaches 0 triggers the event "userevent+1". in milliseconds (approximate)
-		pygame.time.set_timer(pygame.USEREVENT+1, self.__restart_wait_time)
-		# stop the ball moving and place it in the centre of the screen
-		ball.set_velocity(0)
-		ball.set_position(self.__centre_x-ball.get_size()//2, self.__centre_y-ball.get_size()//2)
-	
-	def __restart_ball(self, ball):
-		#disable the timer calling userevent+15
-		pygame.time.set_timer(pygame.USEREVENT+1, 0)
-		base_direction = random.choice((0,  math.pi))	# left or right
-		ball.set_direction_random(base_direction, self.__max_serve_angle)
-		ball.set_velocity(self.__ball_speed)
+		self.__rules.set_max_serve_angle(new_angle)		#remember, its all in radians
 	
-	def __check_for_winner(self, objects):
-		def setstr(newstr, win_event, objects):
-			pygame.event.post(win_event)
-			for controller in objects:
-				if isinstance(controller, GameController):
-					controller.set_result_string(newstr)
-						
-		# called at the end of each point. Check if the player or opponent won. If so, post an event to notify other objects
-		win_event = pygame.event.Event(pygame.USEREVENT+2)
-		if self.__player_score == self.__score_limit:
-			setstr("You Won!", win_event, objects)
-		if self.__opponent_score == self.__score_limit:
-			setstr(" You Lost :(", win_event, objects)
-			
-	def update(self, events, objects):
-		need_restart = False
-		for event in events:
-			if event.type == pygame.USEREVENT+1:
-				#if this event fires, it means we need to tell the ball to start moving again
-				need_restart = True
-				# if the ball is not in play, somebody must have won the point, so restart it
-				
-		for ball in objects:
-			if isinstance(ball, Ball):
-				if not ball.is_in_play():
-					self.__centre_ball(ball)
-					self.__check_for_winner(objects)
-				if need_restart:
-					self.__restart_ball(ball)
+	def update(self, objects):
+		if self.__match_over:
+			return
+		for ball in objects.of_type(Ball):
+			# score points, put the ball back in the centre and serve it, and tell everything listening on the bus.
+			# the game controller ends the match when it hears MATCH_OVER
+			for event, value in self.__rules.step(ball.get_body()):
+				if event == pongsim.MATCH_OVER:
+					self.__match_over = True
+				if self.__bus is not None:
+					self.__bus.emit(event, value)
 					
-		# draw the centre line
-		self.__centre_line_surface.fill(self.__draw_colour)
-		self.__display.blit(self.__centre_line_surface, (self.__centre_x-self.__centre_line_width//2, 0))
+	def draw(self, alpha):
 		# draw the scores
-		player_label = self.__score_font.render(str(self.__player_score), 1, self.__draw_colour)
-		opponent_label = self.__score_font.render(str(self.__opponent_score), 1, self.__draw_colour)
+		if self.__score_font is None:
+			self.__score_font = self.__assets.get_font("Arial", 48)
+		player_score, opponent_score = self.__rules.get_scores()
+		player_label = self.__text_cache.render(self.__score_font, str(player_score), 1, self.__draw_colour)
+		opponent_label = self.__text_cache.render(self.__score_font, str(opponent_score), 1, self.__draw_colour)
+		self.__display.blit(player_label, (self.__centre_x+50-player_label.get_width()//2, 20))
+		self.__display.blit(opponent_label, (self.__centre_x-50-opponent_label.get_width()//2, 20))
+
+class MultiballMatch:
+	# the multiball game mode, in place of a MatchController and a Ball. Lots of balls at once, kept in a pongmulti.BallSwarm
+	# rather than a Ball object each, bouncing off each other as well as the walls and paddles. Every ball that gets past
+	# a paddle is a point, and whoever has the most points when the time runs out wins
+	# rng: where the seed for the balls in each match comes from
+	def __init__(self, display, count, text_cache=None, assets=None, rng=random):
+		self.__display = display
+		self.__rng = rng
+		self.__text_cache = text_cache
+		if text_cache is None:
+			self.__text_cache = pongrender.TextCache()
+		self.__assets = assets
+		if assets is None:
+			self.__assets = pongassets.AssetManager()
+		self.__swarm = pongmulti.BallSwarm(count, display.get_width(), display.get_height(), ball_collisions=True)
+		self.__centre_x = display.get_width()//2
+		self.__draw_colour = (255, 255, 255)
+		self.__surface = display.make_sprite((self.__swarm.get_size(), self.__swarm.get_size()), self.__draw_colour)
+		self.__score_font = None	#the fonts are got the first time they are drawn with
+		self.__time_font = None
+		# a ball for the ai to chase, put wherever the ball that will get to its paddle first is. See get_threat
+		self.__threat = pongsim.BallBody(display.get_width(), display.get_height())
+		self.__player_score = 0
+		self.__opponent_score = 0
+		self.__ticks_left = 0
+		self.__last_positions = None	#x and y arrays of where the balls were before the last tick, for drawing between ticks
+		self.__match_over = False
+		self.__bus = None
+
+	def connect(self, objects):
+		self.__bus = objects.get_bus()
+		self.__display.add_static(draw_centre_line)
+
+	def disconnect(self, objects):
+		self.__display.remove_static(draw_centre_line)
+
+	def reset(self, config):
+		# every ball back in the middle, 0-0, and the clock started again
+		self.__swarm.reset(self.__rng.getrandbits(64))
+		self.__swarm.set_ball_speed(config["ball_speed"])
+		self.__swarm.set_max_serve_angle(config["max_serve_angle"])
+		self.__player_score = 0
+		self.__opponent_score = 0
+		self.__ticks_left = MULTIBALL_SECONDS*pongsim.TICK_RATE
+		self.__last_positions = None
+		self.__match_over = False
+
+	def get_threat(self, paddle_x):
+		# a pongsim.BallBody in the same place as the ball that will get to paddle_x first, or sat in the middle if no
+		# ball is on its way. An ai can follow it like it would the one ball
+		i = self.__swarm.get_threat(paddle_x)
+		if i is None:
+			self.__threat.set_state([self.__centre_x, self.__display.get_height()//2, 0, 0])
+		else:
+			self.__threat.set_state(self.__swarm.get_ball_state(i))
+		return self.__threat
+
+	def update(self, objects):
+		if self.__match_over:
+			return
+		x, y = self.__swarm.get_positions()
+		self.__last_positions = (x.copy(), y.copy())
+		paddles = [paddle.get_rect() for paddle in objects.of_type(Paddle)]
+		hits, player_points, opponent_points = self.__swarm.step(paddles)
+		self.__player_score += player_points
+		self.__opponent_score += opponent_points
+		self.__ticks_left -= 1
+		if self.__ticks_left <= 0:
+			self.__match_over = True
+		if self.__bus is None:
+			return
+		for i in range(hits):
+			self.__bus.emit(pongsim.PADDLE_HIT)
+		for i in range(player_points):
+			self.__bus.emit(pongsim.POINT_SCORED, pongsim.PLAYER)
+		for i in range(opponent_points):
+			self.__bus.emit(pongsim.POINT_SCORED, pongsim.OPPONENT)
+		if self.__match_over:
+			winner = pongsim.PLAYER if self.__player_score > self.__opponent_score else pongsim.OPPONENT
+			self.__bus.emit(pongsim.MATCH_OVER, winner)
+
+	def draw(self, alpha):
+		# every ball in one blits call, alpha of the way from where they were to where they are
+		x, y = self.__swarm.get_positions()
+		if self.__last_positions is not None:
+			last_x, last_y = self.__last_positions
+			x = last_x + (x - last_x)*alpha
+			y = last_y + (y - last_y)*alpha
+		surface = self.__surface
+		self.__display.blits([(surface, position) for position in zip(x.tolist(), y.tolist())])
+		# the scores, and the time left
+		if self.__score_font is None:
+			self.__score_font = self.__assets.get_font("Arial", 48)
+			self.__time_font = self.__assets.get_font("Arial", 18)
+		player_label = self.__text_cache.render(self.__score_font, str(self.__player_score), 1, self.__draw_colour)
+		opponent_label = self.__text_cache.render(self.__score_font, str(self.__opponent_score), 1, self.__draw_colour)
+		time_label = self.__text_cache.render(self.__time_font, str(-(-self.__ticks_left//pongsim.TICK_RATE)), 1, self.__draw_colour)
 		self.__display.blit(player_label, (self.__centre_x+50-player_label.get_width()//2, 20))
 		self.__display.blit(opponent_label, (self.__centre_x-50-opponent_label.get_width()//2, 20))
+		self.__display.blit(time_label, (self.__centre_x-time_label.get_width()//2, 20+player_label.get_height()))
+
+class NetworkMatch:
+	# a match against somebody else over the network, in place of everything else in a match. pongnet does the talking to
+	# the server and the prediction, this sends it the arrow keys every tick and draws the match from its World.
+	# Whichever side this end plays is the player here, so the events and the winner are the same as a match against the ai
+	def __init__(self, display, address, text_cache=None, assets=None):
+		self.__display = display
+		self.__address = address		#(host, port) of the pongnet server
+		self.__text_cache = text_cache
+		if text_cache is None:
+			self.__text_cache = pongrender.TextCache()
+		self.__assets = assets
+		if assets is None:
+			self.__assets = pongassets.AssetManager()
+		self.__draw_colour = (255, 255, 255)
+		self.__centre_x = display.get_width()//2
+		self.__paddle_surface = display.make_sprite(pongsim.PaddleBody().get_rect()[2:], self.__draw_colour)
+		ball_size = pongsim.BallBody(0, 0).get_size()
+		self.__ball_surface = display.make_sprite((ball_size, ball_size), self.__draw_colour)
+		self.__score_font = None	#the fonts are got the first time they are drawn with
+		self.__status_font = None
+		self.__client = None		#a pongnet.ThreadedClient, made for each match
+		self.__match = None			#a pongnet.PredictedMatch, once the client has joined
+		self.__press_move_up = False
+		self.__press_move_down = False
+		self.__last_positions = None	#where the paddles and ball were before the last tick, for drawing between ticks
+		self.__match_over = False
+		self.__bus = None
+
+	def connect(self, objects):
+		self.__bus = objects.get_bus()
+		self.__bus.subscribe(pygame.KEYDOWN, self.__on_up, pygame.K_UP)
+		self.__bus.subscribe(pygame.KEYUP, self.__on_up, pygame.K_UP)
+		self.__bus.subscribe(pygame.KEYDOWN, self.__on_down, pygame.K_DOWN)
+		self.__bus.subscribe(pygame.KEYUP, self.__on_down, pygame.K_DOWN)
+		self.__display.add_static(draw_centre_line)
+
+	def disconnect(self, objects):
+		self.__display.remove_static(draw_centre_line)
+		if self.__client is not None:
+			self.__client.close()
+			self.__client = None
+
+	def __on_up(self, event):
+		self.__press_move_up = event.type == pygame.KEYDOWN
+
+	def __on_down(self, event):
+		self.__press_move_down = event.type == pygame.KEYDOWN
+
+	def reset(self, config):
+		# join the server again for a new match
+		if self.__client is not None:
+			self.__client.close()
+		self.__client = pongnet.ThreadedClient(*self.__address)
+		self.__match = None
+		self.__press_move_up = False
+		self.__press_move_down = False
+		self.__last_positions = None
+		self.__match_over = False
+
+	def __finish(self, winner):
+		self.__match_over = True
+		self.__bus.emit(pongsim.MATCH_OVER, winner)
+
+	def __positions(self):
+		world = self.__match.get_world()
+		return (world.get_player().get_position(), world.get_opponent().get_position(), world.get_ball().get_position())
+
+	def update(self, objects):
+		if self.__match_over:
+			return
+		if self.__match is None:
+			if not self.__client.is_ready():
+				return		#still joining
+			if self.__client.get_error() is not None:
+				print("Couldnt join the server at %s:%d: %s" % (self.__address + (self.__client.get_error(),)))
+				self.__finish(pongsim.OPPONENT)
+				return
+			self.__match = pongnet.PredictedMatch(self.__client)
+		if self.__client.is_timed_out():
+			print("Lost the connection to the server at %s:%d" % self.__address)
+			self.__finish(pongsim.OPPONENT)
+			return
+		self.__last_positions = self.__positions()
+		winner = None
+		side = self.__match.get_side()
+		for event, value in self.__match.tick(self.__press_move_up, self.__press_move_down):
+			if value is not None:
+				value = pongsim.PLAYER if value == side else pongsim.OPPONENT
+			if event == pongsim.MATCH_OVER:
+				winner = value		#sent last, because it ends the match
+			else:
+				self.__bus.emit(event, value)
+		if winner is not None:
+			self.__finish(winner)
+
+	def draw(self, alpha):
+		if self.__score_font is None:
+			self.__score_font = self.__assets.get_font("Arial", 48)
+			self.__status_font = self.__assets.get_font("Arial", 18)
+		if self.__match is None or not self.__match.is_started():
+			if self.__match is None:
+				status = "Joining %s:%d" % self.__address
+			else:
+				status = "Waiting for somebody to play against"
+			label = self.__text_cache.render(self.__status_font, status, 1, self.__draw_colour)
+			self.__display.blit(label, (self.__centre_x-label.get_width()//2, self.__display.get_height()//2))
+			return
+		positions = self.__positions()
+		last_positions = self.__last_positions or positions
+		surfaces = (self.__paddle_surface, self.__paddle_surface, self.__ball_surface)
+		for surface, last_position, position in zip(surfaces, last_positions, positions):
+			self.__display.blit(surface, interpolate(last_position, position, alpha))
+		# the scores either side of the centre line, and how the connection is doing at the bottom
+		player_score, opponent_score = self.__match.get_world().get_rules().get_scores()
+		player_label = self.__text_cache.render(self.__score_font, str(player_score), 1, self.__draw_colour)
+		opponent_label = self.__text_cache.render(self.__score_font, str(opponent_score), 1, self.__draw_colour)
+		self.__display.blit(player_label, (self.__centre_x+50-player_label.get_width()//2, 20))
+		self.__display.blit(opponent_label, (self.__centre_x-50-opponent_label.get_width()//2, 20))
+		rtt = self.__client.get_rtt()
+		status = "You are on the %s" % ("right" if self.__match.get_side() == pongsim.PLAYER else "left")
+		if rtt is not None:
+			status += ", ping %dms" % round(1000*rtt)
+		label = self.__text_cache.render(self.__status_font, status, 1, self.__draw_colour)
+		self.__display.blit(label, (self.__centre_x-label.get_width()//2, self.__display.get_height()-label.get_height()-10))
+
+class StatsRecorder:
+	# records every match it is in into a pongstats.MatchStats, from the serves, paddle hits and points on the bus
+	def __init__(self, stats):
+		self.__stats = stats
+		self.__objects = None
+
+	def connect(self, objects):
+		self.__objects = objects
+		bus = objects.get_bus()
+		bus.subscribe(pongsim.SERVE, self.__on_serve)
+		bus.subscribe(pongsim.PADDLE_HIT, self.__on_paddle_hit)
+		bus.subscribe(pongsim.POINT_SCORED, self.__on_point)
+		bus.subscribe(pongsim.MATCH_OVER, self.__on_match_over)
+
+	def reset(self, config):
+		self.__stats.start_match()
+
+	def __on_serve(self, value):
+		self.__stats.serve(self.__objects.first(Ball).get_body())
+
+	def __on_paddle_hit(self, value):
+		paddles = [paddle.get_body() for paddle in self.__objects.of_type(Paddle)]
+		self.__stats.paddle_hit(self.__objects.first(Ball).get_body(), paddles)
+
+	def __on_point(self, winner):
+		self.__stats.point(winner)
+
+	def __on_match_over(self, winner):
+		self.__stats.end_match()
+
+	def update(self, objects):
+		# after everything else, so the signals during a tick are recorded at the same tick as pongstats.MatchStats.observe
+		self.__stats.tick()
+
+	def draw(self, alpha):
+		pass
 
 class GameController:
-	def __init__(self, display):
+	# multiball: how many balls there are in a multiball match
+	# server: (host, port) of a pongnet server to play people on, or None for no network play
+	# fixed_point: move the ball with whole numbers only, so a match and its replay play the same on any machine
+	# stats: a pongstats.MatchStats to record every match into, or None to not record them. Multiball and network matches
+	# arent recorded
+	def __init__(self, display, text_cache=None, replay_dir=None, assets=None, multiball=MULTIBALL_COUNT, server=None,
+			fixed_point=False, stats=None):
 		self.__display = display
+		self.__text_cache = text_cache		#the menu text is the same every frame, so it only gets rendered once
+		if text_cache is None:
+			self.__text_cache = pongrender.TextCache()
+		self.__assets = assets		#loads each font once, and shares them with every match
+		if assets is None:
+			self.__assets = pongassets.AssetManager()
 		self.__font_name = "Arial"
-		self.__big_font = pygame.font.SysFont(self.__font_name, 48)
-		self.__small_font = pygame.font.SysFont(self.__font_name, 18)
+		self.__big_font = None		#set by __get_fonts, once the background preload has them ready
+		self.__small_font = None
 		self.__state = "start"		# "start", "difficulty", "game", or "endgame".
 		self.__draw_colour = (255, 255, 255)	#RGB colour tuple
 		self.__result_string = None	#placeholder for "You won!" or "You lost!"
-		self.__play_label = self.__big_font.render("Press 'P' To Play Again", 1, self.__draw_colour)
-		self.__quit_label = self.__small_font.render("Or press 'Q' to quit", 1, self.__draw_colour)
-		self.__difficulties = (self.start_easy_game, self.start_normal_game, self.start_hard_game)
-		self.__current_difficulty = 1
+		self.__play_label = None
+		self.__quit_label = None
+		self.__current_difficulty = 1	#the GAME_MODES index of the last match played
+		self.__replay_dir = replay_dir	#folder to save a replay of every match to, or None to not save them
+		self.__recorder = None			#records the current match for the replay
+		self.__recording = False		#False when the match cant be replayed, like multiball
+		if replay_dir is not None:
+			self.__recorder = pongreplay.ReplayRecorder(0, width=display.get_width(), height=display.get_height(),
+				fixed_point=fixed_point)
+		self.__fixed_point = fixed_point
+		# everything random in a match comes from here. It is seeded again at the start of every match, so a replay can
+		# play the match again exactly
+		self.__rng = random.Random()
+		# the objects in a match are made once here, and reset for every match, so starting a match or a rematch
+		# doesnt make any new objects, surfaces or fonts
+		self.__player = Player(display)
+		self.__match_objects = (Opponent(display, self.__rng), MatchController(display, self.__text_cache, self.__rng, self.__assets),
+			self.__player, Ball(display, self.__rng, fixed_point))
+		if stats is not None:
+			# last, so it counts the tick after everything in it has happened
+			self.__match_objects += (StatsRecorder(stats),)
+		self.__multiball = multiball
+		self.__multiball_objects = None	#the multiball match uses the same paddles, made the first time it is played
+		self.__server = server
+		self.__network_objects = None	#made the first time a network match is played
+		self.__objects = None			#the registry the controller is in, set by connect
 		
 	def set_result_string(self, newstring):
 		self.__result_string = newstring
 
-	def start_easy_game(self, objects):
-		self.__current_difficulty = 0
-		o = Opponent(self.__display)
-		m = MatchController(self.__display)
-		o.set_difficulty(self.__current_difficulty)
-		m.set_ball_speed(10)
-		m.set_max_serve_angle(math.pi/36)
-		objects+=[o, m, Player(self.__display), Ball(self.__display)]
-		self.__state = "game"
-		
-	def start_normal_game(self, objects):
-		self.__current_difficulty = 1
-		o = Opponent(self.__display)
-		m = MatchController(self.__display)
-		o.set_difficulty(self.__current_difficulty)
-		m.set_ball_speed(12)
-		m.set_max_serve_angle(math.pi/18)
-		objects+=[o, m, Player(self.__display), Ball(self.__display)]
-		self.__state = "game"
-		
-	def start_hard_game(self, objects):
-		self.__current_difficulty = 2
-		o = Opponent(self.__display)
-		m = MatchController(self.__display)
-		o.set_difficulty(self.__current_difficulty)
-		m.set_ball_speed(14)
-		m.set_max_serve_angle(math.pi/12)
-		objects+=[o, m, Player(self.__display), Ball(self.__display)]
-		self.__state = "game"
-		
-	def update(self, events, objects):		
-		for event in events:
-			# if the match is over (player or opponent wins)
-			if event.type == pygame.USEREVENT+2:
-				# remove all objects that aren't the gamecontroller, and change the game state
-				objects.clear()
-				objects+=[self]
-				self.__state = "endgame"
-				
-			elif event.type == pygame.KEYDOWN:
-				if event.key == pygame.K_q:
-					#if the player quits
-					if self.__state=="start" or self.__state=="endgame":
-						quit_event = pygame.event.Event(pygame.QUIT)
-						pygame.event.post(quit_event)
-						
-				elif event.key == pygame.K_p:
-					#if the player wants to start a game
-					if self.__state=="start":
-						# go to the difficulty selection screen
-						self.__state = "difficulty"
-					#if the player wants a rematch, start with the currently selected difficulty
-					elif self.__state=="endgame":
-						self.__difficulties[self.__current_difficulty](objects)
-						
-				elif event.key == pygame.K_e and self.__state == "difficulty":
-					self.start_easy_game(objects)
-				elif event.key == pygame.K_n and self.__state == "difficulty":
-					self.start_normal_game(objects)
-				elif event.key == pygame.K_h and self.__state == "difficulty":
-					self.start_hard_game(objects)
-					
-				elif event.key == pygame.K_d and self.__state == "endgame":
-					self.__state = "difficulty"
+	def connect(self, objects):
+		# listen for the menu keys, and for the end of the match
+		self.__objects = objects
+		bus = objects.get_bus()
+		bus.subscribe(pongsim.MATCH_OVER, self.__on_match_over)
+		bus.subscribe(pygame.KEYDOWN, self.__on_quit, pygame.K_q)
+		bus.subscribe(pygame.KEYDOWN, self.__on_play, pygame.K_p)
+		bus.subscribe(pygame.KEYDOWN, self.__on_change_difficulty, pygame.K_d)
+		self.__difficulty_keys = {pygame.K_e: 0, pygame.K_n: 1, pygame.K_h: 2, pygame.K_x: 3}		#key -> GAME_MODES index
+		if pongmulti is not None:
+			self.__difficulty_keys[pygame.K_m] = 4
+		if self.__server is not None:
+			self.__difficulty_keys[pygame.K_c] = 5
+		for key in self.__difficulty_keys:
+			bus.subscribe(pygame.KEYDOWN, self.__on_difficulty_key, key)
+		
+	def __set_state(self, new_state):
+		# every state shows a different screen, so the whole window gets redrawn
+		self.__state = new_state
+		self.__display.request_full_redraw()
+
+	def __save_replay(self):
+		if not self.__recording:
+			return
+		# the seed goes in the name too, so matches that end in the same second dont overwrite each other
+		name = time.strftime("pypong_%Y%m%d_%H%M%S_") + "%x.pongreplay" % self.__recorder.get_settings()["seed"]
+		path = os.path.join(self.__replay_dir, name)
+		print("Saved a %d byte replay to %s" % (self.__recorder.save(path), path))
+
+	def start_game(self, mode, objects):
+		# start a match with the settings in GAME_MODES[mode], reusing the objects from the last match
+		self.__current_difficulty = mode
+		config = GAME_MODES[mode]
+		seed = random.getrandbits(64)
+		self.__rng.seed(seed)
+		entities = self.__match_objects
+		if config.get("multiball"):
+			if self.__multiball_objects is None:
+				multiball = MultiballMatch(self.__display, self.__multiball, self.__text_cache, self.__assets, self.__rng)
+				self.__multiball_objects = (self.__match_objects[0], multiball, self.__player)
+			entities = self.__multiball_objects
+		elif config.get("network"):
+			if self.__network_objects is None:
+				self.__network_objects = (NetworkMatch(self.__display, self.__server, self.__text_cache, self.__assets),)
+			entities = self.__network_objects
+		self.__recording = self.__recorder is not None and not config.get("multiball") and not config.get("network")
+		if self.__recording:
+			self.__recorder.reset(seed, config["difficulty"], config["predictive"], self.__fixed_point)
+		for entity in entities:
+			entity.reset(config)
+		objects.extend(entities)
+		self.__set_state("game")
+
+	def __on_match_over(self, winner):
+		# the player or opponent won. remove all objects that aren't the gamecontroller, and change the game state
+		if winner == pongsim.PLAYER:
+			self.__result_string = "You Won!"
+		else:
+			self.__result_string = " You Lost :("
+		self.__save_replay()
+		self.__objects.clear()
+		self.__objects.add(self)
+		self.__set_state("endgame")
+
+	def __on_quit(self, event):
+		#if the player quits
+		if self.__state=="start" or self.__state=="endgame":
+			quit_event = pygame.event.Event(pygame.QUIT)
+			pygame.event.post(quit_event)
+
+	def __on_play(self, event):
+		#if the player wants to start a game
+		if self.__state=="start":
+			# go to the difficulty selection screen
+			self.__set_state("difficulty")
+		#if the player wants a rematch, start with the currently selected difficulty
+		elif self.__state=="endgame":
+			self.start_game(self.__current_difficulty, self.__objects)
+
+	def __on_difficulty_key(self, event):
+		if self.__state == "difficulty":
+			self.start_game(self.__difficulty_keys[event.key], self.__objects)
+
+	def __on_change_difficulty(self, event):
+		if self.__state == "endgame":
+			self.__set_state("difficulty")
+
+	def update(self, objects):
+		# record the keys the player paddle moves by this tick, for the replay. The controller updates first, so this
+		# still happens on the tick the match ends, and the keys only change between ticks
+		if self.__recording and self.__state == "game":
+			self.__recorder.record(*self.__player.get_keys())
 				
+	def __get_fonts(self):
+		# the menu fonts, without waiting for them. The first frames go on the screen without the text if the fonts are
+		# still loading, rather than the window staying blank until they have. Returns False until both are ready
+		if self.__small_font is None:
+			self.__big_font = self.__assets.get_font(self.__font_name, 48, wait=False)
+			small_font = self.__assets.get_font(self.__font_name, 18, wait=False)
+			if self.__big_font is None or small_font is None:
+				return False
+			self.__small_font = small_font
+			self.__quit_label = self.__text_cache.render(self.__small_font, "Or press 'Q' to quit", 1, self.__draw_colour)
+		return True
+
+	def draw(self, alpha):
 		# alter the text the gamecontroller displays based on the current game state
-		winfo = pygame.display.Info()
-		w = winfo.current_w
-		h = winfo.current_h
+		if not self.__get_fonts():
+			return
+		w, h = self.__display.get_size()
 		
 		if self.__state == "start":
-			self.__play_label = self.__big_font.render("Press 'P' To Play", 1, self.__draw_colour)
+			self.__play_label = self.__text_cache.render(self.__big_font, "Press 'P' To Play", 1, self.__draw_colour)
 			self.__display.blit(self.__play_label, (w//2-self.__play_label.get_width()//2, h//2-self.__play_label.get_height()))
 			self.__display.blit(self.__quit_label, (w//2-self.__quit_label.get_width()//2, h//2+self.__quit_label.get_height()))	
 			
 		elif self.__state == "endgame":
-			self.__play_label = self.__big_font.render("Press 'P' To Play Again", 1, self.__draw_colour)
-			result_label = self.__big_font.render(self.__result_string, 1, self.__draw_colour)
-			difficulty_label = self.__small_font.render("Press 'D' To Change Difficulty", 1, self.__draw_colour)
+			self.__play_label = self.__text_cache.render(self.__big_font, "Press 'P' To Play Again", 1, self.__draw_colour)
+			result_label = self.__text_cache.render(self.__big_font, self.__result_string, 1, self.__draw_colour)
+			difficulty_label = self.__text_cache.render(self.__small_font, "Press 'D' To Change Difficulty", 1, self.__draw_colour)
 			self.__display.blit(result_label, (w//2-result_label.get_width()//2, 100))
 			self.__display.blit(self.__play_label, (w//2-self.__play_label.get_width()//2, h//2-self.__play_label.get_height()))
 			self.__display.blit(difficulty_label, (w//2-difficulty_label.get_width()//2, h//2+difficulty_label.get_height()))
 			self.__display.blit(self.__quit_label, (w//2-self.__quit_label.get_width()//2, h//2+self.__quit_label.get_height()*2))
 			
 		elif self.__state == "difficulty":
-			difficulty_label = self.__big_font.render("Select a difficulty", 1, self.__draw_colour)
-			easy_label = self.__big_font.render("[E]asy", 1, self.__draw_colour)
-			normal_label = self.__big_font.render("[N]ormal", 1, self.__draw_colour)
-			hard_label = self.__big_font.render("[H]ard", 1, self.__draw_colour)
+			difficulty_label = self.__text_cache.render(self.__big_font, "Select a difficulty", 1, self.__draw_colour)
+			easy_label = self.__text_cache.render(self.__big_font, "[E]asy", 1, self.__draw_colour)
+			normal_label = self.__text_cache.render(self.__big_font, "[N]ormal", 1, self.__draw_colour)
+			hard_label = self.__text_cache.render(self.__big_font, "[H]ard", 1, self.__draw_colour)
+			expert_label = self.__text_cache.render(self.__big_font, "E[X]pert", 1, self.__draw_colour)
 			self.__display.blit(difficulty_label, (w//2-difficulty_label.get_width()//2, 80))
-			x = w//2 - max(easy_label.get_width(), normal_label.get_width(), hard_label.get_width())//2
+			x = w//2 - max(easy_label.get_width(), normal_label.get_width(), hard_label.get_width(), expert_label.get_width())//2
 			self.__display.blit(easy_label, (x, 160))
 			self.__display.blit(normal_label, (x, 170+easy_label.get_height()))
 			self.__display.blit(hard_label, (x, 180+2*easy_label.get_height()))
+			self.__display.blit(expert_label, (x, 190+3*easy_label.get_height()))
+			y = 200+4*easy_label.get_height()
+			if pongmulti is not None:
+				multiball_label = self.__text_cache.render(self.__small_font, "[M]ultiball: %d balls" % self.__multiball, 1, self.__draw_colour)
+				self.__display.blit(multiball_label, (x, y))
+				y += multiball_label.get_height()+5
+			if self.__server is not None:
+				network_label = self.__text_cache.render(self.__small_font, "[C]onnect to %s:%d" % self.__server, 1, self.__draw_colour)
+				self.__display.blit(network_label, (x, y))
 			
 		
 class MyGame:
-	def __init__(self):
+	def __init__(self, dirty_rendering=True, time_scale=1.0, uncapped_ticks=None, profile=False, replay_dir=None,
+			startup_report=False, font_cache=FONT_CACHE, multiball=MULTIBALL_COUNT, server=None, pacing="hybrid",
+			late_input=True, latency_report=False, fixed_point=False, stats_path=None):
+		# with startup_report set, how long each step of starting up took is printed once the first frame is drawn
+		self.startup = pongprofile.StartupTimer(STARTED) if startup_report else None
+		self.mark_startup("imports")
+		# the fonts load on another thread while the rest of pygame starts up and the window opens. font_cache is a file
+		# to remember where they were found
+		pygame.font.init()
+		self.assets = pongassets.AssetManager(font_cache)
+		self.assets.preload(FONTS, background=True)
+		pygame.init()
+		self.mark_startup("pygame init")
 		self.window_width = 640
 		self.window_height = 480
 		# start in windowed mode, not fullscreen
-		self.game_window = pygame.display.set_mode((self.window_width, self.window_height),  pygame.HWSURFACE | pygame.DOUBLEBUF)
+		if pacing == "vsync":
+			# vsync needs a window pygame scales itself, so it cant be resized
+			try:
+				self.game_window = pygame.display.set_mode((self.window_width, self.window_height), pygame.SCALED, vsync=1)
+			except pygame.error as error:
+				print("No vsync (%s), pacing with hybrid instead" % error)
+				pacing = "hybrid"
+		if pacing != "vsync":
+			self.game_window = pygame.display.set_mode((self.window_width, self.window_height),  pygame.HWSURFACE | pygame.DOUBLEBUF | pygame.RESIZABLE)
 		pygame.display.set_caption("Pink Pong")
-		self.clock = pygame.time.Clock()
-		self.objects = [GameController(self.game_window)]
+		self.mark_startup("window")
 		self.back_colour = (255,20,147) #RGB colour tuple for some shade of pink, arguably purple
-		self.game_speed = 60	#frames per second
+		# the game is always played on a 640x480 playfield, the viewport fits it to the window when the window is resized
+		self.viewport = pongrender.Viewport(pongsim.FIELD_SIZE, (self.window_width, self.window_height))
+		# objects draw through the renderer, which only redraws the parts of the window that changed unless dirty_rendering is False
+		self.renderer = pongrender.DirtyRenderer(self.game_window, self.back_colour, dirty_rendering, self.viewport)
+		# objects subscribe here to the events they want, and hear about paddle hits, points and the end of the match
+		self.bus = pongevents.EventBus()
+		# with replay_dir set, a replay of every match is saved there when the match ends
+		# with stats_path set, the serves, hits and points of every match are saved there, and summed up at the end
+		self.stats = pongstats.MatchStats(stats_path) if stats_path is not None else None
+		controller = GameController(self.renderer, replay_dir=replay_dir, assets=self.assets, multiball=multiball,
+			server=server, fixed_point=fixed_point, stats=self.stats)
+		self.objects = pongentities.EntityRegistry([controller], self.bus)	#every object in the game, indexed by type
+		self.game_speed = 60	#frames per second drawn. The game itself always runs at pongsim.TICK_RATE ticks per second of game time
+		# decides when each frame reads the input and goes on the screen. With late_input the input is read as late as it
+		# can be and still make the frame, instead of straight after the last frame
+		self.pacer = pongloop.FramePacer(pacing, self.game_speed, late_input)
+		# with latency_report set, how even the frames are and how old the input is on the screen is printed every so often
+		self.latency_report = latency_report
+		self.last_report = time.perf_counter()
+		# decides how many ticks to run each frame. time_scale above 1 fast forwards, uncapped_ticks runs that many ticks every frame
+		self.loop = pongloop.FixedStepLoop(pongsim.TICK_RATE, time_scale, uncapped_ticks=uncapped_ticks)
+		# times every part of every frame and shows an overlay when set. F3 turns it on and off, F4 saves a trace
+		self.profiler = pongprofile.FrameProfiler(self.assets) if profile else None
+		self.mark_startup("game objects")
 		#start the game loop
 		self.game_loop()
+		if self.stats is not None:
+			self.stats.close()
+			print("\n".join(self.stats.describe()))
+
+	def mark_startup(self, step):
+		if self.startup is not None:
+			self.startup.mark(step)
+
+	def report_startup(self):
+		# print how long each step of starting up took, now that the first frame is on the screen
+		self.startup.mark("first frame")
+		print("\n".join(self.startup.report(self.assets.get_timings())))
+		self.startup = None
+
+	def handle_events(self, events):
+		# deal with the events the game loop handles itself, and send the rest to the objects that subscribed to them
+		# on the bus. Returns False if the game should quit
+		for event in events:
+			if event.type == pygame.QUIT:
+				return False
+			#this event is posted on every collision between the ball and a paddle, or when a point is won. Change the background colour each time
+			#elif event.type == pygame.USEREVENT+4:
+				#r,g,b = random.randrange(256), random.randrange(256), random.randrange(256)
+				#while ((r>170 and g>170) or  (r>170 and b>170) or (b>170 and g>170)):	#make sure the new background colour isnt white/light grey
+					#r,g,b = random.randrange(256), random.randrange(256), random.randrange(256)
+				#self.back_colour = (r,g,b)
+				#self.renderer.set_back_colour(self.back_colour)
+			elif event.type == pygame.VIDEORESIZE:
+				if self.viewport.handle_event(event):
+					self.game_window = pygame.display.get_surface()
+					self.renderer.resize(self.game_window)
+			elif event.type == pygame.WINDOWEXPOSED:
+				# the window was uncovered, so whatever was drawn there is gone
+				self.renderer.request_full_redraw()
+			elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+				self.profiler = None if self.profiler else pongprofile.FrameProfiler(self.assets)
+				self.renderer.request_full_redraw()
+			elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4 and self.profiler:
+				path = time.strftime("pypong_trace_%Y%m%d_%H%M%S.json")
+				print("Saved %d trace events to %s" % (self.profiler.dump_trace(path), path))
+			self.bus.publish(event)
+		return True
+
+	def report_latency(self, force=False):
+		now = time.perf_counter()
+		if force or now - self.last_report >= LATENCY_REPORT_SECONDS:
+			print(self.pacer.describe())
+			self.last_report = now
 
 	def game_loop(self):
 		while True:
-			self.clock.tick(self.game_speed)		#have a lower framerate to give greater control over speed of game objects
+			frame_time = self.pacer.wait_for_input()		#seconds since the last frame
+			if self.profiler is not None:
+				if not self.profiled_frame(frame_time):
+					break
+				continue
 			# Process events
-			events = pygame.event.get()
-			for event in events:
-				if event.type == pygame.QUIT:
-					return
-				#this event is posted on every collision between the ball and a paddle, or when a point is won. Change the background colour each time
-				#elif event.type == pygame.USEREVENT+4:
-					#r,g,b = random.randrange(256), random.randrange(256), random.randrange(256)
-					#while ((r>170 and g>170) or  (r>170 and b>170) or (b>170 and g>170)):	#make sure the new background colour isnt white/light grey
-						#r,g,b = random.randrange(256), random.randrange(256), random.randrange(256)
-					#self.back_colour = (r,g,b)
+			if not self.handle_events(pygame.event.get()):
+				break
+					
+			# run the simulation for however many ticks are due
+			for tick in range(self.loop.advance(frame_time)):
+				for object in self.objects:
+					object.update(self.objects)
 					
-			# Clear the screen to black
-			self.game_window.fill(self.back_colour)
-			# put stuff on the screen by updating all the objects
+			# Clear the screen, or just the parts that were drawn on last frame
+			self.renderer.begin_frame()
+			# put stuff on the screen by drawing all the objects, part way between the last tick and the next
+			alpha = self.loop.get_alpha()
 			for object in self.objects:
-				object.update(events, self.objects)
+				object.draw(alpha)
 			# update the screen
-			pygame.display.update()
+			self.pacer.wait_for_present()
+			self.renderer.end_frame()
+			self.pacer.presented()
+			if self.startup is not None:
+				self.report_startup()
+			if self.latency_report:
+				self.report_latency()
+		if self.latency_report:
+			self.report_latency(force=True)
+			
+	def profiled_frame(self, frame_time):
+		# the same as one time round the game loop, but timing every part of it for the profiler
+		profiler = self.profiler
+		clock = time.perf_counter
+		profiler.begin_frame()
+		start = clock()
+		carry_on = self.handle_events(pygame.event.get())
+		profiler.record("events", start, clock())
+		if not carry_on:
+			return False
+		for tick in range(self.loop.advance(frame_time)):
+			for object in self.objects:
+				start = clock()
+				object.update(self.objects)
+				profiler.record(type(object).__name__ + ".update", start, clock())
+		start = clock()
+		self.renderer.begin_frame()
+		profiler.record("fill", start, clock())
+		alpha = self.loop.get_alpha()
+		for object in self.objects:
+			start = clock()
+			object.draw(alpha)
+			profiler.record(type(object).__name__ + ".draw", start, clock())
+		if self.profiler is not None:	#F3 might have just turned it off
+			profiler.draw(self.renderer, self.pacer.get_fps())
+		start = clock()
+		self.pacer.wait_for_present()
+		profiler.record("pacing", start, clock())
+		start = clock()
+		self.renderer.end_frame()
+		self.pacer.presented()
+		profiler.record("display.update", start, clock())
+		profiler.end_frame()
+		if self.startup is not None:
+			self.report_startup()
+		if self.latency_report:
+			self.report_latency()
+		return True
 			
 if __name__=="__main__":
-	pygame.init()
-	game = MyGame()
-	
+	parser = argparse.ArgumentParser(description="Play Pong against the computer.")
+	parser.add_argument("--startup-report", action="store_true", help="print how long starting up took")
+	parser.add_argument("--time-scale", type=float, default=1.0, help="run the game this many times faster than real time")
+	parser.add_argument("--uncapped-ticks", type=int, metavar="TICKS", help="run exactly TICKS ticks every frame, however long the frame took")
+	parser.add_argument("--profile", action="store_true", help="start with the profiler overlay on, the same as pressing F3")
+	parser.add_argument("--multiball", type=int, default=MULTIBALL_COUNT, help="balls in a multiball match")
+	parser.add_argument("--replay-dir", help="folder to save a replay of every match to")
+	parser.add_argument("--connect", metavar="HOST[:PORT]", help="a pongnet server to play somebody else on")
+	parser.add_argument("--pacing", choices=pongloop.PACING_STRATEGIES, default="hybrid", help="how to wait for the next frame")
+	parser.add_argument("--no-late-input", dest="late_input", action="store_false", help="read the input straight after the last frame, not just before it is needed")
+	parser.add_argument("--stats", metavar="FILE", help="save the serves, hits and points of every match to FILE, see pongstats.py")
+	parser.add_argument("--fixed-point", action="store_true", help="move the ball with whole numbers only, so replays play the same on any machine")
+	parser.add_argument("--latency-report", action="store_true", help="print the frame pacing and input latency every %d seconds" % LATENCY_REPORT_SECONDS)
+	args = parser.parse_args()
+	if args.time_scale <= 0:
+		parser.error("--time-scale must be more than 0")
+	if args.uncapped_ticks is not None and args.uncapped_ticks < 1:
+		parser.error("--uncapped-ticks must be at least 1")
+	server = None
+	if args.connect is not None:
+		server = pongnet.parse_address(args.connect)
+	game = MyGame(time_scale=args.time_scale, uncapped_ticks=args.uncapped_ticks, profile=args.profile, replay_dir=args.replay_dir,
+		startup_report=args.startup_report, multiball=args.multiball, server=server,
+		pacing=args.pacing, late_input=args.late_input, latency_report=args.latency_report,
+		fixed_point=args.fixed_point, stats_path=args.stats)
@@ -0,0 +1,55 @@
+"""Jordan Ogilvy, 'pypong' tests for the queue. Run with python -m pytest"""
+
+import pytest
+from myqueue import MyQueue
+
+def test_overwrite_drops_the_front():
+	for typecode in (None, "i"):
+		queue = MyQueue(maxlen=3, typecode=typecode)
+		assert queue.enqueue_many(range(5)) == 5
+		assert queue.is_full()
+		assert list(queue) == [2, 3, 4]
+		assert queue.peek(0) == 2 and queue.peek(2) == 4 and queue.peek(3) is None
+		assert queue.dequeue() == 2
+		assert queue.enqueue(5)
+		assert list(queue) == [3, 4, 5]
+
+def test_reject_keeps_what_is_there():
+	for typecode in (None, "d"):
+		queue = MyQueue(maxlen=3, overflow="reject", typecode=typecode)
+		assert queue.enqueue_many(range(5)) == 3
+		assert not queue.enqueue(9)
+		assert list(queue) == [0, 1, 2]
+		assert queue.dequeue() == 0
+		assert queue.enqueue(9)
+		assert list(queue) == [1, 2, 9]
+
+def test_wrapping_round():
+	# the front and back go round the slots many times over, and dequeue_many has to join the two ends back up
+	queue = MyQueue(maxlen=4, typecode="i")
+	expected = []
+	for item in range(50):
+		queue.enqueue(item)
+		expected = (expected + [item])[-4:]
+		if item % 3 == 0:
+			assert list(queue.dequeue_many(2)) == expected[:2]
+			expected = expected[2:]
+		assert list(queue) == expected
+		assert len(queue) == len(expected)
+
+def test_unlimited_queue_grows():
+	queue = MyQueue()
+	queue.enqueue_many(range(3))
+	queue.dequeue()
+	queue.enqueue_many(range(3, 100))
+	assert not queue.is_full()
+	assert list(queue) == list(range(1, 100))
+	copy = queue.copy()
+	copy.dequeue()
+	assert queue.peek(0) == 1 and copy.peek(0) == 2
+
+def test_bad_settings():
+	with pytest.raises(ValueError):
+		MyQueue(maxlen=0)
+	with pytest.raises(ValueError):
+		MyQueue(maxlen=3, overflow="grow")
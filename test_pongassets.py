@@ -0,0 +1,64 @@
+"""Jordan Ogilvy, 'pypong' tests for the asset manager. Run with python -m pytest"""
+
+import json
+import threading
+import pygame
+import pongassets
+
+FONTS = [("Arial", 48), ("Arial", 18)]
+
+def count_writes(monkeypatch):
+	# a list that gets a copy of the paths every time the cache file is written
+	writes = []
+	json_dump = json.dump
+	def dump(paths, cache):
+		writes.append(dict(paths))
+		json_dump(paths, cache)
+	monkeypatch.setattr(pongassets.json, "dump", dump)
+	return writes
+
+def test_cache_is_only_written_when_it_changes(tmp_path, monkeypatch):
+	pygame.font.init()
+	writes = count_writes(monkeypatch)
+	path = str(tmp_path / "fonts.json")
+	assets = pongassets.AssetManager(path)
+	assets.preload(FONTS + [("Courier", 12)])
+	assert len(writes) == 1 and set(writes[0]) == {"Arial", "Courier"}
+	assert assets.get_font("Arial", 48) is assets.get_font("Arial", 48)
+	assets.get_font("Arial", 30)
+	assert len(writes) == 1
+	# the next run finds everything in the file
+	assets = pongassets.AssetManager(path)
+	assets.preload(FONTS)
+	assets.get_font("Courier", 12)
+	assert len(writes) == 1
+	# a font that wasnt there before is saved, along with forgetting one that has been uninstalled
+	with open(path, "w") as cache:
+		cache.write(json.dumps(dict(writes[0], Gone=str(tmp_path / "gone.ttf"))))
+	assets = pongassets.AssetManager(path)
+	assets.get_font("Arial", 18)
+	assert len(writes) == 2 and writes[1] == writes[0]
+	assets.get_font("Verdana", 18)
+	assert len(writes) == 3 and "Verdana" in writes[2]
+
+def test_get_font_without_waiting(monkeypatch):
+	pygame.font.init()
+	# hold the background thread up finding the font, the way a slow system font search would
+	found = threading.Event()
+	match_font = pygame.font.match_font
+	def slow_match_font(name):
+		found.wait(10)
+		return match_font(name)
+	monkeypatch.setattr(pygame.font, "match_font", slow_match_font)
+	assets = pongassets.AssetManager()
+	assets.preload(FONTS, background=True)
+	assert assets.get_font("Arial", 48, wait=False) is None
+	found.set()
+	# waiting gets the font the thread loaded, and once it has, so does not waiting
+	font = assets.get_font("Arial", 48)
+	assets.wait()
+	assert assets.get_font("Arial", 48, wait=False) is font
+	assert assets.get_font("Arial", 18, wait=False) is not None
+	# a font that isnt being preloaded is loaded straight away either way
+	assert assets.get_font("Arial", 30, wait=False) is not None
+	assert [what for what, seconds in assets.get_timings()].count("find Arial") == 1
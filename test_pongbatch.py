@@ -0,0 +1,63 @@
+"""Jordan Ogilvy, 'pypong' tests for the batch engine. Run with python -m pytest"""
+
+import numpy as np
+import pongsim
+import pongbatch
+
+def follow(batch):
+	# keys that keep each player paddle under its ball, like the follow in test_pongsim
+	ball_y = batch.get_ball_positions()[:, 1] + 8
+	paddle_y = batch.get_paddle_positions()[:, 0] + 40
+	return (ball_y < paddle_y - 5, ball_y > paddle_y + 5)
+
+def play(batch, ticks):
+	for tick in range(ticks):
+		batch.step(*follow(batch))
+
+def test_matches_play_to_the_end():
+	batch = pongbatch.BatchWorld(300, difficulty=[0, 1, 2]*100, seed=3)
+	for tick in range(20000):
+		if batch.is_over().all():
+			break
+		events = batch.step(*follow(batch))
+		assert not (events[pongsim.MATCH_OVER] & ~batch.is_over()).any()
+	assert batch.is_over().all()
+	scores = batch.get_scores()
+	winners = batch.get_winners()
+	assert (scores.max(axis=1) == 7).all()
+	assert (winners == np.where(scores[:, 0] == 7, 1, -1)).all()
+	# with the player following the ball both sides win some
+	assert set(winners) == {1, -1}
+	# finished matches stay as they finished
+	ticks = batch.get_ticks()
+	play(batch, 100)
+	assert (batch.get_ticks() == ticks).all()
+	assert (batch.get_scores() == scores).all()
+
+def test_same_seed_same_matches():
+	for predictive in (False, True):
+		first = pongbatch.BatchWorld(200, difficulty=1, seed=9, predictive=predictive)
+		second = pongbatch.BatchWorld(200, difficulty=1, seed=9, predictive=predictive)
+		other = pongbatch.BatchWorld(200, difficulty=1, seed=10, predictive=predictive)
+		for batch in (first, second, other):
+			play(batch, 800)
+		assert (first.get_ball_positions() == second.get_ball_positions()).all()
+		assert (first.get_scores() == second.get_scores()).all()
+		assert not (first.get_scores() == other.get_scores()).all()
+
+def test_reset_some_matches():
+	batch = pongbatch.BatchWorld(100, seed=1)
+	play(batch, 1500)
+	scores = batch.get_scores()
+	ticks = batch.get_ticks()
+	mask = np.arange(100) % 2 == 0
+	batch.reset(mask)
+	assert (batch.get_scores()[mask] == 0).all() and (batch.get_ticks()[mask] == 0).all()
+	assert (batch.get_scores()[~mask] == scores[~mask]).all() and (batch.get_ticks()[~mask] == ticks[~mask]).all()
+
+def test_run_counts_match_ticks():
+	batch = pongbatch.BatchWorld(50, difficulty=2, seed=5)
+	assert batch.run(3500) == batch.get_ticks().sum()
+	# every match is over by then, so with auto_reset they all start again and keep counting
+	assert batch.is_over().all()
+	assert pongbatch.BatchWorld(50, difficulty=2, seed=5).run(3500, auto_reset=True) == 50*3500
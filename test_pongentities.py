@@ -0,0 +1,124 @@
+"""Jordan Ogilvy, 'pypong' tests for the entity registry. Run with python -m pytest"""
+
+import pongevents
+import pongentities
+
+SIGNAL = "match_over"
+
+class Thing:
+	def __init__(self, name, calls):
+		self.name = name
+		self.calls = calls
+
+	def update(self, objects):
+		self.calls.append(self.name)
+
+class Paddle(Thing):
+	pass
+
+class Player(Paddle):
+	pass
+
+class Listener(Thing):
+	# subscribes to SIGNAL while it is in a registry, and counts the disconnects
+	def __init__(self, name, calls):
+		super(Listener, self).__init__(name, calls)
+		self.disconnects = 0
+
+	def connect(self, objects):
+		objects.get_bus().subscribe(SIGNAL, self.on_signal)
+
+	def disconnect(self, objects):
+		self.disconnects += 1
+
+	def on_signal(self, value):
+		self.calls.append((self.name, value))
+
+class Controller(Listener):
+	# ends the match the way GameController does: empties the registry and puts itself back
+	def on_signal(self, value):
+		super(Controller, self).on_signal(value)
+		self.objects.clear()
+		self.objects.add(self)
+
+	def connect(self, objects):
+		self.objects = objects
+		super(Controller, self).connect(objects)
+
+class Ball(Thing):
+	# emits SIGNAL in its update, like a ball that wins the last point
+	def __init__(self, name, calls, bus):
+		super(Ball, self).__init__(name, calls)
+		self.bus = bus
+
+	def update(self, objects):
+		super(Ball, self).update(objects)
+		self.bus.emit(SIGNAL, self.name)
+
+def test_indexes():
+	calls = []
+	player, paddle, other = Player("player", calls), Paddle("paddle", calls), Thing("other", calls)
+	objects = pongentities.EntityRegistry([player, paddle])
+	objects.add(other, "scenery")
+	assert list(objects) == [player, paddle, other] and len(objects) == 3
+	assert list(objects.of_type(Paddle)) == [player, paddle]
+	assert list(objects.of_type(Player)) == [player]
+	assert objects.first(Thing) is player and objects.first(Ball) is None
+	assert list(objects.tagged("scenery")) == [other] and list(objects.tagged("nothing")) == []
+	objects.remove(player)
+	assert player not in objects and paddle in objects
+	assert list(objects.of_type(Paddle)) == [paddle] and objects.first(Player) is None
+
+def test_adding_while_iterating():
+	# an object added part way through an update is updated in the same pass, like appending to a list
+	calls = []
+	objects = pongentities.EntityRegistry()
+	late = Thing("late", calls)
+	class Spawner(Thing):
+		def update(self, objects):
+			super(Spawner, self).update(objects)
+			objects.add(late)
+	objects.extend([Thing("first", calls), Spawner("spawner", calls), Thing("last", calls)])
+	for thing in objects:
+		thing.update(objects)
+	assert calls == ["first", "spawner", "last", "late"]
+
+def test_clearing_while_iterating():
+	# clearing part way through stops the pass, even with an object added straight back, as long as the loop is past
+	# where that object ends up
+	calls = []
+	objects = pongentities.EntityRegistry()
+	first = Thing("first", calls)
+	class Clearer(Thing):
+		def update(self, objects):
+			super(Clearer, self).update(objects)
+			objects.clear()
+			objects.add(first)
+	objects.extend([first, Clearer("clearer", calls), Thing("last", calls)])
+	for thing in objects:
+		thing.update(objects)
+	assert calls == ["first", "clearer"]
+	assert list(objects) == [first]
+	assert list(objects.of_type(Clearer)) == [] and list(objects.of_type(Thing)) == [first]
+
+def test_match_over_during_update():
+	# the end of a match, as GameController sees it: the ball emits the signal during the update pass, and the controller
+	# clears the registry and adds itself back. Every handler subscribed when it was emitted still hears it, the objects
+	# after the ball arent updated, and only the controller is subscribed afterwards
+	calls = []
+	bus = pongevents.EventBus()
+	objects = pongentities.EntityRegistry(bus=bus)
+	controller = Controller("controller", calls)
+	stats = Listener("stats", calls)
+	objects.extend([controller, Paddle("opponent", calls), Ball("ball", calls, bus), Player("player", calls), stats])
+	assert bus.get_subscriber_count() == 2
+	for thing in objects:
+		thing.update(objects)
+	assert calls == ["controller", "opponent", "ball", ("controller", "ball"), ("stats", "ball")]
+	assert list(objects) == [controller] and objects.first(Ball) is None
+	assert (controller.disconnects, stats.disconnects) == (1, 1)
+	# the controller subscribed again when it was added back, once
+	del calls[:]
+	assert bus.get_subscriber_count() == 1
+	bus.emit(SIGNAL, "again")
+	assert calls == [("controller", "again")]
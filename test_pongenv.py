@@ -0,0 +1,124 @@
+"""Jordan Ogilvy, 'pypong' tests for the training environments. Run with python -m pytest"""
+
+import numpy as np
+import pongsim
+import pongbatch
+import pongenv
+
+def follow(observation):
+	# the action that keeps the player paddle under the ball, from the observation alone
+	if observation[1] < observation[4] - 0.01:
+		return 1
+	if observation[1] > observation[4] + 0.01:
+		return 2
+	return 0
+
+def play(env, seed, steps):
+	# observations and rewards of steps ticks of follow, stopping early if the match ends
+	observation = env.reset(seed=seed)
+	observations, rewards = [observation], []
+	for step in range(steps):
+		observation, reward, done, info = env.step(follow(observation))
+		observations.append(observation)
+		rewards.append(reward)
+		if done:
+			break
+	return np.array(observations), rewards
+
+def test_same_seed_same_trajectory():
+	trajectories = []
+	for seed in (4, 4, 5):
+		trajectories.append(play(pongenv.PongEnv(difficulty=1), seed, 3000))
+	assert np.array_equal(trajectories[0][0], trajectories[1][0])
+	assert trajectories[0][1] == trajectories[1][1]
+	length = min(len(trajectories[0][0]), len(trajectories[2][0]))
+	assert not np.array_equal(trajectories[0][0][:length], trajectories[2][0][:length])
+
+def test_reward_sign_on_a_point():
+	env = pongenv.PongEnv(difficulty=0)
+	observation = env.reset(seed=2)
+	scores = (0, 0)
+	seen = set()
+	done = False
+	while not done:
+		# only trying while not ahead, so both sides win points
+		action = follow(observation) if scores[0] <= scores[1] else 0
+		observation, reward, done, info = env.step(action)
+		player, opponent = info["scores"]
+		# 1 when the player wins the point, -1 when the opponent does, and 0 every other tick
+		assert reward == (player - scores[0]) - (opponent - scores[1])
+		seen.add(reward)
+		scores = (player, opponent)
+	assert seen == {-1.0, 0.0, 1.0}
+	assert max(scores) == 7 and not info["truncated"]
+
+def test_vec_env_starts_finished_matches_again():
+	# standing still loses every point, so every match ends, and at different ticks with different seeds
+	n = 20
+	env = pongenv.VecPongEnv(n, difficulty=2, seed=3)
+	first = env.reset().copy()
+	actions = np.zeros(n, dtype=int)
+	finished = np.zeros(n, dtype=bool)
+	for step in range(20000):
+		before = env.get_batch().get_scores()
+		observations, rewards, dones, info = env.step(actions)
+		assert not info["truncated"].any()
+		if not dones.any():
+			continue
+		# the last point of the match is still rewarded, and the observation is the first of the new match
+		assert (rewards[dones] == -1).all() and (before[dones, 1] == 6).all()
+		assert np.array_equal(observations[dones], first[dones])
+		assert (env.get_batch().get_ticks()[dones] == 0).all() and (env.get_batch().get_scores()[dones] == 0).all()
+		# with the last observation of the old match kept, from after the last point: the ball back in the middle and
+		# the whole wait for a serve in front of it
+		terminal = info["terminal_observation"][dones]
+		assert (terminal[:, 0:2] == 0.5).all() and (terminal[:, 6] == 1).all()
+		finished |= dones
+		if finished.all():
+			break
+	assert finished.all()
+
+def test_max_ticks_truncates():
+	env = pongenv.PongEnv(max_ticks=50)
+	env.reset(seed=1)
+	for step in range(49):
+		observation, reward, done, info = env.step(0)
+		assert not done and not info["truncated"]
+	observation, reward, done, info = env.step(0)
+	assert done and info["truncated"] and info["tick"] == 50
+	n = 8
+	env = pongenv.VecPongEnv(n, max_ticks=50, seed=1)
+	env.reset()
+	for step in range(49):
+		observations, rewards, dones, info = env.step(np.zeros(n, dtype=int))
+		assert not dones.any() and not info["truncated"].any()
+	observations, rewards, dones, info = env.step(np.zeros(n, dtype=int))
+	assert dones.all() and info["truncated"].all()
+	assert (env.get_batch().get_ticks() == 0).all()
+
+def test_spaces_match_the_batch():
+	n = 16
+	env = pongenv.VecPongEnv(n, difficulty=[0, 1]*8, seed=6)
+	observations = env.reset()
+	assert observations.shape == (n, pongenv.OBSERVATION_SIZE) and observations.dtype == np.float32
+	assert len(env) == n and len(pongenv.OBSERVATION_FIELDS) == pongenv.OBSERVATION_SIZE
+	assert len(pongenv.ACTIONS) == 3
+	rng = np.random.default_rng(0)
+	for step in range(500):
+		observations, rewards, dones, info = env.step(rng.integers(0, len(pongenv.ACTIONS), n))
+	assert rewards.shape == dones.shape == info["truncated"].shape == (n,)
+	assert info["terminal_observation"].shape == observations.shape
+	# the observations are the BatchWorld arrays moved to the centres and scaled
+	batch = env.get_batch()
+	assert isinstance(batch, pongbatch.BatchWorld)
+	width, height = batch.get_size()
+	half_ball = pongsim.BallBody(width, height).get_size()/2
+	half_paddle = pongsim.PaddleBody().get_rect()[3]/2
+	assert np.allclose(observations[:, 0:2]*(width, height) - half_ball, batch.get_ball_positions(), atol=1e-3)
+	assert np.allclose(observations[:, 2:4]*pongenv.MAX_BALL_SPEED, batch.get_ball_velocities(), atol=1e-4)
+	assert np.allclose(observations[:, 4:6]*height - half_paddle, batch.get_paddle_positions(), atol=1e-3)
+	assert np.allclose(observations[:, 6]*pongenv.SERVE_WAIT, batch.get_serve_countdowns())
+	# and a PongEnv starts from the same observation as each of them
+	single = pongenv.PongEnv().reset(seed=6)
+	assert single.shape == (pongenv.OBSERVATION_SIZE,) and single.dtype == np.float32
+	assert np.array_equal(single, pongenv.VecPongEnv(1, seed=6).reset()[0])
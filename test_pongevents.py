@@ -0,0 +1,93 @@
+"""Jordan Ogilvy, 'pypong' tests for the event bus. Run with python -m pytest"""
+
+from types import SimpleNamespace
+import pongevents
+
+KEYDOWN = 2		#stands in for a pygame event type, so pygame isnt needed
+SIGNAL = "signal"
+
+class Listener:
+	def __init__(self, name, calls):
+		self.name = name
+		self.calls = calls
+
+	def on_signal(self, value):
+		self.calls.append((self.name, value))
+
+def test_handlers_in_order():
+	bus = pongevents.EventBus()
+	calls = []
+	first, second = Listener("first", calls), Listener("second", calls)
+	bus.subscribe(SIGNAL, first.on_signal)
+	bus.subscribe(SIGNAL, second.on_signal)
+	assert bus.emit(SIGNAL, 1) == 2
+	assert calls == [("first", 1), ("second", 1)]
+	assert bus.emit("nothing") == 0
+	bus.unsubscribe(SIGNAL, first.on_signal)
+	bus.unsubscribe(SIGNAL, first.on_signal)		#isnt subscribed any more, so nothing happens
+	assert bus.emit(SIGNAL, 2) == 1 and calls[-1] == ("second", 2)
+	bus.unsubscribe_all(second)
+	assert bus.get_subscriber_count() == 0
+
+def test_keys():
+	bus = pongevents.EventBus()
+	calls = []
+	bus.subscribe(KEYDOWN, lambda event: calls.append("any"))
+	bus.subscribe(KEYDOWN, lambda event: calls.append("p"), key="p")
+	assert bus.publish(SimpleNamespace(type=KEYDOWN, key="p")) == 2
+	assert bus.publish(SimpleNamespace(type=KEYDOWN, key="q")) == 1
+	assert bus.publish(SimpleNamespace(type=KEYDOWN + 1)) == 0
+	assert calls == ["any", "p", "any"]
+
+def test_unsubscribing_during_emit():
+	# a handler that unsubscribes the ones after it, the way clearing the registry does at the end of a match. Every handler
+	# that was subscribed when the signal was emitted still gets it, and none of them get the next one
+	bus = pongevents.EventBus()
+	calls = []
+	listeners = [Listener(name, calls) for name in ("first", "second", "third")]
+	def clear(value):
+		calls.append(("clear", value))
+		for listener in listeners:
+			bus.unsubscribe_all(listener)
+	bus.subscribe(SIGNAL, listeners[0].on_signal)
+	bus.subscribe(SIGNAL, clear)
+	bus.subscribe(SIGNAL, listeners[1].on_signal)
+	bus.subscribe(SIGNAL, listeners[2].on_signal)
+	assert bus.emit(SIGNAL, 1) == 4
+	assert calls == [("first", 1), ("clear", 1), ("second", 1), ("third", 1)]
+	del calls[:]
+	assert bus.emit(SIGNAL, 2) == 1
+	assert calls == [("clear", 2)]
+
+def test_subscribing_during_emit():
+	# a handler that unsubscribes itself and subscribes again, the way the controller does when it is added back to a
+	# cleared registry, along with a new handler. Neither is called again until the next emit
+	bus = pongevents.EventBus()
+	calls = []
+	late = Listener("late", calls)
+	def resubscribe(value):
+		calls.append(("resubscribe", value))
+		if value == 1:
+			bus.unsubscribe(SIGNAL, resubscribe)
+			bus.subscribe(SIGNAL, resubscribe)
+			bus.subscribe(SIGNAL, late.on_signal)
+	bus.subscribe(SIGNAL, resubscribe)
+	# and the count is of the handlers it went to, not of the ones subscribed afterwards
+	assert bus.emit(SIGNAL, 1) == 1
+	assert calls == [("resubscribe", 1)]
+	del calls[:]
+	assert bus.emit(SIGNAL, 2) == 2
+	assert calls == [("resubscribe", 2), ("late", 2)]
+
+def test_unsubscribing_during_publish():
+	bus = pongevents.EventBus()
+	calls = []
+	def once(event):
+		calls.append("once")
+		bus.unsubscribe(KEYDOWN, once, key="p")
+	bus.subscribe(KEYDOWN, once, key="p")
+	bus.subscribe(KEYDOWN, lambda event: calls.append("after"), key="p")
+	event = SimpleNamespace(type=KEYDOWN, key="p")
+	assert bus.publish(event) == 2
+	assert bus.publish(event) == 1
+	assert calls == ["once", "after", "after"]
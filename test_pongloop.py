@@ -0,0 +1,128 @@
+"""Jordan Ogilvy, 'pypong' tests for the game loop timing. Run with python -m pytest"""
+
+import math
+import time
+import pytest
+import pongloop
+
+TICK_RATE = 64		#so the tick time, 1/64 of a second, and the frame times below add up exactly
+
+class Clock:
+	# stands in for time.perf_counter and time.sleep. Every reading of the clock moves it on a microsecond, so the pacer
+	# watching the clock gets to where it is waiting for
+	def __init__(self, monkeypatch):
+		self.now = 100.0
+		monkeypatch.setattr(time, "perf_counter", self.perf_counter)
+		monkeypatch.setattr(time, "sleep", self.sleep)
+
+	def perf_counter(self):
+		self.now += 1e-6
+		return self.now
+
+	def sleep(self, seconds):
+		self.now += seconds
+
+def frame(pacer, clock, work, refresh_time=None):
+	# one frame through the pacer, taking work seconds to draw. With refresh_time, presenting waits for the next refresh
+	# of a screen refreshing that often, like vsync does. Returns the seconds wait_for_input said had passed
+	since_last = pacer.wait_for_input()
+	clock.now += work
+	pacer.wait_for_present()
+	if refresh_time is not None:
+		clock.now = math.ceil(clock.now/refresh_time)*refresh_time
+	pacer.presented()
+	return since_last
+
+def test_left_over_time_carries_to_the_next_frame():
+	loop = pongloop.FixedStepLoop(TICK_RATE)
+	ticks = [loop.advance(2.5/TICK_RATE) for frame in range(4)]
+	assert ticks == [2, 3, 2, 3]
+	assert loop.get_alpha() == 0.0 and loop.get_tick_count() == 10
+	loop.advance(0.25/TICK_RATE)
+	assert loop.get_alpha() == 0.25
+	# a quarter of a tick at a time, the fourth frame runs one
+	assert [loop.advance(0.25/TICK_RATE) for frame in range(4)] == [0, 0, 1, 0]
+	assert loop.get_alpha() == 0.25
+
+def test_long_frames_are_cut_short():
+	loop = pongloop.FixedStepLoop(TICK_RATE, max_frame_time=0.25)
+	assert loop.advance(10.0) == 0.25*TICK_RATE
+	assert loop.get_alpha() == 0.0
+	assert loop.advance(0.25) == 0.25*TICK_RATE
+
+def test_time_scale():
+	loop = pongloop.FixedStepLoop(TICK_RATE, time_scale=4)
+	assert loop.advance(1/TICK_RATE) == 4
+	loop.set_time_scale(0.5)
+	assert loop.get_time_scale() == 0.5
+	assert [loop.advance(1/TICK_RATE) for frame in range(4)] == [0, 1, 0, 1]
+	# the clamp is on real time, before the scale
+	loop = pongloop.FixedStepLoop(TICK_RATE, time_scale=100, max_frame_time=0.25)
+	assert loop.advance(1.0) == 100*0.25*TICK_RATE
+
+def test_uncapped_ticks():
+	loop = pongloop.FixedStepLoop(TICK_RATE)
+	loop.advance(1.5/TICK_RATE)
+	assert loop.get_alpha() == 0.5
+	loop.set_uncapped_ticks(7)
+	for frame_time in (0.0, 1/TICK_RATE, 10.0):
+		assert loop.advance(frame_time) == 7
+		assert loop.get_alpha() == 1.0
+	assert loop.get_tick_count() == 1 + 3*7
+	# back in time with the clock, with nothing saved up from before
+	loop.set_uncapped_ticks(None)
+	assert loop.get_alpha() == 0.0
+	assert loop.advance(1/TICK_RATE) == 1
+
+def test_unknown_strategy():
+	with pytest.raises(ValueError):
+		pongloop.FramePacer("busy")
+
+def test_sleep_paces_frames(monkeypatch):
+	clock = Clock(monkeypatch)
+	pacer = pongloop.FramePacer("sleep", frame_rate=50, late_input=False)
+	gaps = [frame(pacer, clock, 0.005) for i in range(100)]
+	assert gaps[0] == 0.0
+	assert gaps[1:] == pytest.approx([0.02]*99, abs=1e-4)
+	assert pacer.get_fps() == pytest.approx(50, rel=1e-3)
+	assert pacer.get_report()["missed"] == 0
+
+def test_vsync_changes_to_hybrid(monkeypatch):
+	# a screen refreshing at the frame rate keeps the pacer on vsync
+	clock = Clock(monkeypatch)
+	pacer = pongloop.FramePacer("vsync", frame_rate=60)
+	for i in range(200):
+		frame(pacer, clock, 0.004, refresh_time=1/60)
+	assert pacer.get_strategy() == "vsync"
+	assert pacer.get_fps() == pytest.approx(60, rel=1e-3)
+	# frames going on the screen far faster than that mean the display isnt waiting for the refreshes
+	clock = Clock(monkeypatch)
+	pacer = pongloop.FramePacer("vsync", frame_rate=60)
+	switched = None
+	for i in range(200):
+		frame(pacer, clock, 0.002)
+		if switched is None and pacer.get_strategy() == "hybrid":
+			switched = i
+	assert switched is not None and switched < 30
+	# and from then on the pacer keeps to the frame rate itself
+	gaps = [frame(pacer, clock, 0.002) for i in range(60)]
+	assert gaps == pytest.approx([1/60]*60, abs=1e-4)
+
+def test_missed_frames(monkeypatch):
+	clock = Clock(monkeypatch)
+	pacer = pongloop.FramePacer("hybrid", frame_rate=60)
+	for i in range(100):
+		frame(pacer, clock, 0.004)
+	assert pacer.get_report()["missed"] == 0
+	# one frame that takes two frames to draw is late, and the frames after it are back on time
+	frame(pacer, clock, 2/60)
+	for i in range(100):
+		frame(pacer, clock, 0.004)
+	assert pacer.get_report()["missed"] == 1
+	# with vsync a frame that misses a refresh shows up as a gap between them of two refreshes
+	clock = Clock(monkeypatch)
+	pacer = pongloop.FramePacer("vsync", frame_rate=60)
+	for work in [0.004]*50 + [0.02] + [0.004]*50 + [0.02, 0.02]:
+		frame(pacer, clock, work, refresh_time=1/60)
+	assert pacer.get_strategy() == "vsync"
+	assert pacer.get_report()["missed"] == 3
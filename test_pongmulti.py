@@ -0,0 +1,42 @@
+"""Jordan Ogilvy, 'pypong' tests for multiball. Run with python -m pytest"""
+
+import numpy as np
+import pongsim
+import pongmulti
+
+PADDLES = [(15, 200, 15, 80), (pongsim.FIELD_SIZE[0] - 35, 200, 15, 80)]
+
+def test_grid_finds_the_same_pairs():
+	# without ball collisions the grid isnt used to move the balls, so two swarms with the same seed stay in the same
+	# places and the pairs each one finds can be compared at every tick
+	grid = pongmulti.BallSwarm(400, seed=12)
+	everything = pongmulti.BallSwarm(400, broad_phase=False, seed=12)
+	for tick in range(400):
+		grid.step(PADDLES)
+		everything.step(PADDLES)
+		if tick % 20:
+			continue
+		x, y = grid.get_positions()
+		assert np.array_equal(x, everything.get_positions()[0])
+		pairs = grid.get_touching_pairs()
+		assert pairs == everything.get_touching_pairs()
+		assert grid.get_pair_checks() < everything.get_pair_checks()
+		# and the same as checking every pair in python
+		size = grid.get_size()
+		assert pairs == {(i, j) for i in range(len(x)) for j in range(i + 1, len(x))
+			if abs(x[i] - x[j]) < size and abs(y[i] - y[j]) < size}
+
+def test_bunched_up_balls():
+	# straight after a reset every ball is waiting in the same column of cells, so most of them touch their neighbours
+	grid = pongmulti.BallSwarm(300, seed=4)
+	pairs = grid.get_touching_pairs()
+	assert len(pairs) > 300
+	assert pairs == pongmulti.BallSwarm(300, broad_phase=False, seed=4).get_touching_pairs()
+
+def test_same_seed_same_balls():
+	first = pongmulti.BallSwarm(200, ball_collisions=True, seed=1)
+	second = pongmulti.BallSwarm(200, ball_collisions=True, seed=2)
+	second.reset(1)
+	for tick in range(300):
+		assert first.step(PADDLES) == second.step(PADDLES)
+	assert np.array_equal(first.get_positions()[1], second.get_positions()[1])
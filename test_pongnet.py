@@ -0,0 +1,119 @@
+"""Jordan Ogilvy, 'pypong' tests for network play. Run with python -m pytest"""
+
+import asyncio
+import pongnet
+
+def test_deltas_give_back_the_whole_state():
+	# the server sends each state as a delta from one a few ticks back, the way it does when acks are slow to arrive.
+	# The client has to end up with exactly the state the server had
+	server = pongnet.new_world(1, seed=8)
+	client = pongnet.new_world(1, seed=0)
+	sent = {}		#tick -> values, on the server
+	received = {}	#tick -> values, on the client
+	full_size = len(pongnet.encode_state(0, pongnet.take_snapshot(server), 0))
+	for tick in range(3000):
+		server.step((tick % 40 < 20, tick % 40 >= 25))
+		values = pongnet.take_snapshot(server)
+		baseline_tick = tick - 1 - tick % 4
+		data = pongnet.encode_state(tick, values, tick, baseline_tick, sent.get(baseline_tick))
+		sent[tick] = values
+		decoded_tick, decoded, input_number = pongnet.decode_state(data, received)
+		assert (decoded_tick, decoded, input_number) == (tick, values, tick)
+		received[tick] = decoded
+		assert len(data) <= full_size
+		pongnet.apply_snapshot(client, decoded)
+		assert pongnet.take_snapshot(client) == values
+
+def test_delta_from_a_missing_state():
+	world = pongnet.new_world(1, seed=3)
+	baseline = pongnet.take_snapshot(world)
+	world.step((True, False))
+	data = pongnet.encode_state(1, pongnet.take_snapshot(world), 1, 0, baseline)
+	assert pongnet.decode_state(data, {}) is None
+	assert pongnet.decode_state(data, {0: baseline})[1] == pongnet.take_snapshot(world)
+
+def test_unchanged_state_is_just_a_header():
+	world = pongnet.new_world(1, seed=3)
+	values = pongnet.take_snapshot(world)
+	assert len(pongnet.encode_state(5, values, 0, 4, values)) == pongnet.STATE_HEADER.size
+
+def test_parse_address():
+	assert pongnet.parse_address("example.org") == ("example.org", pongnet.DEFAULT_PORT)
+	assert pongnet.parse_address("127.0.0.1:6000") == ("127.0.0.1", 6000)
+
+async def start(loss):
+	# a MatchServer on localhost that is ticked by hand, and a client for each side. Returns (server, transport, clients)
+	loop = asyncio.get_running_loop()
+	server = pongnet.MatchServer(1, pongnet.Link(loss=loss, seed=0), seed=5)
+	transport, protocol = await loop.create_datagram_endpoint(lambda: server, local_addr=("127.0.0.1", 0))
+	port = transport.get_extra_info("sockname")[1]
+	clients = []
+	for seed in (1, 2):
+		clients.append(await pongnet.connect("127.0.0.1", port, pongnet.Link(loss=loss, seed=seed)))
+	return server, transport, clients
+
+async def deliver():
+	# long enough for datagrams on localhost to arrive and be handled
+	await asyncio.sleep(0.002)
+
+async def play(server, matches, ticks):
+	# a tick on each client, then a tick on the server, the way they take turns with no lag
+	for tick in range(ticks):
+		for match in matches:
+			match.tick(*pongnet.follow_ball(match.get_world(), match.get_side()))
+		await deliver()
+		server.tick()
+		await deliver()
+
+async def catch_up(server, client, match, resend=False):
+	# tick the server until it has used every input the client sent, and the client has the state from the server's
+	# newest tick. That is when the client World should be the server's. Inputs are only sent again with the next ones,
+	# so with resend the client keeps still for a tick now and then, in case the last of its inputs were lost
+	for tick in range(100):
+		server.tick()
+		await deliver()
+		match.update()
+		if match.get_pending_count() == 0 and client.get_latest()[0] == server.get_world().get_tick():
+			return pongnet.snapshot_hash(match.get_world())
+		if resend and tick % 4 == 3:
+			match.tick(False, False)
+			await deliver()
+	return None
+
+def test_loopback():
+	async def run():
+		server, transport, clients = await start(loss=0)
+		try:
+			matches = [pongnet.PredictedMatch(client) for client in clients]
+			await play(server, matches, 300)
+			for client, match in zip(clients, matches):
+				assert match.is_started()
+				assert await catch_up(server, client, match) == pongnet.snapshot_hash(server.get_world())
+			# knock one client's ball out of place. The next state from the server has to put it back
+			match = matches[0]
+			corrections = match.get_corrections()[0]
+			match.get_world().get_ball().set_position(5, 5)
+			assert await catch_up(server, clients[0], match) == pongnet.snapshot_hash(server.get_world())
+			assert match.get_corrections()[0] == corrections + 1
+			assert match.get_corrections()[1] > 100
+		finally:
+			for client in clients:
+				client.close()
+			transport.close()
+	asyncio.run(run())
+
+def test_loopback_with_loss():
+	async def run():
+		server, transport, clients = await start(loss=0.3)
+		try:
+			matches = [pongnet.PredictedMatch(client) for client in clients]
+			await play(server, matches, 10*pongnet.HISTORY)
+			for client, match in zip(clients, matches):
+				# lost states are never stored, and the ones that arrive only stay for 2*HISTORY ticks
+				assert 0 < client.get_state_count() <= 2*pongnet.HISTORY + 1
+				assert await catch_up(server, client, match, resend=True) == pongnet.snapshot_hash(server.get_world())
+		finally:
+			for client in clients:
+				client.close()
+			transport.close()
+	asyncio.run(run())
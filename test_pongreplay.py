@@ -0,0 +1,57 @@
+"""Jordan Ogilvy, 'pypong' tests for replays. Run with python -m pytest"""
+
+import pytest
+import pongsim
+import pongreplay
+
+def record(seed, **settings):
+	# play a whole match with the player following the ball, recording it. Returns the recorder, the state hash at the
+	# start of every tick, and the finished World
+	recorder = pongreplay.ReplayRecorder(seed, **settings)
+	world = pongreplay.new_world(recorder.get_settings())
+	hashes = []
+	while not world.is_over():
+		hashes.append(world.get_state_hash())
+		ball_y = world.get_ball().get_position()[1] + 8
+		paddle_y = world.get_player().get_position()[1] + 40
+		inputs = (ball_y < paddle_y - 5, ball_y > paddle_y + 5)
+		recorder.record(*inputs)
+		world.step(inputs)
+	hashes.append(world.get_state_hash())
+	return recorder, hashes, world
+
+@pytest.mark.parametrize("settings", [{}, {"fixed_point": True}, {"difficulty": 2, "predictive": True}])
+def test_save_seek_and_play(tmp_path, settings):
+	recorder, hashes, world = record(21, **settings)
+	# ticks recorded after the match finished arent saved
+	recorder.record(True, False)
+	path = str(tmp_path / "match.pongreplay")
+	recorder.save(path, keyframe_interval=500)
+	with pongreplay.Replay(path) as replay:
+		assert replay.get_tick_count() == world.get_tick()
+		assert replay.get_keyframe_ticks() == list(range(500, world.get_tick(), 500))
+		# on a keyframe, either side of one, before the first and at the end
+		for tick in (0, 1, 499, 500, 501, 1234, world.get_tick()):
+			assert replay.seek(tick).get_state_hash() == hashes[tick]
+		played = None
+		for played, events in replay.play(777):
+			assert played.get_state_hash() == hashes[played.get_tick()]
+		assert played.get_rules().get_scores() == world.get_rules().get_scores()
+		assert played.get_winner() == world.get_winner()
+		assert played.get_state_hash() == world.get_state_hash()
+		with pytest.raises(IndexError):
+			replay.get_inputs(world.get_tick())
+
+def test_not_a_replay(tmp_path):
+	path = tmp_path / "match.pongreplay"
+	path.write_bytes(b"not a replay" + bytes(20))
+	with pytest.raises(ValueError):
+		pongreplay.Replay(str(path))
+
+def test_pack_state_round_trip():
+	world = pongsim.World(seed=4)
+	for tick in range(300):
+		world.step((tick % 7 == 0, tick % 5 == 0))
+	copy = pongsim.World(seed=0)
+	copy.set_state(pongreplay.unpack_state(pongreplay.pack_state(world.get_state())))
+	assert copy.get_state_hash() == world.get_state_hash()
@@ -0,0 +1,65 @@
+"""Jordan Ogilvy, 'pypong' tests for match statistics. Run with python -m pytest"""
+
+import random
+import statistics
+import pytest
+import pongstats
+
+def test_running_stats_match_statistics():
+	rng = random.Random(6)
+	values = [rng.gauss(1e6, 3) for i in range(5000)]	#a big mean and a small spread, which a sum of squares gets wrong
+	stats = pongstats.RunningStats(history=1000)
+	for value in values:
+		stats.add(value)
+	assert stats.get_count() == len(values)
+	assert stats.get_mean() == pytest.approx(statistics.mean(values), rel=1e-12)
+	# the sample standard deviation, dividing by count - 1
+	assert stats.get_std() == pytest.approx(statistics.stdev(values), rel=1e-9)
+	summary = stats.get_summary()
+	assert (summary["min"], summary["max"]) == (min(values), max(values))
+	# percentiles are of the last 1000 values only
+	recent = sorted(values[-1000:])
+	assert stats.get_percentile(50) == summary["p50"] == recent[500]
+	assert summary["p99"] == recent[990]
+
+def test_running_stats_with_few_values():
+	stats = pongstats.RunningStats()
+	assert stats.get_summary() == {"count": 0}
+	stats.add(2.5)
+	assert (stats.get_mean(), stats.get_std()) == (2.5, 0.0)
+	stats.add(3.5)
+	assert stats.get_std() == pytest.approx(statistics.stdev([2.5, 3.5]))
+
+def test_saved_rows_match_the_totals(tmp_path):
+	path = str(tmp_path / "matches.pongstats")
+	stats, ticks, seconds = pongstats.simulate(3, path)
+	rows = pongstats.read_stats(path)
+	for name, columns in pongstats.TABLES.items():
+		assert set(rows[name]) == set(columns)
+		for column in columns:
+			if column in pongstats.UNSUMMARISED:
+				continue
+			totals = stats.get_table(name).get_stats(column)
+			assert len(rows[name][column]) == totals.get_count()
+			assert statistics.mean(rows[name][column]) == pytest.approx(totals.get_mean())
+	assert set(rows["serves"]["match"]) == {1, 2, 3}
+	saved = sum(len(columns["match"]) for columns in rows.values())
+	# closing keeps the writer, so describe still says how much was saved
+	lines = stats.describe()
+	assert lines[0] == "3 matches finished, of 3 started"
+	assert lines[-1] == "%d rows saved, 0 dropped" % saved
+
+def test_unfinished_match_isnt_counted(tmp_path):
+	stats = pongstats.MatchStats(str(tmp_path / "matches.pongstats"))
+	stats.start_match()
+	stats.end_match()
+	stats.start_match()
+	stats.close()
+	stats.close()
+	assert stats.describe()[0] == "1 matches finished, of 2 started"
+
+def test_not_a_stats_file(tmp_path):
+	path = tmp_path / "matches.pongstats"
+	path.write_bytes(b"PONGRPL1")
+	with pytest.raises(ValueError):
+		pongstats.read_stats(str(path))
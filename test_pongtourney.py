@@ -0,0 +1,47 @@
+"""Jordan Ogilvy, 'pypong' tests for the tournament runner. Run with python -m pytest"""
+
+import csv
+import json
+import pytest
+import pongsim
+import pongtourney
+
+GRID = ["--matches", "2", "--ball-speeds", "12,14", "--serve-angles", "10", "--opponents", "classic:2,predictive:2:10",
+	"--players", "tracker", "--max-ticks", "3000", "--seed", "7"]
+
+def test_jobs_cover_the_grid():
+	jobs = list(pongtourney.make_jobs(pongtourney.parse_args(GRID)))
+	assert len(jobs) == 2*2*1*2*1
+	assert len({job[2] for job in jobs}) == len(jobs)		#every match has its own seed
+	assert {(job[3], job[5]) for job in jobs} == {(12, "classic:2"), (12, "predictive:2:10"), (14, "classic:2"),
+		(14, "predictive:2:10")}
+
+def test_same_job_same_result():
+	for job in pongtourney.make_jobs(pongtourney.parse_args(GRID)):
+		result = pongtourney.play_match(job)
+		assert result == pongtourney.play_match(job)
+		assert set(result) == set(pongtourney.FIELDS)
+		assert result["ticks"] <= 3000
+		if result["winner"] != "none":
+			assert max(result["opponent_score"], result["player_score"]) == 7
+
+def test_workers_give_the_same_results(tmp_path):
+	# the results come back in whatever order the workers finish in, but they are the same results
+	rows = []
+	for workers, name in ((1, "one.csv"), (2, "two.csv")):
+		path = str(tmp_path / name)
+		pongtourney.main(GRID + ["--workers", str(workers), "-o", path])
+		with open(path, newline="") as source:
+			rows.append(sorted(list(csv.DictReader(source)), key=lambda row: (int(row["cell"]), int(row["match"]))))
+	assert len(rows[0]) == 8
+	assert rows[0] == rows[1]
+	path = str(tmp_path / "one.json")
+	pongtourney.main(GRID + ["--workers", "1", "--format", "json", "-o", path])
+	with open(path) as source:
+		results = [json.loads(line) for line in source]
+	assert [str(result["winner"]) for result in results] == [row["winner"] for row in rows[0]]
+
+def test_unknown_ai():
+	world = pongsim.World(seed=1)
+	with pytest.raises(ValueError):
+		pongtourney.make_brain("psychic", world.get_opponent(), pongsim.OPPONENT, world, None)